@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Parser benchmark for Orange Update
+Replays recorded package manager output through the backends' parse_*
+methods and reports throughput (lines/s) and peak memory per parser. The
+recorded samples in benchmarks/fixtures are repeated up to a realistic
+size, from a 50k line `apt search` down to short update lists, so the
+benchmark runs offline on machines without any package manager.
+
+Results are compared against benchmarks/baseline.json; a parser that got
+slower or hungrier than the tolerance allows fails the run, and so does
+one that parses no packages at all, which also keeps it out of a new
+baseline:
+
+    python3 benchmarks/parsers.py                    # check against the baseline
+    python3 benchmarks/parsers.py --update-baseline  # record a new baseline
+
+Throughput is compared relative to a fixed calibration workload, timed
+in turns with each parser, so a baseline recorded on one machine stays
+usable on another and a busy moment slows both sides of the ratio alike.
+Both are the median of many samples, which a single slow sample can't move.
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, 'benchmarks', 'fixtures')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+# (fixture, backend module, class, parser, header lines kept once, lines to replay)
+CASES = [
+    ('apt_search', 'apt_manager', 'AptManager', 'parse_search', 2, 50000),
+    ('apt_installed', 'apt_manager', 'AptManager', 'parse_installed', 5, 5000),
+    ('apt_upgradable', 'apt_manager', 'AptManager', 'parse_upgradable', 1, 1000),
+    ('dnf_search', 'dnf_manager', 'DnfManager', 'parse_search', 1, 20000),
+    ('dnf_installed', 'dnf_manager', 'DnfManager', 'parse_installed', 1, 5000),
+    ('dnf_upgradable', 'dnf_manager', 'DnfManager', 'parse_upgradable', 2, 1000),
+    ('pacman_search', 'pacman_manager', 'PacmanManager', 'parse_search', 0, 30000),
+    ('pacman_installed', 'pacman_manager', 'PacmanManager', 'parse_installed', 0, 2000),
+    ('pacman_upgradable', 'pacman_manager', 'PacmanManager', 'parse_upgradable', 0, 500),
+    ('flatpak_search', 'flatpak_manager', 'FlatpakManager', 'parse_search', 1, 2000),
+    ('flatpak_installed', 'flatpak_manager', 'FlatpakManager', 'parse_installed', 0, 300),
+    ('flatpak_upgradable', 'flatpak_manager', 'FlatpakManager', 'parse_upgradable', 0, 100),
+    ('snap_search', 'snap_manager', 'SnapManager', 'parse_search', 1, 1000),
+    ('snap_installed', 'snap_manager', 'SnapManager', 'parse_installed', 1, 200),
+    ('snap_upgradable', 'snap_manager', 'SnapManager', 'parse_upgradable', 1, 50),
+]
+
+CALIBRATION_LINE = "libexample-dev/stable 1.2.3-4 amd64 [upgradable from: 1.2.3-3]"
+CALIBRATION_RE = re.compile(r'^(\S+)/(\S+) (\S+)')
+CALIBRATION_LINES = 20000
+
+
+def load_fixture(name: str, header: int, size: int) -> str:
+    """Recorded output with its body repeated to about `size` lines"""
+    with open(os.path.join(FIXTURES, f"{name}.txt"), 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    head, body = lines[:header], lines[header:]
+    copies = max(1, (size - len(head)) // max(1, len(body)))
+    return '\n'.join(head + body * copies) + '\n'
+
+
+class Timer:
+    """
+    Times a function in samples. A sample calls the function as often as it
+    takes to run for min_sample seconds, so parsing a short list isn't
+    timed at clock resolution.
+    """
+    
+    def __init__(self, function, min_sample: float = 0.05):
+        self.function = function
+        started = time.perf_counter()
+        function()
+        once = time.perf_counter() - started
+        self.calls = max(1, int(min_sample / max(once, 1e-6)))
+        self.samples = []
+    
+    def sample(self):
+        """Time one sample, in seconds per call"""
+        started = time.perf_counter()
+        for _ in range(self.calls):
+            self.function()
+        self.samples.append((time.perf_counter() - started) / self.calls)
+    
+    def median(self) -> float:
+        """Median time of one call over the samples taken"""
+        return statistics.median(self.samples)
+
+
+def calibration_workload():
+    """A fixed split and match workload, the machine's speed"""
+    text = '\n'.join([CALIBRATION_LINE] * CALIBRATION_LINES)
+
+    def workload():
+        for line in text.split('\n'):
+            match = CALIBRATION_RE.match(line)
+            if match:
+                line.split()
+    return workload
+
+
+def run_case(case: tuple, repeat: int) -> dict:
+    """Throughput, relative to the calibration workload, and peak memory of one parser on its fixture"""
+    fixture, module_name, class_name, parser, header, size = case
+    module = importlib.import_module(f"package_managers.{module_name}")
+    # Constructing a manager only looks up its command, no binary is needed
+    manager = getattr(module, class_name)()
+    parse = getattr(manager, parser)
+    stdout = load_fixture(fixture, header, size)
+    lines = stdout.count('\n')
+
+    packages = parse(stdout)
+    parse_timer = Timer(lambda: parse(stdout))
+    calibration_timer = Timer(calibration_workload())
+    # Alternating samples see the same background load
+    for _ in range(repeat):
+        calibration_timer.sample()
+        parse_timer.sample()
+    lines_per_sec = lines / parse_timer.median()
+    calibration = CALIBRATION_LINES / calibration_timer.median()
+    tracemalloc.start()
+    parse(stdout)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'lines': lines,
+        'packages': len(packages),
+        'lines_per_sec': round(lines_per_sec),
+        # Parsed lines per line of the calibration workload
+        'relative': round(lines_per_sec / calibration, 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def broken(results: dict) -> list:
+    """Parsers that found nothing in their fixture, as messages"""
+    return [f"{name}: no packages parsed from {result['lines']} lines"
+            for name, result in results['parsers'].items() if result['lines'] and not result['packages']]
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of the results against the baseline, as messages"""
+    regressions = []
+    for name, result in results['parsers'].items():
+        expected = baseline['parsers'].get(name)
+        if expected is None:
+            continue
+        floor = expected['relative'] * (1 - tolerance)
+        if result['relative'] < floor:
+            regressions.append(f"{name}: {result['relative']} lines per calibration line, "
+                               f"expected at least {floor:.3f}")
+        ceiling = expected['peak_kib'] * (1 + tolerance)
+        if result['peak_kib'] > ceiling:
+            regressions.append(f"{name}: peak {result['peak_kib']} KiB, expected at most {ceiling:.1f}")
+        if result['packages'] != expected['packages']:
+            regressions.append(f"{name}: {result['packages']} packages, baseline parsed {expected['packages']}")
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Measure package manager output parsing")
+    parser.add_argument('--repeat', type=int, default=15,
+                        help="timed samples per parser and of the calibration, the median counts")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown or memory growth against the baseline (0.25 = 25%%)")
+    parser.add_argument('--baseline', default=BASELINE, help="baseline file")
+    parser.add_argument('--update-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--only', help="run the parsers whose name contains this text")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    args = parser.parse_args()
+
+    cases = [case for case in CASES if not args.only or args.only in case[0]]
+    results = {'parsers': {}}
+    for case in cases:
+        results['parsers'][case[0]] = run_case(case, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'parser':<20}{'lines':>8}{'packages':>10}{'lines/s':>12}{'relative':>10}{'peak KiB':>11}")
+        for name, result in results['parsers'].items():
+            print(f"{name:<20}{result['lines']:>8}{result['packages']:>10}"
+                  f"{result['lines_per_sec']:>12}{result['relative']:>10.3f}{result['peak_kib']:>11.1f}")
+
+    # A parser that matches nothing is fast, but broken, and must never
+    # become the baseline
+    failures = broken(results)
+    for message in failures:
+        print(f"✗ {message}", file=sys.stderr)
+    if failures:
+        return 1
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        print("No baseline to compare against, run with --update-baseline", file=sys.stderr)
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"✗ {message}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for Orange Update
+Launches the GUI (offscreen by default) several times and reports the time
+from process launch to the window's first paint and to the point where the
+first package lists are loaded (time-to-interactive).
+
+The first run uses an empty cache directory (cold), the following runs reuse
+it (warm). Thresholds make the script usable as a CI gate:
+
+    python3 benchmarks/startup.py --runs 5 --max-first-paint 1500 --max-interactive 5000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT = os.path.join(ROOT, 'orange-update.py')
+MILESTONES = ('imported', 'shown', 'first_paint', 'detected', 'interactive')
+
+
+def run_once(cache_home: str, timeout: float) -> dict:
+    """Start the application once and return milestone times in ms since launch"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        trace_path = f.name
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env.update({
+        'ORANGE_UPDATE_STARTUP_TRACE': trace_path,
+        'ORANGE_UPDATE_STARTUP_EXIT': '1',
+        # Authentication prompts would stall the run
+        'ORANGE_UPDATE_NO_HELPER': '1',
+        'XDG_CACHE_HOME': cache_home,
+    })
+    try:
+        launched = time.time()
+        subprocess.run([sys.executable, ENTRY_POINT], env=env, timeout=timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(trace_path, 'r', encoding='utf-8') as f:
+            marks = json.load(f).get('marks', {})
+    except (subprocess.TimeoutExpired, OSError, ValueError):
+        return {}
+    finally:
+        os.unlink(trace_path)
+    return {name: (stamp - launched) * 1000 for name, stamp in marks.items()}
+
+
+def summarize(runs: list) -> dict:
+    """Median of every milestone over the runs"""
+    summary = {}
+    for name in MILESTONES:
+        values = [run[name] for run in runs if name in run]
+        if values:
+            summary[name] = round(statistics.median(values), 1)
+    return summary
+
+
+def main() -> int:
+    """Run the benchmark"""
+    parser = argparse.ArgumentParser(description="Measure Orange Update startup time")
+    parser.add_argument('--runs', type=int, default=5, help="warm runs after the cold one")
+    parser.add_argument('--timeout', type=float, default=120, help="seconds allowed per run")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON")
+    parser.add_argument('--max-first-paint', type=float, help="fail if warm first paint exceeds this (ms)")
+    parser.add_argument('--max-interactive', type=float, help="fail if warm time-to-interactive exceeds this (ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='orange-update-startup-') as cache_home:
+        cold = run_once(cache_home, args.timeout)
+        warm = [run_once(cache_home, args.timeout) for _ in range(args.runs)]
+    results = {'cold': summarize([cold]), 'warm': summarize(warm), 'runs': len(warm)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'milestone':<14}{'cold ms':>10}{'warm ms':>10}")
+        for name in MILESTONES:
+            cold_ms = results['cold'].get(name, float('nan'))
+            warm_ms = results['warm'].get(name, float('nan'))
+            print(f"{name:<14}{cold_ms:>10.1f}{warm_ms:>10.1f}")
+
+    failed = False
+    for name, limit in (('first_paint', args.max_first_paint), ('interactive', args.max_interactive)):
+        if limit is None:
+            continue
+        value = results['warm'].get(name)
+        if value is None or value > limit:
+            print(f"✗ {name} {value} ms exceeds {limit:g} ms", file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
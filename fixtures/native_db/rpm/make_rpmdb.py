@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Generate the rpmdb.sqlite fixture with a handful of rpm headers
+Run from this directory to regenerate rpmdb.sqlite.
+"""
+import os
+import sqlite3
+import struct
+
+INT32, STRING, STRING_ARRAY, I18NSTRING = 4, 6, 8, 9
+
+# (basename, header number) rows of the Basenames index
+BASENAMES = [('bash', 1), ('sh', 1), ('libc.so.6', 2), ('vim', 3)]
+
+PACKAGES = [
+    {
+        1000: (STRING, 'bash'), 1001: (STRING, '5.2.26'), 1002: (STRING, '3.fc40'),
+        1004: (I18NSTRING, 'The GNU Bourne Again shell'), 1022: (STRING, 'x86_64'),
+        1047: (STRING_ARRAY, ['bash', '/bin/sh']),
+        1049: (STRING_ARRAY, ['glibc', 'ncurses-libs'])
+    },
+    {
+        1000: (STRING, 'glibc'), 1001: (STRING, '2.39'), 1002: (STRING, '4.fc40'),
+        1004: (I18NSTRING, 'The GNU libc libraries'), 1022: (STRING, 'x86_64'),
+        1047: (STRING_ARRAY, ['glibc']),
+        1049: (STRING_ARRAY, ['basesystem'])
+    },
+    {
+        1000: (STRING, 'vim-enhanced'), 1001: (STRING, '9.1.158'), 1002: (STRING, '1.fc40'),
+        1003: (INT32, 2), 1004: (I18NSTRING, 'A version of the VIM editor which includes recent enhancements'),
+        1022: (STRING, 'x86_64'),
+        1047: (STRING_ARRAY, ['vim-enhanced', 'vim']),
+        1049: (STRING_ARRAY, ['glibc', 'vim-common', '/usr/bin/bash'])
+    },
+    {
+        1000: (STRING, 'gpg-pubkey'), 1001: (STRING, 'a15b79cc'), 1002: (STRING, '63d04c2c'),
+        1004: (I18NSTRING, 'Fedora (40) <fedora-40-primary@fedoraproject.org> public key')
+    },
+]
+
+
+def build_header(tags):
+    """Serialize tags into an rpm header blob (without the magic)"""
+    index = b''
+    data = b''
+    for tag in sorted(tags):
+        tag_type, value = tags[tag]
+        if tag_type == INT32:
+            data += b'\0' * (-len(data) % 4)
+            payload, count = struct.pack('>i', value), 1
+        elif tag_type == STRING_ARRAY:
+            payload = b''.join(v.encode() + b'\0' for v in value)
+            count = len(value)
+        else:
+            payload, count = value.encode() + b'\0', 1
+        index += struct.pack('>IIiI', tag, tag_type, len(data), count)
+        data += payload
+    return struct.pack('>II', len(tags), len(data)) + index + data
+
+
+def main():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rpmdb.sqlite')
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE Packages (hnum INTEGER PRIMARY KEY AUTOINCREMENT, blob BLOB NOT NULL)"
+    )
+    for tags in PACKAGES:
+        connection.execute("INSERT INTO Packages (blob) VALUES (?)", (build_header(tags),))
+    connection.execute("CREATE TABLE Basenames (key TEXT NOT NULL, hnum INTEGER NOT NULL, idx INTEGER NOT NULL)")
+    connection.executemany("INSERT INTO Basenames VALUES (?, ?, 0)", BASENAMES)
+    connection.commit()
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Orange Update - Universal Package Manager CLI
+Headless entry point, writes JSON lines
+"""
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from cli.main import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Headless command line interface for Orange Update
+Drives the package_managers backends without the GUI and writes one JSON
+object per line to stdout. Qt is never imported.
+"""
+from typing import List, Dict, Optional
+import argparse
+import json
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Backend modules are imported by the commands that use them, so --help
+# and a cron job listing packages don't pay for the scheduler or the index
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# Hosts the fleet command works on at the same time
+DEFAULT_JOBS = 8
+
+# Actions accepted in batch files
+BATCH_ACTIONS = ('install', 'remove', 'upgrade')
+
+
+def emit(record: Dict):
+    """Write one JSON line"""
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+    sys.stdout.flush()
+
+
+def select_managers(names: Optional[List[str]]) -> List:
+    """Detected managers, limited to the ones named with --manager"""
+    from package_managers.detector import PackageManagerDetector
+    managers = PackageManagerDetector(verbose=False).get_available_managers()
+    if not names:
+        return managers
+    wanted = {name.lower() for name in names}
+    return [manager for manager in managers if manager.name.lower() in wanted]
+
+
+def find_manager(managers: List, name: Optional[str]):
+    """Manager a package belongs to; the only one if there is just one"""
+    if name:
+        for manager in managers:
+            if manager.name.lower() == name.lower():
+                return manager
+        return None
+    return managers[0] if len(managers) == 1 else None
+
+
+def cmd_list(args, managers: List) -> int:
+    """List installed or upgradable packages"""
+    from package_managers.aggregate import AggregateManager
+    from package_managers.cache import InventoryCache
+    cache = InventoryCache(enabled=False if args.no_cache else None)
+    if args.command == 'list':
+        load = lambda manager: cache.list_installed(manager, args.refresh)
+    else:
+        load = lambda manager: cache.list_upgradable(manager, args.refresh)
+    errors = {}
+    packages = AggregateManager(managers, timeout=args.timeout).gather(load, errors)
+    for package in packages:
+        emit({'type': 'package', **package.to_dict()})
+    for name, error in errors.items():
+        emit({'type': 'error', 'manager': name, 'error': error})
+    return EXIT_FAILED if errors else EXIT_OK
+
+
+def cmd_search(args, managers: List) -> int:
+    """Search the local index, or the CLIs of backends without one"""
+    from package_managers.aggregate import AggregateManager
+    from package_managers.search_index import SearchIndex
+    index = SearchIndex()
+    indexed = [manager for manager in managers if index.covers(manager)]
+    others = [manager for manager in managers if manager not in indexed]
+    packages = index.search(indexed, args.query, limit=args.limit) if indexed else []
+    errors = {}
+    if others:
+        packages += AggregateManager(others, timeout=args.timeout).gather(
+            lambda manager: manager.search(args.query), errors
+        )
+    # The index stops at the limit on its own, the CLI results don't
+    packages = packages[:args.limit]
+    for package in packages:
+        emit({'type': 'package', **package.to_dict()})
+    for name, error in errors.items():
+        emit({'type': 'error', 'manager': name, 'error': error})
+    return EXIT_FAILED if errors else EXIT_OK
+
+
+def run_jobs(args, jobs: List[tuple]) -> int:
+    """
+    Run (manager, kind, args) jobs through the scheduler, so backends with
+    separate locks work in parallel, and report every package outcome.
+    """
+    from package_managers.batch import BatchResult
+    from package_managers.scheduler import OperationScheduler
+    
+    def on_output(operation, line):
+        if args.verbose:
+            emit({'type': 'output', 'manager': operation.manager.name, 'line': line})
+    
+    scheduler = OperationScheduler(on_output=on_output)
+    operations = [scheduler.submit(manager, kind, *job_args) for manager, kind, job_args in jobs]
+    scheduler.wait()
+    
+    failed = False
+    for operation in operations:
+        result = operation.result
+        name = operation.manager.name
+        if isinstance(result, BatchResult):
+            for package, outcome in result.outcomes.items():
+                record = {'type': 'outcome', 'manager': name, 'action': operation.kind.replace('_packages', ''),
+                          'package': package, 'outcome': outcome}
+                if package in result.messages:
+                    record['message'] = result.messages[package]
+                emit(record)
+            returncode, stderr = result.returncode, result.stderr
+        else:
+            returncode, _, stderr = result
+        record = {'type': 'result', 'manager': name, 'operation': operation.describe(), 'returncode': returncode}
+        if returncode != 0:
+            failed = True
+            record['error'] = stderr[-2000:]
+        emit(record)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def cmd_packages(args, managers: List) -> int:
+    """install / remove / upgrade of packages on one manager"""
+    if args.command == 'upgrade' and not args.packages:
+        # Full upgrade of every selected backend
+        return run_jobs(args, [(manager, 'upgrade', ()) for manager in managers])
+    
+    manager = find_manager(managers, args.manager[0] if args.manager else None)
+    if manager is None:
+        emit({'type': 'error', 'error': 'Select the package manager with --manager'})
+        return EXIT_USAGE
+    return run_jobs(args, [(manager, f"{args.command}_packages", (args.packages,))])
+
+
+def read_batch(stream) -> List[Dict]:
+    """Read batch entries: JSON lines like {"action": "install", "package": "vim", "manager": "APT"}"""
+    entries = []
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}")
+        if entry.get('action') not in BATCH_ACTIONS or not entry.get('package'):
+            raise ValueError(f"line {number}: expected an action in {BATCH_ACTIONS} and a package")
+        entries.append(entry)
+    return entries
+
+
+def cmd_batch(args, managers: List) -> int:
+    """Run a file of package actions, one transaction per manager and action"""
+    try:
+        if args.file == '-':
+            entries = read_batch(sys.stdin)
+        else:
+            with open(args.file, 'r', encoding='utf-8') as f:
+                entries = read_batch(f)
+    except (OSError, ValueError) as e:
+        emit({'type': 'error', 'error': str(e)})
+        return EXIT_USAGE
+    
+    groups: Dict[tuple, List[str]] = {}
+    for entry in entries:
+        manager = find_manager(managers, entry.get('manager'))
+        if manager is None:
+            emit({'type': 'error', 'package': entry['package'],
+                  'error': f"No package manager {entry.get('manager') or '(unspecified)'}"})
+            return EXIT_USAGE
+        groups.setdefault((manager.name, entry['action']), []).append(entry['package'])
+    
+    jobs = []
+    for (name, action), packages in groups.items():
+        manager = find_manager(managers, name)
+        jobs.append((manager, f"{action}_packages", (packages,)))
+    return run_jobs(args, jobs)
+
+
+def read_hosts(stream) -> List[str]:
+    """Read a hosts file: one ssh destination per line, # starts a comment"""
+    hosts = []
+    for line in stream:
+        line = line.split('#', 1)[0].strip()
+        if line:
+            hosts.append(line)
+    return hosts
+
+
+def cmd_fleet(args, managers: List) -> int:
+    """List available updates on many hosts over SSH, host by host as they answer"""
+    import asyncio
+    from package_managers.fleet import Fleet
+    from package_managers.transport import SshTransport
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        try:
+            if args.hosts_file == '-':
+                hosts += read_hosts(sys.stdin)
+            else:
+                with open(args.hosts_file, 'r', encoding='utf-8') as f:
+                    hosts += read_hosts(f)
+        except OSError as e:
+            emit({'type': 'error', 'error': str(e)})
+            return EXIT_USAGE
+    if not hosts:
+        emit({'type': 'error', 'error': "No hosts given"})
+        return EXIT_USAGE
+    
+    def on_result(result):
+        for package in result.packages:
+            emit({'type': 'package', 'host': result.host, **package.to_dict()})
+        record = {'type': 'host', 'host': result.host, 'upgradable': len(result.packages),
+                  'seconds': round(result.seconds, 3)}
+        if result.errors:
+            record['errors'] = result.errors
+        emit(record)
+    
+    fleet = Fleet([SshTransport(host) for host in dict.fromkeys(hosts)], concurrency=args.jobs,
+                  timeout=args.timeout, managers=args.manager)
+    try:
+        view = asyncio.run(fleet.upgradable(on_result))
+    finally:
+        fleet.close()
+    for update in view.rows():
+        emit({'type': 'update', 'manager': update.manager, 'name': update.name,
+              'new_version': update.new_version, 'hosts': update.hosts})
+    return EXIT_FAILED if view.failed_hosts() else EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Command line arguments"""
+    parser = argparse.ArgumentParser(
+        prog='orange-update-cli',
+        description="Orange Update without the GUI. Writes one JSON object per line."
+    )
+    parser.add_argument('-m', '--manager', action='append',
+                        help="package manager to use (repeatable, default: all detected)")
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help="seconds to wait for each backend's listing (each host's with fleet)")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="also emit the output lines of running operations")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    for name, text in (('list', "list installed packages"), ('upgradable', "list available updates")):
+        sub = subparsers.add_parser(name, help=text)
+        sub.add_argument('--refresh', action='store_true', help="bypass the inventory cache")
+        sub.add_argument('--no-cache', action='store_true', help="neither read nor write the cache")
+        sub.set_defaults(handler=cmd_list)
+    
+    sub = subparsers.add_parser('search', help="search for packages")
+    sub.add_argument('query')
+    sub.add_argument('--limit', type=int, default=500)
+    sub.set_defaults(handler=cmd_search)
+    
+    for name, text in (('install', "install packages"), ('remove', "remove packages"),
+                       ('upgrade', "upgrade packages, or everything if none are given")):
+        sub = subparsers.add_parser(name, help=text)
+        sub.add_argument('packages', nargs='*' if name == 'upgrade' else '+')
+        sub.set_defaults(handler=cmd_packages)
+    
+    sub = subparsers.add_parser('batch', help="run package actions from a JSON lines file ('-' for stdin)")
+    sub.add_argument('file')
+    sub.set_defaults(handler=cmd_batch)
+    
+    sub = subparsers.add_parser('fleet', help="list available updates on remote hosts over SSH")
+    sub.add_argument('hosts', nargs='*', help="ssh destinations (user@host or a ~/.ssh/config alias)")
+    sub.add_argument('-f', '--hosts-file', help="file with one host per line ('-' for stdin)")
+    sub.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS, help="hosts worked on at the same time")
+    sub.set_defaults(handler=cmd_fleet, local=False)
+    parser.set_defaults(local=True)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main entry point"""
+    args = build_parser().parse_args(argv)
+    # Commands on remote hosts detect the backends of each host themselves
+    managers = []
+    if args.local:
+        managers = select_managers(args.manager)
+        if not managers:
+            emit({'type': 'error', 'error': "No supported package managers found"})
+            return EXIT_FAILED
+    try:
+        return args.handler(args, managers)
+    except BrokenPipeError:
+        # Output piped into head & co. that stopped reading
+        sys.stdout = open(os.devnull, 'w')
+        return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
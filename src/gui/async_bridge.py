@@ -0,0 +1,80 @@
+"""
+Async bridge - runs the backends' coroutines for the GUI
+One asyncio event loop in a background thread drives every submitted
+coroutine, so any number of concurrent queries costs one thread instead of
+a QThread each. Results come back as Qt signals on the GUI thread.
+"""
+from typing import Callable, Optional, Any
+from concurrent.futures import Future
+import asyncio
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class AsyncBridge(QObject):
+    """
+    Submits coroutines to the shared event loop and calls back on the GUI
+    thread when they finish. Cancelled coroutines call nothing back.
+    """
+    # (on_done, on_error, result, error) of a finished coroutine
+    completed = pyqtSignal(object, object, object, object)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.completed.connect(self.on_completed)
+    
+    def start(self):
+        """Start the event loop thread if it isn't running"""
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='asyncio', daemon=True)
+        self.thread.start()
+    
+    def submit(self, coroutine, on_done: Callable[[Any], None],
+               on_error: Optional[Callable[[BaseException], None]] = None) -> Future:
+        """
+        Run a coroutine on the event loop; on_done gets its result and
+        on_error any exception. Cancel the returned future to stop it.
+        """
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            # Emitted from the loop thread, delivered on the GUI thread
+            self.completed.emit(on_done, on_error, None if error else future.result(), error)
+        
+        future.add_done_callback(done)
+        return future
+    
+    def on_completed(self, on_done, on_error, result, error):
+        """Call back the submitter of a finished coroutine"""
+        if error is None:
+            on_done(result)
+        elif on_error is not None:
+            on_error(error)
+    
+    def close(self):
+        """Cancel what is still running and stop the event loop"""
+        if self.thread is None:
+            return
+        
+        async def shutdown():
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            # Let the cancelled tasks kill their commands
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.thread = None
@@ -0,0 +1,112 @@
+"""
+Diagnostics dialog - shows where backend calls spend their time
+"""
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+    QTableWidgetItem, QHeaderView, QFileDialog, QMessageBox, QAbstractItemView
+)
+from PyQt5.QtCore import Qt
+from package_managers.tracing import tracer, COMMAND, PARSE
+
+COLUMNS = ["Backend", "Operation", "Calls", "Slowest", "Average", "Command", "Parsing", "Our code"]
+
+
+class SecondsItem(QTableWidgetItem):
+    """Table cell showing a duration that sorts by its value"""
+    
+    def __init__(self, seconds: float):
+        super().__init__(f"{seconds * 1000:.1f} ms")
+        self.seconds = seconds
+        self.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+    
+    def __lt__(self, other):
+        if isinstance(other, SecondsItem):
+            return self.seconds < other.seconds
+        return super().__lt__(other)
+
+
+class DiagnosticsDialog(QDialog):
+    """
+    Slowest backend calls and table updates per backend. The command column
+    is time spent waiting for the package manager, parsing is our parsers,
+    and "our code" is whatever else the call did (or the table update, for
+    render rows).
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.resize(900, 500)
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("Slowest operations per backend since startup (times per call):"))
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+        
+        buttons = QHBoxLayout()
+        refresh_btn = QPushButton("🔄 Refresh")
+        refresh_btn.clicked.connect(self.refresh)
+        buttons.addWidget(refresh_btn)
+        export_btn = QPushButton("💾 Export Chrome Trace...")
+        export_btn.clicked.connect(self.export_trace)
+        buttons.addWidget(export_btn)
+        clear_btn = QPushButton("Clear")
+        clear_btn.clicked.connect(self.clear)
+        buttons.addWidget(clear_btn)
+        buttons.addStretch()
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+        self.refresh()
+    
+    def refresh(self):
+        """Fill the table from the recorded spans"""
+        rows = tracer.summary()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(rows))
+        for row, group in enumerate(rows):
+            calls = group['calls']
+            command = group[COMMAND] / calls
+            parse = group[PARSE] / calls
+            average = group['total'] / calls
+            calls_item = QTableWidgetItem()
+            calls_item.setData(Qt.DisplayRole, calls)
+            items = [
+                QTableWidgetItem(group['backend'] or "-"),
+                QTableWidgetItem(f"{group['operation']} ({group['category']})"),
+                calls_item,
+                SecondsItem(group['max']),
+                SecondsItem(average),
+                SecondsItem(command),
+                SecondsItem(parse),
+                SecondsItem(max(0.0, average - command - parse)),
+            ]
+            for column, item in enumerate(items):
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        self.table.sortItems(COLUMNS.index("Slowest"), Qt.DescendingOrder)
+    
+    def export_trace(self):
+        """Save the spans as a Chrome trace file"""
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Chrome Trace", "orange-update-trace.json", "Trace files (*.json)"
+        )
+        if not path:
+            return
+        try:
+            tracer.export_chrome(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", str(e))
+    
+    def clear(self):
+        """Forget the recorded spans"""
+        tracer.clear()
+        self.refresh()
@@ -4,11 +4,11 @@ Main GUI for Orange Update - Universal Package Manager
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTabWidget, QTableWidget, QTableWidgetItem, QPushButton, QLabel,
-    QLineEdit, QTextEdit, QMessageBox, QProgressDialog, QHeaderView,
-    QComboBox, QSplitter, QGroupBox
+    QTabWidget, QPushButton, QLabel,
+    QLineEdit, QTextEdit, QMessageBox, QHeaderView, QProgressBar,
+    QComboBox
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, QEvent, pyqtSignal
 from PyQt5.QtGui import QIcon, QFont
 import sys
 import os
@@ -16,13 +16,34 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from package_managers.base import PackageManager
 from package_managers.detector import PackageManagerDetector
+from package_managers.aggregate import AggregateManager
+from package_managers.progress import parse_progress
+from package_managers.batch import BatchResult, OK
+from package_managers.scheduler import QUEUED, RUNNING, DONE, FAILED, CANCELLED
+from package_managers.tracing import tracer, RENDER
+from gui.refresh_pipeline import RefreshPipeline
+from gui.package_model import PackageTableModel, create_package_view
+from gui.operation_queue import SchedulerBridge, OperationQueuePanel
+from gui.startup_trace import StartupTrace
+
+# Features that aren't needed for the first paint (search index, dependency
+# graphs, dry runs, background checks and downloads, asyncio, dialogs) are
+# imported where they are first used
+
+# Background update checks start this long after the managers are detected
+UPDATE_CHECK_START_MS = 60 * 1000
+# Longest sleep between looking at the update check schedule
+UPDATE_CHECK_MAX_SLEEP = 3600
 
 
 class PackageWorker(QThread):
     """Worker thread for package operations to prevent GUI freezing"""
     finished = pyqtSignal(int, str, str)
+    packages_loaded = pyqtSignal(list)
     progress = pyqtSignal(str)
+    progress_step = pyqtSignal(int, str)
     
     def __init__(self, manager, operation, *args):
         super().__init__()
@@ -30,28 +51,36 @@ class PackageWorker(QThread):
         self.operation = operation
         self.args = args
     
+    def emit_output(self, line):
+        """Forward an output line and any progress it reports"""
+        self.progress.emit(line)
+        event = parse_progress(line)
+        if event:
+            percent = -1 if event.percent is None else int(event.percent)
+            self.progress_step.emit(percent, event.message)
+    
     def run(self):
         """Execute the package operation"""
         try:
             if self.operation == "update":
-                result = self.manager.update()
+                result = self.manager.update(on_output=self.emit_output)
             elif self.operation == "upgrade":
-                result = self.manager.upgrade(*self.args)
+                result = self.manager.upgrade(*self.args, on_output=self.emit_output)
             elif self.operation == "install":
-                result = self.manager.install(*self.args)
+                result = self.manager.install(*self.args, on_output=self.emit_output)
             elif self.operation == "remove":
-                result = self.manager.remove(*self.args)
+                result = self.manager.remove(*self.args, on_output=self.emit_output)
             elif self.operation == "search":
                 packages = self.manager.search(*self.args)
-                self.finished.emit(0, str(packages), "")
+                self.packages_loaded.emit(packages)
                 return
             elif self.operation == "list_installed":
                 packages = self.manager.list_installed()
-                self.finished.emit(0, str(packages), "")
+                self.packages_loaded.emit(packages)
                 return
             elif self.operation == "list_upgradable":
                 packages = self.manager.list_upgradable()
-                self.finished.emit(0, str(packages), "")
+                self.packages_loaded.emit(packages)
                 return
             else:
                 result = (-1, "", "Unknown operation")
@@ -61,14 +90,180 @@ class PackageWorker(QThread):
             self.finished.emit(-1, "", str(e))
 
 
+class IndexWorker(QThread):
+    """Worker thread bringing the local search index up to date"""
+    refreshed = pyqtSignal(int)
+    
+    def __init__(self, index, managers):
+        super().__init__()
+        self.index = index
+        self.managers = managers
+    
+    def run(self):
+        """Refresh the index segments of every manager"""
+        rebuilt = 0
+        for manager in self.managers:
+            try:
+                rebuilt += self.index.refresh(manager)
+            except Exception:
+                continue
+        self.refreshed.emit(rebuilt)
+
+
+class DependencyWorker(QThread):
+    """Worker thread syncing the dependency graphs with the package databases"""
+    refreshed = pyqtSignal(list)
+    
+    def __init__(self, graphs, managers):
+        super().__init__()
+        self.graphs = graphs
+        self.managers = managers
+    
+    def run(self):
+        """Sync the graph of every manager and collect the orphans"""
+        for manager in self.managers:
+            try:
+                self.graphs.refresh(manager)
+            except Exception:
+                continue
+        self.refreshed.emit(self.graphs.orphans(self.managers))
+
+
+class InventoryWorker(QThread):
+    """Worker thread querying the packages an operation touched"""
+    verified = pyqtSignal(object, object)
+    
+    def __init__(self, operation, names):
+        super().__init__()
+        self.operation = operation
+        self.names = names
+    
+    def run(self):
+        """Query the installed state of just the operation's packages"""
+        try:
+            records = self.operation.manager.query_installed(self.names)
+        except Exception:
+            records = None
+        self.verified.emit(self.operation, records)
+
+
+class UpdateCheckWorker(QThread):
+    """Worker thread running the due background update checks"""
+    checked = pyqtSignal(list)
+    
+    def __init__(self, checker):
+        super().__init__()
+        self.checker = checker
+    
+    def run(self):
+        """Refresh metadata and upgradable lists of the due managers"""
+        self.checked.emit(self.checker.tick())
+
+
+class PrefetchWorker(QThread):
+    """Worker thread downloading pending upgrades ahead of time"""
+    progress = pyqtSignal(object, int, float)
+    prefetched = pyqtSignal(list)
+    
+    def __init__(self, prefetcher, jobs):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.jobs = jobs
+    
+    def run(self):
+        """Prefetch every (manager, upgradable packages) job"""
+        self.prefetcher.on_progress = self.progress.emit
+        self.prefetched.emit(self.prefetcher.prefetch_all(self.jobs))
+
+
+class PreviewWorker(QThread):
+    """Worker thread resolving transactions with the backends' dry runs"""
+    previewed = pyqtSignal(list)
+    
+    def __init__(self, previewer, kind, jobs):
+        super().__init__()
+        self.previewer = previewer
+        self.kind = kind
+        self.jobs = jobs
+    
+    def run(self):
+        """Preview every (manager, packages) job"""
+        self.previewed.emit([self.previewer.preview(manager, self.kind, packages)
+                             for manager, packages in self.jobs])
+
+
+class DetectionWorker(QThread):
+    """Worker thread detecting package managers after the window is shown"""
+    detected = pyqtSignal(list)
+    
+    def __init__(self, detector):
+        super().__init__()
+        self.detector = detector
+    
+    def run(self):
+        """Detect managers and load the first one, which is shown by default"""
+        names = self.detector.detect_managers()
+        if names:
+            self.detector.get_manager_by_name(names[0])
+        self.detected.emit(names)
+
+
 class OrangeUpdateGUI(QMainWindow):
     """Main window for Orange Update"""
     
-    def __init__(self):
+    def __init__(self, trace=None):
         super().__init__()
-        self.detector = PackageManagerDetector()
+        self.trace = trace or StartupTrace()
+        # Detection runs in a worker thread once the window is up
+        self.detector = PackageManagerDetector(detect=False)
+        self.detection_worker = None
+        self.manager_choices = []
+        self.aggregate_manager = None
         self.current_manager = None
-        self.worker = None
+        # CLI searches run as coroutines on the bridge's event loop, started
+        # by the first one
+        self.async_bridge = None
+        self.search_future = None
+        self.search_query = ""
+        self.index_worker = None
+        # Targeted queries after operations, several can run at once
+        self.inventory_workers = set()
+        # Created once the window has settled, see run_update_check()
+        self.update_checker = None
+        self.update_check_worker = None
+        self.update_check_timer = QTimer(self)
+        self.update_check_timer.setSingleShot(True)
+        self.update_check_timer.timeout.connect(self.run_update_check)
+        self.prefetcher = None
+        self.prefetch_worker = None
+        # Dry runs behind the confirmation dialogs; they may outlive a dialog
+        self.previewer = None
+        self.preview_workers = set()
+        # Reverse dependencies and orphans, synced after every transaction
+        self.dependency_graphs = None
+        self.dependency_worker = None
+        self.dependency_refresh_pending = False
+        # Operations finished since the queue was last empty
+        self.finished_operations = []
+        # Loaded once the first manager is selected, see indexed_managers()
+        self.search_index = None
+        # Results from the index while the CLI searches the other backends
+        self.index_results = []
+        # Query of a search waiting for the IndexWorker to load the index
+        self.pending_search = None
+        
+        self.refresh_pipeline = RefreshPipeline(parent=self)
+        self.refresh_pipeline.installed_loaded.connect(self.load_installed_packages)
+        self.refresh_pipeline.upgradable_loaded.connect(self.load_upgradable_packages)
+        self.refresh_pipeline.failed.connect(self.on_refresh_failed)
+        self.refresh_pipeline.backend_failed.connect(self.on_backend_failed)
+        self.refresh_pipeline.finished.connect(self.on_refresh_finished)
+        # Operations on backends with separate locks run in parallel
+        self.scheduler_bridge = SchedulerBridge(self)
+        self.scheduler = self.scheduler_bridge.scheduler
+        self.scheduler_bridge.changed.connect(self.on_operation_changed)
+        self.scheduler_bridge.output.connect(self.on_operation_output)
+        self.scheduler_bridge.progress_step.connect(self.on_operation_progress)
         self.init_ui()
     
     def init_ui(self):
@@ -98,25 +293,15 @@ class OrangeUpdateGUI(QMainWindow):
         selector_layout.addWidget(QLabel("Package Manager:"))
         
         self.manager_combo = QComboBox()
-        managers = self.detector.get_available_managers()
-        
-        if not managers:
-            QMessageBox.warning(
-                self, "No Package Managers",
-                "No supported package managers found on this system!"
-            )
-        else:
-            for manager in managers:
-                self.manager_combo.addItem(manager.name)
-            self.current_manager = managers[0]
-        
+        self.manager_combo.addItem("Detecting...")
+        self.manager_combo.setEnabled(False)
         self.manager_combo.currentIndexChanged.connect(self.on_manager_changed)
         selector_layout.addWidget(self.manager_combo)
         selector_layout.addStretch()
         
         # Refresh button
         self.refresh_btn = QPushButton("🔄 Refresh")
-        self.refresh_btn.clicked.connect(self.refresh_packages)
+        self.refresh_btn.clicked.connect(self.force_refresh_packages)
         selector_layout.addWidget(self.refresh_btn)
         
         main_layout.addLayout(selector_layout)
@@ -129,6 +314,7 @@ class OrangeUpdateGUI(QMainWindow):
         self.create_installed_tab()
         self.create_updates_tab()
         self.create_search_tab()
+        self.create_orphans_tab()
         
         # Action buttons
         button_layout = QHBoxLayout()
@@ -142,17 +328,87 @@ class OrangeUpdateGUI(QMainWindow):
         button_layout.addWidget(self.upgrade_all_btn)
         
         button_layout.addStretch()
+        
+        self.diagnostics_btn = QPushButton("🩺 Diagnostics")
+        self.diagnostics_btn.clicked.connect(self.show_diagnostics)
+        button_layout.addWidget(self.diagnostics_btn)
         main_layout.addLayout(button_layout)
         
         # Status/Output area
         self.output_text = QTextEdit()
         self.output_text.setReadOnly(True)
         self.output_text.setMaximumHeight(150)
+        # Streamed output is capped so long transactions don't pile up in memory
+        self.output_text.document().setMaximumBlockCount(2000)
         main_layout.addWidget(QLabel("Output:"))
         main_layout.addWidget(self.output_text)
         
-        # Initial load
-        self.refresh_packages()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        self.progress_bar.hide()
+        main_layout.addWidget(self.progress_bar)
+        
+        self.queue_panel = OperationQueuePanel(self.scheduler)
+        self.queue_panel.setMaximumHeight(140)
+        main_layout.addWidget(self.queue_panel)
+        
+        self.update_manager_columns()
+        self.installEventFilter(self)
+        # Detect managers and load packages once the window has been shown
+        QTimer.singleShot(0, self.start_detection)
+    
+    def eventFilter(self, watched, event):
+        """Note the first paint of the window for the startup trace"""
+        if watched is self and event.type() == QEvent.Paint:
+            self.trace.mark('first_paint')
+            self.removeEventFilter(self)
+        return super().eventFilter(watched, event)
+    
+    def start_detection(self):
+        """Detect package managers in the background"""
+        self.log_output("Detecting package managers...")
+        self.detection_worker = DetectionWorker(self.detector)
+        self.detection_worker.detected.connect(self.on_managers_detected)
+        self.detection_worker.start()
+    
+    def on_managers_detected(self, names):
+        """Fill the manager selector and load the first manager's packages"""
+        self.trace.mark('detected')
+        self.manager_choices = list(names)
+        if len(names) > 1:
+            # Unified view over every detected backend
+            self.manager_choices.append(AggregateManager.NAME)
+        
+        self.manager_combo.blockSignals(True)
+        self.manager_combo.clear()
+        self.manager_combo.addItems(self.manager_choices)
+        self.manager_combo.blockSignals(False)
+        self.manager_combo.setEnabled(bool(names))
+        
+        if not names:
+            self.trace.finish(QApplication.instance())
+            QMessageBox.warning(
+                self, "No Package Managers",
+                "No supported package managers found on this system!"
+            )
+            return
+        
+        # Authenticate once per session and run root operations through the helper
+        if os.geteuid() != 0 and not os.environ.get('ORANGE_UPDATE_NO_HELPER'):
+            from package_managers.privileged_helper import HelperClient
+            PackageManager.privileged_helper = HelperClient()
+        self.on_manager_changed(0)
+        if not os.environ.get('ORANGE_UPDATE_NO_UPDATE_CHECK'):
+            self.update_check_timer.start(UPDATE_CHECK_START_MS)
+    
+    def manager_for_choice(self, index):
+        """Get the manager behind a selector entry, loading it on first use"""
+        name = self.manager_choices[index]
+        if name == AggregateManager.NAME:
+            if self.aggregate_manager is None:
+                self.aggregate_manager = AggregateManager(self.detector.get_available_managers())
+            return self.aggregate_manager
+        return self.detector.get_manager_by_name(name)
     
     def create_installed_tab(self):
         """Create the installed packages tab"""
@@ -160,13 +416,24 @@ class OrangeUpdateGUI(QMainWindow):
         layout = QVBoxLayout()
         
         # Table for installed packages
-        self.installed_table = QTableWidget()
-        self.installed_table.setColumnCount(3)
-        self.installed_table.setHorizontalHeaderLabels(["Package Name", "Version", "Actions"])
-        self.installed_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.installed_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.installed_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.installed_model = PackageTableModel(
+            [
+                ("Package Name", 'name', ''),
+                ("Manager", 'manager', ''),
+                ("Version", 'version', '')
+            ],
+            "🗑️ Remove", self
+        )
+        self.installed_table = create_package_view(self.installed_model)
+        self.installed_table.action_delegate.clicked.connect(
+            lambda row: self.remove_package(*self.package_target(self.installed_model, row))
+        )
         
+        self.remove_selected_btn = QPushButton("🗑️ Remove Selected")
+        self.remove_selected_btn.clicked.connect(
+            lambda: self.run_batch("remove", self.installed_model, self.installed_table)
+        )
+        layout.addLayout(self.create_selection_bar(self.remove_selected_btn))
         layout.addWidget(self.installed_table)
         tab.setLayout(layout)
         self.tabs.addTab(tab, "Installed Packages")
@@ -177,19 +444,38 @@ class OrangeUpdateGUI(QMainWindow):
         layout = QVBoxLayout()
         
         # Table for upgradable packages
-        self.updates_table = QTableWidget()
-        self.updates_table.setColumnCount(4)
-        self.updates_table.setHorizontalHeaderLabels(
-            ["Package Name", "Current Version", "New Version", "Actions"]
+        self.updates_model = PackageTableModel(
+            [
+                ("Package Name", 'name', ''),
+                ("Manager", 'manager', ''),
+                ("Current Version", 'version', 'N/A'),
+                ("New Version", 'new_version', 'N/A')
+            ],
+            "⬆️ Upgrade", self
+        )
+        self.updates_table = create_package_view(self.updates_model)
+        self.updates_table.action_delegate.clicked.connect(
+            lambda row: self.upgrade_package(*self.package_target(self.updates_model, row))
         )
-        self.updates_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.updates_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.updates_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
-        self.updates_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
         
+        self.upgrade_selected_btn = QPushButton("⬆️ Upgrade Selected")
+        self.upgrade_selected_btn.clicked.connect(
+            lambda: self.run_batch("upgrade", self.updates_model, self.updates_table)
+        )
+        layout.addLayout(self.create_selection_bar(self.upgrade_selected_btn))
         layout.addWidget(self.updates_table)
         tab.setLayout(layout)
-        self.tabs.addTab(tab, "Available Updates")
+        self.updates_tab_index = self.tabs.addTab(tab, "Available Updates")
+        # Keep the number of updates in the tab title
+        for signal in (self.updates_model.modelReset, self.updates_model.rowsInserted,
+                       self.updates_model.rowsRemoved):
+            signal.connect(self.update_updates_tab_title)
+    
+    def update_updates_tab_title(self, *args):
+        """Show the number of available updates in the tab title"""
+        count = self.updates_model.rowCount()
+        title = f"Available Updates ({count})" if count else "Available Updates"
+        self.tabs.setTabText(self.updates_tab_index, title)
     
     def create_search_tab(self):
         """Create the search packages tab"""
@@ -203,6 +489,13 @@ class OrangeUpdateGUI(QMainWindow):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("Enter package name...")
         self.search_input.returnPressed.connect(self.search_packages)
+        
+        # Search the local index as the user types, once typing pauses
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.search_as_you_type)
+        self.search_input.textChanged.connect(lambda: self.search_timer.start())
         search_layout.addWidget(self.search_input)
         
         self.search_btn = QPushButton("🔍 Search")
@@ -212,72 +505,249 @@ class OrangeUpdateGUI(QMainWindow):
         layout.addLayout(search_layout)
         
         # Search results table
-        self.search_table = QTableWidget()
-        self.search_table.setColumnCount(3)
-        self.search_table.setHorizontalHeaderLabels(["Package Name", "Description", "Actions"])
-        self.search_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
-        self.search_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
-        self.search_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.search_model = PackageTableModel(
+            [
+                ("Package Name", 'name', ''),
+                ("Manager", 'manager', ''),
+                ("Description", 'description', '')
+            ],
+            "📦 Install", self
+        )
+        self.search_table = create_package_view(self.search_model, stretch_column=2)
+        self.search_table.action_delegate.clicked.connect(
+            lambda row: self.install_package(*self.package_target(self.search_model, row))
+        )
         
+        self.install_selected_btn = QPushButton("📦 Install Selected")
+        self.install_selected_btn.clicked.connect(
+            lambda: self.run_batch("install", self.search_model, self.search_table)
+        )
+        layout.addLayout(self.create_selection_bar(self.install_selected_btn))
         layout.addWidget(self.search_table)
         tab.setLayout(layout)
         self.tabs.addTab(tab, "Search Packages")
     
+    def create_orphans_tab(self):
+        """Create the tab listing packages no longer needed by anything"""
+        tab = QWidget()
+        layout = QVBoxLayout()
+        
+        self.orphans_model = PackageTableModel(
+            [
+                ("Package Name", 'name', ''),
+                ("Manager", 'manager', ''),
+                ("Version", 'version', ''),
+                ("Description", 'description', '')
+            ],
+            "🗑️ Remove", self
+        )
+        self.orphans_table = create_package_view(self.orphans_model, stretch_column=3)
+        self.orphans_table.action_delegate.clicked.connect(
+            lambda row: self.remove_package(*self.package_target(self.orphans_model, row))
+        )
+        
+        layout.addWidget(QLabel("Packages installed as dependencies that nothing installed needs anymore"))
+        self.remove_orphans_btn = QPushButton("🧹 Remove Selected")
+        self.remove_orphans_btn.clicked.connect(
+            lambda: self.run_batch("remove", self.orphans_model, self.orphans_table)
+        )
+        layout.addLayout(self.create_selection_bar(self.remove_orphans_btn))
+        layout.addWidget(self.orphans_table)
+        tab.setLayout(layout)
+        self.orphans_tab_index = self.tabs.addTab(tab, "Orphans")
+        for signal in (self.orphans_model.modelReset, self.orphans_model.rowsInserted,
+                       self.orphans_model.rowsRemoved):
+            signal.connect(self.update_orphans_tab_title)
+    
+    def update_orphans_tab_title(self, *args):
+        """Show the number of orphans in the tab title"""
+        count = self.orphans_model.rowCount()
+        self.tabs.setTabText(self.orphans_tab_index, f"Orphans ({count})" if count else "Orphans")
+    
+    def create_selection_bar(self, button):
+        """Create the row holding a tab's batch action button"""
+        bar = QHBoxLayout()
+        bar.addWidget(QLabel("Ctrl/Shift-click to select several packages"))
+        bar.addStretch()
+        bar.addWidget(button)
+        return bar
+    
     def on_manager_changed(self, index):
         """Handle package manager selection change"""
-        managers = self.detector.get_available_managers()
-        if 0 <= index < len(managers):
-            self.current_manager = managers[index]
+        if 0 <= index < len(self.manager_choices):
+            self.current_manager = self.manager_for_choice(index)
+            self.installed_model.clear()
+            self.updates_model.clear()
+            self.search_model.clear()
+            self.orphans_model.clear()
+            self.update_manager_columns()
             self.refresh_packages()
+            self.refresh_search_index()
+            self.refresh_dependency_graphs()
     
-    def refresh_packages(self):
-        """Refresh package lists"""
+    def is_aggregate_view(self):
+        """Check whether the unified all-managers view is selected"""
+        return isinstance(self.current_manager, AggregateManager)
+    
+    def update_manager_columns(self):
+        """Only show the manager column in the all-managers view"""
+        hidden = not self.is_aggregate_view()
+        for table in (self.installed_table, self.updates_table, self.search_table, self.orphans_table):
+            table.setColumnHidden(1, hidden)
+    
+    def package_target(self, model, row):
+        """Get (package name, owning manager) for a table row"""
+        pkg = model.package_at(row)
+        manager = self.current_manager
+        if self.is_aggregate_view():
+            manager = self.current_manager.get_manager(pkg.manager)
+        return pkg.name, manager
+    
+    def selected_targets(self, model, table):
+        """Group the selected rows of a table by owning manager"""
+        jobs = {}
+        for index in table.selectionModel().selectedRows():
+            name, manager = self.package_target(model, index.row())
+            if manager is None:
+                continue
+            jobs.setdefault(id(manager), (manager, []))[1].append(name)
+        return list(jobs.values())
+    
+    def refresh_packages(self, force=False):
+        """Refresh package lists in the background"""
         if not self.current_manager:
             return
         
         self.log_output(f"Refreshing package lists for {self.current_manager.name}...")
         
-        # Load installed packages
-        self.load_installed_packages()
-        
-        # Load upgradable packages
-        self.load_upgradable_packages()
+        # Both lists are loaded in parallel and fill their tables as they arrive
+        self.refresh_pipeline.start(self.current_manager, force)
+    
+    def force_refresh_packages(self):
+        """Refresh package lists, bypassing the inventory cache"""
+        self.refresh_packages(force=True)
     
-    def load_installed_packages(self):
+    def on_refresh_failed(self, kind, error):
+        """Handle a failed listing during refresh"""
+        self.log_output(f"✗ Failed to load {kind} packages: {error}")
+    
+    def on_backend_failed(self, name, error):
+        """Handle a backend that failed in the all-managers view"""
+        self.log_output(f"✗ {name} did not respond: {error}")
+    
+    def on_refresh_finished(self):
+        """Handle completion of a refresh"""
+        self.log_output(f"✓ Package lists refreshed for {self.current_manager.name}")
+        self.trace.finish(QApplication.instance())
+    
+    def load_installed_packages(self, packages):
         """Load installed packages into table"""
-        self.installed_table.setRowCount(0)
-        packages = self.current_manager.list_installed()
-        
-        self.installed_table.setRowCount(len(packages))
-        for i, pkg in enumerate(packages):
-            self.installed_table.setItem(i, 0, QTableWidgetItem(pkg.get('name', '')))
-            self.installed_table.setItem(i, 1, QTableWidgetItem(pkg.get('version', '')))
-            
-            # Add remove button
-            remove_btn = QPushButton("🗑️ Remove")
-            remove_btn.clicked.connect(lambda checked, p=pkg['name']: self.remove_package(p))
-            self.installed_table.setCellWidget(i, 2, remove_btn)
-        
+        with tracer.span('render installed', RENDER, backend=self.current_manager.name, rows=len(packages)):
+            self.installed_model.set_packages(packages)
         self.log_output(f"Loaded {len(packages)} installed packages")
     
-    def load_upgradable_packages(self):
+    def load_upgradable_packages(self, packages):
         """Load upgradable packages into table"""
-        self.updates_table.setRowCount(0)
-        packages = self.current_manager.list_upgradable()
-        
-        self.updates_table.setRowCount(len(packages))
-        for i, pkg in enumerate(packages):
-            self.updates_table.setItem(i, 0, QTableWidgetItem(pkg.get('name', '')))
-            self.updates_table.setItem(i, 1, QTableWidgetItem(pkg.get('current_version', 'N/A')))
-            self.updates_table.setItem(i, 2, QTableWidgetItem(pkg.get('new_version', 'N/A')))
-            
-            # Add upgrade button
-            upgrade_btn = QPushButton("⬆️ Upgrade")
-            upgrade_btn.clicked.connect(lambda checked, p=pkg['name']: self.upgrade_package(p))
-            self.updates_table.setCellWidget(i, 3, upgrade_btn)
-        
+        with tracer.span('render updates', RENDER, backend=self.current_manager.name, rows=len(packages)):
+            self.updates_model.set_packages(packages)
         self.log_output(f"Found {len(packages)} available updates")
     
+    def backend_managers(self):
+        """Real backends behind the current selection"""
+        if self.is_aggregate_view():
+            return list(self.current_manager.managers)
+        return [self.current_manager] if self.current_manager else []
+    
+    def indexed_managers(self):
+        """Split the current backends into (indexed, not indexed)"""
+        if self.search_index is None:
+            from package_managers.search_index import SearchIndex
+            self.search_index = SearchIndex()
+        indexed = []
+        others = []
+        for manager in self.backend_managers():
+            (indexed if self.search_index.covers(manager) else others).append(manager)
+        return indexed, others
+    
+    def refresh_search_index(self):
+        """Bring the local search index up to date in the background"""
+        indexed, _ = self.indexed_managers()
+        if not indexed or (self.index_worker and self.index_worker.isRunning()):
+            return
+        self.index_worker = IndexWorker(self.search_index, indexed)
+        self.index_worker.refreshed.connect(self.on_search_index_refreshed)
+        self.index_worker.start()
+    
+    def on_search_index_refreshed(self, rebuilt):
+        """Re-run the current query against the refreshed index"""
+        if rebuilt:
+            self.log_output(f"Search index updated ({rebuilt} sources rebuilt)")
+        if self.pending_search is not None:
+            query, self.pending_search = self.pending_search, None
+            indexed, others = self.indexed_managers()
+            # A backend whose index failed to load is searched with its CLI
+            ready = [manager for manager in indexed if self.index_ready([manager])]
+            self.start_search(query, ready, others + [manager for manager in indexed if manager not in ready])
+        elif self.search_input.text().strip():
+            self.search_as_you_type()
+    
+    def refresh_dependency_graphs(self):
+        """Sync the dependency graphs of the current backends in the background"""
+        if self.dependency_graphs is None:
+            from package_managers.depgraph import DependencyGraphs
+            self.dependency_graphs = DependencyGraphs()
+        managers = [manager for manager in self.backend_managers() if self.dependency_graphs.covers(manager)]
+        if not managers:
+            return
+        if self.dependency_worker and self.dependency_worker.isRunning():
+            # The database may have changed after the running sync read it
+            self.dependency_refresh_pending = True
+            return
+        self.dependency_refresh_pending = False
+        self.dependency_worker = DependencyWorker(self.dependency_graphs, managers)
+        self.dependency_worker.refreshed.connect(self.on_dependency_graphs_refreshed)
+        self.dependency_worker.start()
+    
+    def on_dependency_graphs_refreshed(self, orphans):
+        """Show the orphans of the synced graphs"""
+        if self.dependency_worker.managers == [manager for manager in self.backend_managers()
+                                               if self.dependency_graphs.covers(manager)]:
+            self.orphans_model.set_packages(orphans)
+        if self.dependency_refresh_pending:
+            QTimer.singleShot(0, self.refresh_dependency_graphs)
+    
+    def removal_warning(self, jobs):
+        """Name the installed packages a removal would break, from the dependency graphs"""
+        if self.dependency_graphs is None:
+            return ""
+        broken = []
+        for manager, packages in jobs:
+            broken.extend(self.dependency_graphs.breaks(manager, packages) or [])
+        if not broken:
+            return ""
+        listed = ', '.join(broken[:10])
+        if len(broken) > 10:
+            listed += f" and {len(broken) - 10} more"
+        return f"\nInstalled packages that would break: {listed}"
+    
+    def index_ready(self, managers):
+        """Check whether the index of every manager has been loaded"""
+        return all(manager.name in self.search_index.segments for manager in managers)
+    
+    def search_as_you_type(self):
+        """Show index results for the current search text"""
+        query = self.search_input.text().strip()
+        if not query:
+            self.search_model.clear()
+            return
+        if len(query) < 2:
+            # Single characters match most of the repository
+            return
+        indexed, _ = self.indexed_managers()
+        # Indexes still loading re-run the search once they are ready
+        if indexed and self.index_ready(indexed):
+            self.search_model.set_packages(self.search_index.search(indexed, query))
+    
     def search_packages(self):
         """Search for packages"""
         query = self.search_input.text().strip()
@@ -285,23 +755,81 @@ class OrangeUpdateGUI(QMainWindow):
             QMessageBox.warning(self, "Empty Search", "Please enter a search term")
             return
         
+        self.search_timer.stop()
         self.log_output(f"Searching for '{query}'...")
-        self.search_table.setRowCount(0)
-        
-        packages = self.current_manager.search(query)
-        
-        self.search_table.setRowCount(len(packages))
-        for i, pkg in enumerate(packages):
-            self.search_table.setItem(i, 0, QTableWidgetItem(pkg.get('name', '')))
-            self.search_table.setItem(i, 1, QTableWidgetItem(pkg.get('description', '')))
-            
-            # Add install button
-            install_btn = QPushButton("📦 Install")
-            install_btn.clicked.connect(lambda checked, p=pkg['name']: self.install_package(p))
-            self.search_table.setCellWidget(i, 2, install_btn)
+        self.supersede_search(query)
+        indexed, others = self.indexed_managers()
+        if indexed and not self.index_ready(indexed):
+            # Loading an index parses every metadata file, which would freeze
+            # the window; the IndexWorker runs the search once it is done
+            self.pending_search = query
+            self.refresh_search_index()
+            return
+        self.start_search(query, indexed, others)
+    
+    def supersede_search(self, query):
+        """Make query the current search, cancelling a CLI search still running for an older one"""
+        if self.search_future is not None:
+            self.search_future.cancel()
+            self.search_future = None
+            self.search_btn.setEnabled(True)
+        self.search_query = query
+    
+    def start_search(self, query, indexed, others):
+        """Search the loaded indexes and the CLIs of the other backends"""
+        self.supersede_search(query)
+        self.index_results = self.search_index.search(indexed, query) if indexed else []
+        self.search_model.set_packages(self.index_results)
+        if not others:
+            self.log_output(f"Found {len(self.index_results)} packages")
+            return
         
+        # Backends without local metadata are searched with their CLI
+        errors = {}
+        if len(others) == 1:
+            search = others[0].asearch(query)
+        else:
+            search = AggregateManager(others).asearch(query, errors)
+        if self.async_bridge is None:
+            from gui.async_bridge import AsyncBridge
+            self.async_bridge = AsyncBridge(self)
+        self.search_future = self.async_bridge.submit(
+            search, lambda packages: self.on_search_finished(query, packages, errors, len(others)),
+            lambda error: self.on_search_failed(query, error)
+        )
+        self.search_btn.setEnabled(False)
+    
+    def on_search_failed(self, query, error):
+        """Report a CLI search that raised"""
+        if query != self.search_query:
+            # A newer search is still running
+            return
+        self.search_future = None
+        self.search_btn.setEnabled(True)
+        self.log_output(f"Search failed: {error}")
+    
+    def on_search_finished(self, query, packages, errors=None, searched=1):
+        """Add CLI search results to the index results, reporting backends that failed"""
+        if query != self.search_query:
+            # A newer search replaced this one after it had finished
+            return
+        if errors and len(errors) == searched:
+            self.on_search_failed(query, "; ".join(f"{name}: {error}" for name, error in errors.items()))
+            return
+        for name, error in (errors or {}).items():
+            self.on_backend_failed(name, error)
+        self.search_future = None
+        self.search_btn.setEnabled(True)
+        packages = self.index_results + packages
+        with tracer.span('render search', RENDER, backend=self.current_manager.name, rows=len(packages)):
+            self.search_model.set_packages(packages)
         self.log_output(f"Found {len(packages)} packages")
     
+    def show_diagnostics(self):
+        """Show where backend calls spent their time"""
+        from gui.diagnostics import DiagnosticsDialog
+        DiagnosticsDialog(self).exec_()
+    
     def update_package_lists(self):
         """Update package lists/repositories"""
         if not self.current_manager:
@@ -321,93 +849,325 @@ class OrangeUpdateGUI(QMainWindow):
         if not self.current_manager:
             return
         
-        reply = QMessageBox.question(
-            self, "Upgrade All Packages",
-            f"Upgrade all packages using {self.current_manager.name}?\nThis may take some time.",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
+        jobs = [(manager, []) for manager in self.backend_managers()]
+        if self.confirm_transaction(
+            "Upgrade All Packages", "upgrade",
+            f"Upgrade all packages using {self.current_manager.name}?\nThis may take some time.", jobs
+        ):
             self.run_operation("upgrade")
     
-    def upgrade_package(self, package_name):
+    def upgrade_package(self, package_name, manager=None):
         """Upgrade a specific package"""
-        reply = QMessageBox.question(
-            self, "Upgrade Package",
-            f"Upgrade package '{package_name}'?",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
-            self.run_operation("upgrade", package_name)
+        if self.confirm_transaction(
+            "Upgrade Package", "upgrade", f"Upgrade package '{package_name}'?",
+            [(manager or self.current_manager, [package_name])]
+        ):
+            self.run_operation("upgrade", package_name, manager=manager)
     
-    def install_package(self, package_name):
+    def install_package(self, package_name, manager=None):
         """Install a package"""
-        reply = QMessageBox.question(
-            self, "Install Package",
-            f"Install package '{package_name}'?",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
-            self.run_operation("install", package_name)
+        if self.confirm_transaction(
+            "Install Package", "install", f"Install package '{package_name}'?",
+            [(manager or self.current_manager, [package_name])]
+        ):
+            self.run_operation("install", package_name, manager=manager)
     
-    def remove_package(self, package_name):
+    def remove_package(self, package_name, manager=None):
         """Remove a package"""
-        reply = QMessageBox.question(
-            self, "Remove Package",
-            f"Remove package '{package_name}'?\nThis action may remove dependencies.",
-            QMessageBox.Yes | QMessageBox.No
-        )
-        
-        if reply == QMessageBox.Yes:
-            self.run_operation("remove", package_name)
+        jobs = [(manager or self.current_manager, [package_name])]
+        if self.confirm_transaction(
+            "Remove Package", "remove", f"Remove package '{package_name}'?" + self.removal_warning(jobs),
+            jobs, fallback="This action may remove dependencies."
+        ):
+            self.run_operation("remove", package_name, manager=manager)
     
-    def run_operation(self, operation, *args):
-        """Run a package operation in a worker thread"""
-        self.log_output(f"Running {operation}...")
+    def run_batch(self, operation, model, table):
+        """Queue an operation on all selected packages, one transaction per manager"""
+        jobs = self.selected_targets(model, table)
+        if not jobs:
+            QMessageBox.warning(self, "No Selection", "Please select one or more packages")
+            return
         
-        # Disable buttons during operation
-        self.set_buttons_enabled(False)
+        count = sum(len(packages) for _, packages in jobs)
+        question = f"{operation.capitalize()} {count} packages?"
+        fallback = ""
+        if operation == "remove":
+            question += self.removal_warning(jobs)
+            fallback = "This action may remove dependencies."
+        if not self.confirm_transaction(
+            f"{operation.capitalize()} Packages", operation, question, jobs, fallback=fallback
+        ):
+            return
         
-        # Create and start worker thread
-        self.worker = PackageWorker(self.current_manager, operation, *args)
-        self.worker.finished.connect(self.on_operation_finished)
-        self.worker.start()
+        for manager, packages in jobs:
+            self.run_operation(f"{operation}_packages", packages, manager=manager)
     
-    def on_operation_finished(self, returncode, stdout, stderr):
+    def confirm_transaction(self, title, kind, question, jobs, fallback=""):
+        """Ask for confirmation while the transaction is resolved in the background"""
+        from PyQt5.QtWidgets import QDialog
+        from gui.preview_dialog import TransactionDialog
+        if self.previewer is None:
+            from package_managers.preview import TransactionPreviewer
+            self.previewer = TransactionPreviewer()
+        dialog = TransactionDialog(title, question, fallback, self)
+        worker = PreviewWorker(self.previewer, kind, jobs)
+        worker.previewed.connect(dialog.show_plans)
+        worker.finished.connect(lambda: self.preview_workers.discard(worker))
+        self.preview_workers.add(worker)
+        worker.start()
+        accepted = dialog.exec_() == QDialog.Accepted
+        # The worker may still be running; its result just isn't shown anymore
+        worker.previewed.disconnect(dialog.show_plans)
+        dialog.deleteLater()
+        return accepted
+    
+    def run_operation(self, operation, *args, manager=None):
+        """Queue a package operation; it starts once its backend's lock is free"""
+        manager = manager or self.current_manager
+        if isinstance(manager, AggregateManager) and not args:
+            # One operation per backend, so backends with separate locks
+            # update and upgrade in parallel instead of holding every lock
+            for backend in manager.managers:
+                self.scheduler.submit(backend, operation)
+            return
+        self.scheduler.submit(manager, operation, *args)
+    
+    def on_operation_changed(self, operation, state):
+        """Track an operation through the queue"""
+        self.queue_panel.refresh()
+        if state == QUEUED:
+            self.log_output(f"Queued {operation.describe()}")
+        elif state == RUNNING:
+            self.log_output(f"Running {operation.describe()}...")
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.setFormat(f"Running {operation.describe()}...")
+            self.progress_bar.show()
+        elif state in (DONE, FAILED):
+            self.on_operation_finished(operation)
+        elif state == CANCELLED:
+            self.log_output(f"Cancelled {operation.describe()}")
+        
+        if self.scheduler.is_idle():
+            self.on_queue_finished()
+    
+    def on_operation_output(self, operation, line):
+        """Show an output line, tagged with its manager when several operations run"""
+        if len(self.scheduler.running) > 1:
+            line = f"[{operation.manager.name}] {line}"
+        self.log_output(line)
+    
+    def on_operation_progress(self, operation, percent, message):
+        """Show progress reported by a running operation"""
+        if len(self.scheduler.running) > 1:
+            message = f"{operation.manager.name}: {message}"
+        if percent >= 0:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(percent)
+            self.progress_bar.setFormat(f"{message} (%p%)")
+        else:
+            self.progress_bar.setFormat(message)
+    
+    def on_operation_finished(self, operation):
         """Handle completion of package operation"""
-        self.set_buttons_enabled(True)
+        self.finished_operations.append(operation)
+        result = operation.result
+        if isinstance(result, BatchResult):
+            # Per-package outcomes of a batched transaction
+            for package, outcome in result.outcomes.items():
+                message = result.messages.get(package)
+                mark = "✓" if outcome == OK else "✗"
+                self.log_output(f"{mark} {package}: {outcome}" + (f" ({message})" if message else ""))
+            stderr = result.stderr
+        else:
+            stderr = result[2]
         
-        if returncode == 0:
-            self.log_output("✓ Operation completed successfully")
-            if stdout:
-                self.log_output(stdout[:1000])  # Limit output
-            self.refresh_packages()
-            QMessageBox.information(self, "Success", "Operation completed successfully!")
+        if operation.state == DONE:
+            # Output was already streamed into the output area
+            self.log_output(f"✓ {operation.describe()} completed successfully")
+            self.update_inventory(operation)
+            if operation.kind == "update":
+                # New repository metadata, only the changed index segments are rebuilt
+                self.refresh_search_index()
         else:
-            self.log_output(f"✗ Operation failed (return code: {returncode})")
+            self.log_output(f"✗ {operation.describe()} failed (return code: {operation.returncode()})")
             if stderr:
                 self.log_output(f"Error: {stderr[:1000]}")
-            QMessageBox.critical(self, "Error", f"Operation failed:\n{stderr[:500]}")
+            if isinstance(result, BatchResult):
+                if result.succeeded():
+                    # Part of a non-atomic batch was applied
+                    self.update_inventory(operation)
+                failed = result.failed()
+                details = f"{len(failed)} of {len(result.outcomes)} packages were not processed:\n{', '.join(failed)[:500]}"
+            else:
+                details = stderr[:500]
+            QMessageBox.critical(self, "Error", f"{operation.describe()} failed:\n{details}")
     
-    def set_buttons_enabled(self, enabled):
-        """Enable/disable all action buttons"""
-        self.update_btn.setEnabled(enabled)
-        self.upgrade_all_btn.setEnabled(enabled)
-        self.refresh_btn.setEnabled(enabled)
-        self.search_btn.setEnabled(enabled)
+    def update_inventory(self, operation):
+        """
+        Bring the package lists up to date after an operation. Operations on
+        known packages only re-query those; full upgrades and repository
+        updates re-list everything.
+        """
+        from package_managers.inventory import operation_targets
+        if not self.shows_manager(operation.manager):
+            # The lists on screen belong to another manager
+            return
+        # Only the packages whose records changed are linked again
+        self.refresh_dependency_graphs()
+        names = operation_targets(operation.kind, operation.args)
+        if names is None:
+            self.refresh_packages()
+            return
+        worker = InventoryWorker(operation, names)
+        worker.verified.connect(self.on_inventory_verified)
+        worker.finished.connect(lambda: self.inventory_workers.discard(worker))
+        self.inventory_workers.add(worker)
+        worker.start()
+    
+    def shows_manager(self, manager):
+        """Check whether the lists on screen include a manager's packages"""
+        return manager is self.current_manager or manager in self.backend_managers()
+    
+    def on_inventory_verified(self, operation, records):
+        """Apply the queried state of an operation's packages to the lists"""
+        from package_managers.inventory import operation_targets, inventory_change
+        if records is None:
+            self.log_output(f"Could not query {operation.manager.name}, refreshing all package lists")
+            self.refresh_packages()
+            return
+        if not self.shows_manager(operation.manager):
+            return
+        names = operation_targets(operation.kind, operation.args)
+        change = inventory_change(operation.manager.name, names, records, self.updates_model.find)
+        self.installed_model.apply_changes(change.installed, change.uninstalled)
+        self.updates_model.apply_changes(change.upgradable, change.upgraded)
+        if change:
+            self.log_output(f"✓ Package lists updated for {', '.join(names)[:200]}")
+    
+    def run_update_check(self):
+        """Run the due background update checks in a worker thread"""
+        if self.update_checker is None:
+            from package_managers.update_checker import UpdateChecker
+            self.update_checker = UpdateChecker(
+                self.detector.get_available_managers(),
+                cache=self.refresh_pipeline.cache,
+                # Checks wait for user operations on the same lock
+                locks=self.scheduler
+            )
+        if self.update_check_worker and self.update_check_worker.isRunning():
+            return
+        if not self.update_checker.due():
+            self.schedule_update_check()
+            return
+        self.update_check_worker = UpdateCheckWorker(self.update_checker)
+        self.update_check_worker.checked.connect(self.on_updates_checked)
+        self.update_check_worker.start()
+    
+    def schedule_update_check(self):
+        """Wake up when the next background check is due"""
+        delay = min(self.update_checker.seconds_until_next(), UPDATE_CHECK_MAX_SLEEP)
+        self.update_check_timer.start(int(delay * 1000) + 1000)
+    
+    def on_updates_checked(self, results):
+        """Show the precomputed upgradable lists and announce new updates"""
+        from package_managers.update_checker import CHECKED, FAILED as CHECK_FAILED
+        new = []
+        for result in results:
+            name = result.manager.name
+            if result.status == CHECKED:
+                if self.shows_manager(result.manager):
+                    packages = [pkg for pkg in self.updates_model.packages if pkg.manager != name]
+                    self.updates_model.set_packages(packages + result.packages)
+                new.extend(f"{package} ({name})" for package in result.new)
+            elif result.status == CHECK_FAILED:
+                self.log_output(f"✗ Background update check of {name} failed: {result.error[:200]}")
+        if new:
+            self.log_output(f"🔔 {len(new)} new updates available: {', '.join(new)[:500]}")
+            # Flash the taskbar entry when the window is in the background
+            QApplication.alert(self)
+        self.schedule_update_check()
+        self.start_prefetch([(result.manager, result.packages) for result in results
+                             if result.status == CHECKED and result.packages])
+    
+    def start_prefetch(self, jobs):
+        """Download pending upgrades in the background so upgrading only installs"""
+        if not jobs or os.environ.get('ORANGE_UPDATE_NO_PREFETCH'):
+            return
+        if self.prefetch_worker and self.prefetch_worker.isRunning():
+            return
+        if self.prefetcher is None:
+            from package_managers.prefetch import Prefetcher
+            self.prefetcher = Prefetcher(locks=self.scheduler)
+        self.prefetch_worker = PrefetchWorker(self.prefetcher, jobs)
+        self.prefetch_worker.progress.connect(self.on_prefetch_progress)
+        self.prefetch_worker.prefetched.connect(self.on_prefetched)
+        self.prefetch_worker.start()
+    
+    def on_prefetch_progress(self, manager, downloaded, rate):
+        """Show how far a background download has got"""
+        from package_managers.prefetch import format_bytes
+        self.statusBar().showMessage(
+            f"Downloading updates for {manager.name}: {format_bytes(downloaded)} ({format_bytes(rate)}/s)"
+        )
+    
+    def on_prefetched(self, results):
+        """Report finished background downloads"""
+        from package_managers.prefetch import COMPLETE, PARTIAL, FAILED as PREFETCH_FAILED, format_bytes
+        self.statusBar().clearMessage()
+        for result in results:
+            name = result.manager.name
+            if result.downloaded:
+                speed = f"{format_bytes(result.rate)}/s"
+                state = "Downloaded" if result.status == COMPLETE else "Partly downloaded"
+                self.log_output(f"✓ {state} {format_bytes(result.downloaded)} of updates for {name} "
+                                f"in {result.seconds:.0f} s ({speed})")
+            elif result.status in (PARTIAL, PREFETCH_FAILED):
+                self.log_output(f"✗ Downloading updates for {name} did not finish: {result.error[:200]}")
+    
+    def on_queue_finished(self):
+        """Report once every queued operation has finished"""
+        self.progress_bar.hide()
+        finished = self.finished_operations
+        self.finished_operations = []
+        succeeded = [operation for operation in finished if operation.state == DONE]
+        if succeeded and len(succeeded) == len(finished):
+            if len(succeeded) == 1:
+                QMessageBox.information(self, "Success", "Operation completed successfully!")
+            else:
+                QMessageBox.information(self, "Success", f"{len(succeeded)} operations completed successfully!")
     
     def log_output(self, text):
         """Add text to output area"""
         self.output_text.append(text)
+    
+    def closeEvent(self, event):
+        """Stop the privileged helper and the event loop together with the window"""
+        if not self.scheduler.is_idle():
+            reply = QMessageBox.question(
+                self, "Operations Running",
+                "Package operations are still running or queued.\n"
+                "Quitting now can interrupt a transaction. Quit anyway?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+        helper = PackageManager.privileged_helper
+        if helper is not None and helper.connected:
+            helper.close()
+        if self.async_bridge is not None:
+            self.async_bridge.close()
+        super().closeEvent(event)
 
 
 def main():
     """Main entry point"""
+    trace = StartupTrace()
+    trace.mark('imported')
     app = QApplication(sys.argv)
-    window = OrangeUpdateGUI()
+    window = OrangeUpdateGUI(trace)
     window.show()
+    trace.mark('shown')
     sys.exit(app.exec_())
 
 
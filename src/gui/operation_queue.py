@@ -0,0 +1,101 @@
+"""
+Operation queue panel - shows scheduled package operations
+"""
+from PyQt5.QtWidgets import (
+    QGroupBox, QVBoxLayout, QHBoxLayout, QListWidget, QListWidgetItem, QPushButton
+)
+from PyQt5.QtCore import Qt, QObject, pyqtSignal
+from package_managers.scheduler import OperationScheduler, QUEUED, RUNNING
+from package_managers.progress import parse_progress
+
+
+class SchedulerBridge(QObject):
+    """
+    Turns scheduler callbacks from worker threads into Qt signals, which are
+    delivered on the GUI thread.
+    """
+    # The state is passed along because the operation may have moved on by
+    # the time the signal is delivered
+    changed = pyqtSignal(object, str)
+    output = pyqtSignal(object, str)
+    progress_step = pyqtSignal(object, int, str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.scheduler = OperationScheduler(on_change=self.changed.emit, on_output=self.emit_output)
+    
+    def emit_output(self, operation, line):
+        """Forward an output line and any progress it reports"""
+        self.output.emit(operation, line)
+        event = parse_progress(line)
+        if event:
+            percent = -1 if event.percent is None else int(event.percent)
+            self.progress_step.emit(operation, percent, event.message)
+
+
+class OperationQueuePanel(QGroupBox):
+    """List of running and queued operations with cancel and reorder buttons"""
+    
+    def __init__(self, scheduler, parent=None):
+        super().__init__("Operation Queue", parent)
+        self.scheduler = scheduler
+        
+        layout = QHBoxLayout()
+        self.list = QListWidget()
+        layout.addWidget(self.list)
+        
+        buttons = QVBoxLayout()
+        self.up_btn = QPushButton("▲ Up")
+        self.up_btn.clicked.connect(lambda: self.move_selected(-1))
+        buttons.addWidget(self.up_btn)
+        self.down_btn = QPushButton("▼ Down")
+        self.down_btn.clicked.connect(lambda: self.move_selected(1))
+        buttons.addWidget(self.down_btn)
+        self.cancel_btn = QPushButton("✖ Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_selected)
+        buttons.addWidget(self.cancel_btn)
+        buttons.addStretch()
+        layout.addLayout(buttons)
+        
+        self.setLayout(layout)
+        self.list.currentItemChanged.connect(self.update_buttons)
+        self.refresh()
+    
+    def selected_id(self):
+        """Id of the selected operation"""
+        item = self.list.currentItem()
+        return item.data(Qt.UserRole) if item else None
+    
+    def move_selected(self, offset):
+        """Move the selected queued operation"""
+        operation_id = self.selected_id()
+        if operation_id is not None and self.scheduler.move(operation_id, offset):
+            self.refresh()
+    
+    def cancel_selected(self):
+        """Cancel the selected queued operation"""
+        operation_id = self.selected_id()
+        if operation_id is not None:
+            self.scheduler.cancel(operation_id)
+    
+    def refresh(self):
+        """Rebuild the list from the scheduler state"""
+        selected = self.selected_id()
+        self.list.clear()
+        for operation in self.scheduler.operations():
+            marker = "▶" if operation.state == RUNNING else "⏳"
+            item = QListWidgetItem(f"{marker} {operation.describe()}")
+            item.setData(Qt.UserRole, operation.id)
+            item.setData(Qt.UserRole + 1, operation.state)
+            self.list.addItem(item)
+            if operation.id == selected:
+                self.list.setCurrentItem(item)
+        self.setVisible(self.list.count() > 0)
+        self.update_buttons()
+    
+    def update_buttons(self, *args):
+        """Only queued operations can be moved or cancelled"""
+        item = self.list.currentItem()
+        queued = item is not None and item.data(Qt.UserRole + 1) == QUEUED
+        for button in (self.up_btn, self.down_btn, self.cancel_btn):
+            button.setEnabled(queued)
@@ -0,0 +1,228 @@
+"""
+Model/view classes for the package tables
+"""
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, pyqtSignal
+from PyQt5.QtWidgets import (
+    QApplication, QStyle, QStyledItemDelegate, QStyleOptionButton, QTableView,
+    QHeaderView, QAbstractItemView
+)
+
+
+class PackageTableModel(QAbstractTableModel):
+    """
+    Table model over a list of Package records.
+    `columns` is a list of (header, field, default) tuples; when `action_label`
+    is set an extra last column holds the per-row action drawn by
+    ActionButtonDelegate.
+    """
+
+    def __init__(self, columns, action_label="", parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.action_label = action_label
+        self.packages = []
+        self.rows_by_key = {}
+
+    @staticmethod
+    def package_key(pkg):
+        """Identity of a package row across refreshes"""
+        return pkg.key
+
+    def rowCount(self, parent=QModelIndex()):
+        """Number of packages in the model"""
+        if parent.isValid():
+            return 0
+        return len(self.packages)
+
+    def columnCount(self, parent=QModelIndex()):
+        """Number of data columns plus the action column"""
+        if parent.isValid():
+            return 0
+        return len(self.columns) + (1 if self.action_label else 0)
+
+    def action_column(self) -> int:
+        """Index of the action column, -1 if there is none"""
+        return len(self.columns) if self.action_label else -1
+
+    def data(self, index, role=Qt.DisplayRole):
+        """Data shown in a cell"""
+        if not index.isValid():
+            return None
+        column = index.column()
+        if column == self.action_column():
+            return self.action_label if role == Qt.DisplayRole else None
+        if role in (Qt.DisplayRole, Qt.ToolTipRole):
+            header, field, default = self.columns[column]
+            return getattr(self.packages[index.row()], field) or default
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        """Column headers"""
+        if role != Qt.DisplayRole or orientation != Qt.Horizontal:
+            return None
+        if section == self.action_column():
+            return "Actions"
+        return self.columns[section][0]
+
+    def package_at(self, row):
+        """Get the package record shown in a row"""
+        return self.packages[row]
+
+    def clear(self):
+        """Remove all rows"""
+        self.beginResetModel()
+        self.packages = []
+        self.rows_by_key = {}
+        self.endResetModel()
+
+    def set_packages(self, packages):
+        """
+        Replace the model contents with an in-place diff: rows that vanished
+        are removed, rows whose data changed are updated, new rows are
+        appended. Unchanged rows are left untouched.
+        """
+        if not self.packages:
+            self.beginResetModel()
+            self.packages = list(packages)
+            self.reindex()
+            self.endResetModel()
+            return
+
+        incoming = {}
+        for pkg in packages:
+            incoming[self.package_key(pkg)] = pkg
+
+        # Remove vanished rows bottom-up, one contiguous run at a time
+        row = len(self.packages) - 1
+        while row >= 0:
+            if self.package_key(self.packages[row]) in incoming:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self.package_key(self.packages[row]) not in incoming:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self.packages[row + 1:last + 1]
+            self.endRemoveRows()
+        self.reindex()
+
+        # Update rows whose data changed
+        last_column = self.columnCount() - 1
+        for row, pkg in enumerate(self.packages):
+            new_pkg = incoming.pop(self.package_key(pkg))
+            if new_pkg != pkg:
+                self.packages[row] = new_pkg
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+        # Append rows that are new
+        if incoming:
+            first = len(self.packages)
+            self.beginInsertRows(QModelIndex(), first, first + len(incoming) - 1)
+            self.packages.extend(incoming.values())
+            self.reindex()
+            self.endInsertRows()
+
+    def reindex(self):
+        """Rebuild the key -> row lookup"""
+        self.rows_by_key = {
+            self.package_key(pkg): row for row, pkg in enumerate(self.packages)
+        }
+
+    def row_of(self, pkg) -> int:
+        """Row of a package, -1 if it is not in the model"""
+        return self.rows_by_key.get(self.package_key(pkg), -1)
+
+    def find(self, key):
+        """Package shown for a (manager, name) key, None if there is none"""
+        row = self.rows_by_key.get(key, -1)
+        return self.packages[row] if row >= 0 else None
+
+    def apply_changes(self, upserts, removed_keys):
+        """
+        Change single rows without diffing the whole list: rows whose key is
+        in removed_keys are removed, every record in upserts replaces the row
+        with its key or is appended.
+        """
+        rows = sorted({self.rows_by_key[key] for key in removed_keys if key in self.rows_by_key},
+                      reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.packages[row]
+            self.endRemoveRows()
+        if rows:
+            self.reindex()
+
+        last_column = self.columnCount() - 1
+        new_packages = {}
+        for pkg in upserts:
+            row = self.row_of(pkg)
+            if row < 0:
+                new_packages[self.package_key(pkg)] = pkg
+            elif self.packages[row] != pkg:
+                self.packages[row] = pkg
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+        if new_packages:
+            first = len(self.packages)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_packages) - 1)
+            self.packages.extend(new_packages.values())
+            self.reindex()
+            self.endInsertRows()
+
+
+class ActionButtonDelegate(QStyledItemDelegate):
+    """Draws a push button in the action column without creating widgets"""
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        """Paint the button for a row"""
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data(Qt.DisplayRole) or ""
+        button.state = QStyle.State_Enabled
+        if option.state & QStyle.State_MouseOver:
+            button.state |= QStyle.State_MouseOver
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def sizeHint(self, option, index):
+        """Size of the painted button"""
+        button = QStyleOptionButton()
+        button.text = index.data(Qt.DisplayRole) or ""
+        metrics = option.fontMetrics
+        size = metrics.size(Qt.TextSingleLine, button.text)
+        style = option.widget.style() if option.widget else QApplication.style()
+        return style.sizeFromContents(QStyle.CT_PushButton, button, size, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        """Turn clicks on the cell into clicked(row)"""
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if option.rect.contains(event.pos()):
+                self.clicked.emit(index.row())
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+def create_package_view(model, stretch_column=0):
+    """Create a table view for a package model with the action delegate set up"""
+    view = QTableView()
+    view.setModel(model)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    # Several rows can be selected for batched operations
+    view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+    view.setMouseTracking(True)
+    view.verticalHeader().setVisible(False)
+
+    # Fixed row heights let the view skip measuring rows that are not visible
+    view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+
+    header = view.horizontalHeader()
+    for column in range(model.columnCount()):
+        mode = QHeaderView.Stretch if column == stretch_column else QHeaderView.ResizeToContents
+        header.setSectionResizeMode(column, mode)
+
+    delegate = ActionButtonDelegate(view)
+    if model.action_column() >= 0:
+        view.setItemDelegateForColumn(model.action_column(), delegate)
+    view.action_delegate = delegate
+    return view
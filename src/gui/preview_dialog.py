@@ -0,0 +1,88 @@
+"""
+Transaction confirmation dialog - shows the resolved impact of an operation
+"""
+from html import escape
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QTextBrowser, QDialogButtonBox
+from package_managers.prefetch import format_bytes
+
+# Package names listed per group before the rest is summarized
+MAX_LISTED = 40
+
+
+def describe_size(size) -> str:
+    """Signed size text for an installed-size change"""
+    if size < 0:
+        return f"{format_bytes(-size)} freed"
+    return f"{format_bytes(size)} more disk space"
+
+
+def package_list(packages) -> str:
+    """Comma separated names, shortened for long lists"""
+    names = [escape(package.name) for package in packages[:MAX_LISTED]]
+    if len(packages) > MAX_LISTED:
+        names.append(f"and {len(packages) - MAX_LISTED} more")
+    return ', '.join(names)
+
+
+def plan_html(plan, fallback: str) -> str:
+    """Describe one backend's plan"""
+    title = f"<b>{escape(plan.manager)}</b>"
+    if not plan.ok:
+        reason = escape(plan.error.strip().split('\n')[0][:300])
+        return f"{title}: couldn't resolve the transaction in advance ({reason}).<br>{escape(fallback)}"
+    if not plan.affected():
+        return f"{title}: nothing to do."
+    counts = []
+    for label, packages in (("install", plan.install), ("upgrade", plan.upgrade), ("remove", plan.remove)):
+        if packages:
+            counts.append(f"{len(packages)} to {label}")
+    lines = [f"{title}: {', '.join(counts)}"]
+    sizes = []
+    if plan.download_size is not None and (plan.install or plan.upgrade):
+        sizes.append(f"{format_bytes(plan.download_size)} to download")
+    if plan.size_change is not None:
+        sizes.append(describe_size(plan.size_change))
+    if sizes:
+        lines.append(', '.join(sizes))
+    extra = {package.name for package in plan.extra()}
+    if plan.install:
+        lines.append(f"Install: {package_list(plan.install)}")
+    if plan.upgrade:
+        lines.append(f"Upgrade: {package_list(plan.upgrade)}")
+    if plan.remove:
+        removed = package_list(plan.remove)
+        if any(package.name in extra for package in plan.remove):
+            # Dependencies going away with the package are easy to miss
+            removed = f"<span style='color:#c0392b'>{removed}</span>"
+        lines.append(f"Remove: {removed}")
+    return '<br>'.join(lines)
+
+
+class TransactionDialog(QDialog):
+    """
+    Yes/No confirmation that fills in the resolved transaction once the dry
+    runs are back. The buttons work right away, so nobody has to wait for
+    the preview to confirm.
+    """
+    
+    def __init__(self, title: str, question: str, fallback: str = "", parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(560, 320)
+        # Shown for backends without a preview
+        self.fallback = fallback
+        
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(question))
+        self.details = QTextBrowser()
+        self.details.setHtml("<i>Resolving transaction...</i>")
+        layout.addWidget(self.details)
+        buttons = QDialogButtonBox(QDialogButtonBox.Yes | QDialogButtonBox.No)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+    
+    def show_plans(self, plans):
+        """Show the resolved plans of every backend involved"""
+        self.details.setHtml('<br><br>'.join(plan_html(plan, self.fallback) for plan in plans))
@@ -0,0 +1,136 @@
+"""
+Asynchronous refresh pipeline - loads package lists off the GUI thread
+"""
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from package_managers.cache import InventoryCache
+from package_managers.aggregate import AggregateManager
+
+
+class ListingSignals(QObject):
+    """Signals emitted by a listing task (QRunnable cannot emit on its own)"""
+    loaded = pyqtSignal(int, str, list)
+    failed = pyqtSignal(int, str, str)
+    backend_failed = pyqtSignal(int, str, str)
+
+
+class ListingTask(QRunnable):
+    """Runs a single listing call of a package manager on the thread pool"""
+    
+    def __init__(self, pipeline, generation, kind, manager, force=False):
+        super().__init__()
+        self.pipeline = pipeline
+        self.generation = generation
+        self.kind = kind
+        self.manager = manager
+        self.force = force
+        self.signals = ListingSignals()
+    
+    def run(self):
+        """Execute the listing and report the typed result"""
+        # The refresh may have been superseded before we got a thread
+        if self.pipeline.is_stale(self.generation):
+            return
+        try:
+            if isinstance(self.manager, AggregateManager):
+                # Fan out to every backend, each one going through the cache
+                errors = {}
+                packages = self.manager.gather(self.load, errors)
+                for name, error in errors.items():
+                    self.signals.backend_failed.emit(self.generation, name, error)
+            else:
+                packages = self.load(self.manager)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, self.kind, str(e))
+            return
+        if not self.pipeline.is_stale(self.generation):
+            self.signals.loaded.emit(self.generation, self.kind, packages)
+    
+    def load(self, manager):
+        """Load this task's listing for one manager through the cache"""
+        cache = self.pipeline.cache
+        if self.kind == "installed":
+            return cache.list_installed(manager, self.force)
+        return cache.list_upgradable(manager, self.force)
+
+
+class RefreshPipeline(QObject):
+    """
+    Runs list_installed() and list_upgradable() in parallel on a worker pool,
+    answering from the inventory cache while the package databases are unchanged.
+    Every refresh gets a generation number; starting a new refresh or calling
+    cancel() makes results of older generations stale so they are dropped.
+    """
+    installed_loaded = pyqtSignal(list)
+    upgradable_loaded = pyqtSignal(list)
+    failed = pyqtSignal(str, str)
+    backend_failed = pyqtSignal(str, str)
+    finished = pyqtSignal()
+    
+    KINDS = ("installed", "upgradable")
+    
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache or InventoryCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(len(self.KINDS))
+        self.generation = 0
+        self.pending = set()
+    
+    def start(self, manager, force=False):
+        """
+        Start a refresh for the given manager, cancelling any stale one.
+        force=True bypasses the inventory cache.
+        """
+        self.cancel()
+        # Listings of a cancelled refresh can't be interrupted and keep their
+        # threads until their command returns, so the new ones get their own
+        self.pool.setMaxThreadCount(self.pool.activeThreadCount() + len(self.KINDS))
+        self.pending = set(self.KINDS)
+        for kind in self.KINDS:
+            task = ListingTask(self, self.generation, kind, manager, force)
+            task.signals.loaded.connect(self.on_task_loaded)
+            task.signals.failed.connect(self.on_task_failed)
+            task.signals.backend_failed.connect(self.on_backend_failed)
+            self.pool.start(task)
+    
+    def cancel(self):
+        """Mark the running refresh as stale and drop tasks that haven't started"""
+        self.generation += 1
+        self.pending = set()
+        self.pool.clear()
+    
+    def is_stale(self, generation) -> bool:
+        """Check whether results of a generation should be discarded"""
+        return generation != self.generation
+    
+    def is_running(self) -> bool:
+        """Check whether a refresh is still waiting for results"""
+        return bool(self.pending)
+    
+    def on_task_loaded(self, generation, kind, packages):
+        """Forward results of the current generation as they arrive"""
+        if self.is_stale(generation):
+            return
+        if kind == "installed":
+            self.installed_loaded.emit(packages)
+        else:
+            self.upgradable_loaded.emit(packages)
+        self.task_done(kind)
+    
+    def on_task_failed(self, generation, kind, error):
+        """Forward errors of the current generation"""
+        if self.is_stale(generation):
+            return
+        self.failed.emit(kind, error)
+        self.task_done(kind)
+    
+    def on_backend_failed(self, generation, name, error):
+        """Forward a backend that failed inside an aggregated listing"""
+        if not self.is_stale(generation):
+            self.backend_failed.emit(name, error)
+    
+    def task_done(self, kind):
+        """Emit finished once every listing of the refresh has reported"""
+        self.pending.discard(kind)
+        if not self.pending:
+            self.finished.emit()
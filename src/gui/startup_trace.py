@@ -0,0 +1,46 @@
+"""
+Startup trace - records startup milestones for the startup benchmark
+Enabled by setting ORANGE_UPDATE_STARTUP_TRACE to an output file.
+"""
+import json
+import os
+import time
+
+
+class StartupTrace:
+    """
+    Collects wall clock timestamps of startup milestones and writes them as
+    JSON once the application is interactive. With ORANGE_UPDATE_STARTUP_EXIT
+    set the application quits right after, so the benchmark can run it
+    repeatedly.
+    """
+    
+    def __init__(self):
+        self.path = os.environ.get('ORANGE_UPDATE_STARTUP_TRACE')
+        self.exit_when_done = bool(os.environ.get('ORANGE_UPDATE_STARTUP_EXIT'))
+        self.marks = {}
+        self.done = False
+    
+    @property
+    def enabled(self) -> bool:
+        """Check whether a trace was requested"""
+        return bool(self.path)
+    
+    def mark(self, name: str):
+        """Record the first time a milestone is reached"""
+        if self.enabled and name not in self.marks:
+            self.marks[name] = time.time()
+    
+    def finish(self, app=None):
+        """Write the trace once the application is interactive"""
+        if not self.enabled or self.done:
+            return
+        self.done = True
+        self.mark('interactive')
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'marks': self.marks}, f)
+        except OSError:
+            pass
+        if self.exit_when_done and app is not None:
+            app.quit()
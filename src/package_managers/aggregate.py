@@ -0,0 +1,208 @@
+"""
+Aggregate Package Manager - queries every detected backend at once
+"""
+from typing import List, Dict, Optional, Callable, Awaitable
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import time
+from .base import PackageManager
+from .package import Package
+# asyncio is imported by agather(), as in base.py
+
+
+class AggregateManager(PackageManager):
+    """
+    Presents several package managers as one.
+    Listings and searches fan out to every backend in parallel and are merged,
+    so latency is that of the slowest backend. A backend that exceeds its
+    timeout is dropped from the result instead of blocking the others.
+    """
+    
+    NAME = "All Managers"
+    
+    def __init__(self, managers: List[PackageManager], timeout: float = 60.0,
+                 timeouts: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.name = self.NAME
+        self.command = ""
+        self.managers = list(managers)
+        self.timeout = timeout
+        # Per-backend overrides, e.g. {'Snap': 15.0} for a flaky snapd
+        self.timeouts = dict(timeouts or {})
+        self.available = self.check_availability()
+    
+    def check_availability(self) -> bool:
+        """Available as long as there is at least one backend"""
+        return bool(self.managers)
+    
+    def timeout_for(self, manager: PackageManager) -> float:
+        """Timeout in seconds for a backend"""
+        return self.timeouts.get(manager.name, self.timeout)
+    
+    def lock_groups(self) -> List[str]:
+        """Operations on every backend hold every backend's lock"""
+        groups = []
+        for manager in self.managers:
+            groups.extend(manager.lock_groups())
+        return groups
+    
+    def get_manager(self, name: str) -> Optional[PackageManager]:
+        """Get the backend a merged record came from"""
+        for manager in self.managers:
+            if manager.name.lower() == name.lower():
+                return manager
+        return None
+    
+    def gather(self, call: Callable[[PackageManager], List[Package]],
+               errors: Optional[Dict[str, str]] = None) -> List[Package]:
+        """
+        Run call(manager) for every backend in parallel and merge the results.
+        Failures and timeouts are recorded in `errors` keyed by manager name.
+        """
+        if errors is None:
+            errors = {}
+        if not self.managers:
+            return []
+        
+        results: Dict[str, List[Package]] = {}
+        executor = ThreadPoolExecutor(max_workers=len(self.managers))
+        start = time.monotonic()
+        pending = {}
+        for manager in self.managers:
+            future = executor.submit(call, manager)
+            pending[future] = (manager, start + self.timeout_for(manager))
+        
+        try:
+            while pending:
+                now = time.monotonic()
+                # Give up on backends whose deadline has passed
+                for future, (manager, deadline) in list(pending.items()):
+                    if deadline <= now:
+                        errors[manager.name] = f"timed out after {self.timeout_for(manager):g}s"
+                        del pending[future]
+                if not pending:
+                    break
+                next_deadline = min(deadline for _, deadline in pending.values())
+                done, _ = wait(pending, timeout=next_deadline - now, return_when=FIRST_COMPLETED)
+                for future in done:
+                    manager, _ = pending.pop(future)
+                    try:
+                        results[manager.name] = future.result()
+                    except Exception as e:
+                        errors[manager.name] = str(e)
+        finally:
+            # Hung backends keep their thread until their command times out,
+            # but nobody waits for them
+            executor.shutdown(wait=False)
+        
+        # Merge in detection order so the table is stable between refreshes
+        packages = []
+        for manager in self.managers:
+            packages.extend(results.get(manager.name, []))
+        return packages
+    
+    async def agather(self, call: Callable[[PackageManager], Awaitable[List[Package]]],
+                      errors: Optional[Dict[str, str]] = None) -> List[Package]:
+        """
+        gather() for coroutines: every backend runs on the calling event loop.
+        A backend past its timeout is cancelled, which kills its command.
+        """
+        import asyncio
+        if errors is None:
+            errors = {}
+        
+        async def run(manager: PackageManager) -> List[Package]:
+            try:
+                return await asyncio.wait_for(call(manager), self.timeout_for(manager))
+            except asyncio.TimeoutError:
+                errors[manager.name] = f"timed out after {self.timeout_for(manager):g}s"
+            except Exception as e:
+                errors[manager.name] = str(e)
+            return []
+        
+        # gather() keeps detection order
+        results = await asyncio.gather(*(run(manager) for manager in self.managers))
+        return [package for packages in results for package in packages]
+    
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """Update package lists of every backend, one after the other"""
+        return self.run_all(lambda manager, output: manager.update(on_output=output), on_output)
+    
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """
+        Upgrade all packages of every backend, one after the other. The GUI
+        queues one operation per backend instead, so their locks are separate.
+        """
+        if package:
+            return -1, "", "Select the package from its own package manager to upgrade it"
+        return self.run_all(lambda manager, output: manager.upgrade(on_output=output), on_output)
+    
+    async def aupgrade(self, package: Optional[str] = None,
+                       on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """upgrade() as a coroutine; backends still upgrade one after the other"""
+        if package:
+            return -1, "", "Select the package from its own package manager to upgrade it"
+        results = []
+        for manager in self.managers:
+            if on_output is not None:
+                on_output(f"[{manager.name}]")
+            results.append((manager, await manager.aupgrade(on_output=on_output)))
+        return self.combine(results)
+    
+    def run_all(self, operation: Callable[..., tuple],
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """Run an operation on each backend in turn and combine the results"""
+        results = []
+        for manager in self.managers:
+            if on_output is not None:
+                on_output(f"[{manager.name}]")
+            results.append((manager, operation(manager, on_output)))
+        return self.combine(results)
+    
+    def combine(self, results: List[tuple]) -> tuple[int, str, str]:
+        """One (returncode, stdout, stderr) for the (manager, result) pairs of several backends"""
+        returncode = 0
+        stdout = []
+        stderr = []
+        for manager, (code, out, err) in results:
+            if code != 0 and returncode == 0:
+                returncode = code
+            if out:
+                stdout.append(f"[{manager.name}]\n{out}")
+            if err:
+                stderr.append(f"[{manager.name}]\n{err}")
+        return returncode, "\n".join(stdout), "\n".join(stderr)
+    
+    def search(self, query: str) -> List[Package]:
+        """Search every backend"""
+        return self.gather(lambda manager: manager.search(query))
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """Install needs a specific backend"""
+        return -1, "", "Select the package from its own package manager to install it"
+    
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """Remove needs a specific backend"""
+        return -1, "", "Select the package from its own package manager to remove it"
+    
+    def list_installed(self) -> List[Package]:
+        """List installed packages of every backend"""
+        return self.gather(lambda manager: manager.list_installed())
+    
+    def list_upgradable(self) -> List[Package]:
+        """List upgradable packages of every backend"""
+        return self.gather(lambda manager: manager.list_upgradable())
+    
+    async def asearch(self, query: str, errors: Optional[Dict[str, str]] = None) -> List[Package]:
+        """Search every backend concurrently; failures are recorded in `errors` as by gather()"""
+        return await self.agather(lambda manager: manager.asearch(query), errors)
+    
+    async def alist_installed(self, errors: Optional[Dict[str, str]] = None) -> List[Package]:
+        """List installed packages of every backend concurrently"""
+        return await self.agather(lambda manager: manager.alist_installed(), errors)
+    
+    async def alist_upgradable(self, errors: Optional[Dict[str, str]] = None) -> List[Package]:
+        """List upgradable packages of every backend concurrently"""
+        return await self.agather(lambda manager: manager.alist_upgradable(), errors)
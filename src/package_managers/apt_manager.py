@@ -1,101 +1,281 @@
 """
 APT Package Manager Handler (Debian, Ubuntu, etc.)
 """
-from typing import List, Dict, Optional
+from typing import List, Optional, Callable, Iterator, Tuple
+import glob
 import re
 from .base import PackageManager
+from .transport import Transport
+from .package import Package
+from . import parsers
+from .plan import TransactionPlan
+from .depgraph import DependencyRecord
+from .native_db import read_dpkg_status, read_apt_packages_list, read_apt_extended_states, parse_deb_relations
 
 
 class AptManager(PackageManager):
     """Handler for APT package manager"""
     
-    def __init__(self):
-        super().__init__()
+    # Machine readable dlstatus/pmstatus progress lines on stdout
+    STATUS_OPTIONS = ["-o", "APT::Status-Fd=1"]
+    # dpkg-query fields, named like read_installed_db() names them
+    QUERY_FORMAT = "${db:Status-Abbrev}\t${binary:Package}\t${Version}\t${binary:Summary}\n"
+    
+    def __init__(self, transport: Optional[Transport] = None):
+        super().__init__(transport)
         self.name = "APT"
         self.command = "apt"
+        self.installed_db_paths = ["/var/lib/dpkg/status"]
+        self.metadata_db_paths = ["/var/lib/apt/lists"]
+        self.native_db_path = "/var/lib/dpkg/status"
+        # Auto-Installed marks of apt-mark
+        self.extended_states_path = "/var/lib/apt/extended_states"
+        self.dependency_db_paths = [self.native_db_path, self.extended_states_path]
+        self.download_cache_paths = ["/var/cache/apt/archives"]
+        # Shares the dpkg frontend lock with every other dpkg frontend
+        self.lock_group = "dpkg"
         self.available = self.check_availability()
     
     def check_availability(self) -> bool:
         """Check if APT is installed"""
         return self.is_command_available("apt")
     
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update package lists"""
-        return self.execute_command(["apt", "update"])
+        return self.run_operation('update', on_output=on_output)
     
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
-        if package:
-            return self.execute_command(["apt", "install", "--only-upgrade", "-y", package])
-        else:
-            return self.execute_command(["apt", "upgrade", "-y"])
+        packages = [package] if package else []
+        return self.run_operation('upgrade', packages, on_output=on_output)
     
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["apt", "search", query], use_sudo=False
-        )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip() and not line.startswith('Sorting') and not line.startswith('Full Text'):
-                    match = re.match(r'^([^\s/]+).*?-\s+(.+)$', line)
-                    if match:
-                        packages.append({
-                            'name': match.group(1),
-                            'description': match.group(2),
-                            'manager': 'APT'
-                        })
-        return packages
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the repositories"""
+        return ["apt", "search", query]
+    
+    def parse_search(self, stdout: str) -> List[Package]:
+        """Parse the output of `apt search <query>`"""
+        return parsers.apt_search(stdout, self.name)
     
-    def install(self, package: str) -> tuple[int, str, str]:
+    def index_sources(self) -> List[str]:
+        """Uncompressed Packages files downloaded by apt update"""
+        return sorted(glob.glob("/var/lib/apt/lists/*_Packages"))
+    
+    def read_index_source(self, path: str) -> Iterator[Tuple[str, str]]:
+        """Read packages from an apt Packages file"""
+        return read_apt_packages_list(path)
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
-        return self.execute_command(["apt", "install", "-y", package])
+        return self.run_operation('install', [package], on_output=on_output)
     
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
-        return self.execute_command(["apt", "remove", "-y", package])
+        return self.run_operation('remove', [package], on_output=on_output)
     
-    def list_installed(self) -> List[Dict[str, str]]:
-        """List all installed packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["dpkg", "-l"], use_sudo=False
-        )
+    def update_command(self) -> List[str]:
+        """Command refreshing the repository metadata"""
+        return ["apt", "update"]
+    
+    def prefetch_command(self, parallel_downloads: int = 3) -> List[str]:
+        """Command downloading everything a full upgrade would install, without installing it"""
+        # --with-new-pkgs: like `apt upgrade`, which Upgrade All runs, also
+        # fetch upgrades that pull in new dependencies. Queue-Mode=host gives
+        # each mirror its own download queue and QueueHost::Limit caps how
+        # many of them download at once.
+        return ["apt-get", "upgrade", "--with-new-pkgs", "--download-only", "-y", *self.STATUS_OPTIONS,
+                "-o", "Acquire::Queue-Mode=host",
+                "-o", f"Acquire::QueueHost::Limit={parallel_downloads}"]
+    
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        return ["apt", "install", "-y", *self.STATUS_OPTIONS, *packages]
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        return ["apt", "remove", "-y", *self.STATUS_OPTIONS, *packages]
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        if packages:
+            return ["apt", "install", "--only-upgrade", "-y", *self.STATUS_OPTIONS, *packages]
+        return ["apt", "upgrade", "-y", *self.STATUS_OPTIONS]
+    
+    def preview_command(self, kind: str, packages: List[str]) -> List[str]:
+        """Simulated install, remove or upgrade (all packages if none are given)"""
+        if kind == "install":
+            return ["apt-get", "-s", "install", *packages]
+        if kind == "remove":
+            return ["apt-get", "-s", "remove", *packages]
+        if packages:
+            return ["apt-get", "-s", "install", "--only-upgrade", *packages]
+        # Like `apt upgrade`, which may install new dependencies
+        return ["apt-get", "-s", "upgrade", "--with-new-pkgs"]
+    
+    def parse_preview(self, kind: str, packages: List[str], returncode: int,
+                      stdout: str, stderr: str) -> TransactionPlan:
+        """Parse the Inst/Remv lines of `apt-get -s`"""
+        plan = TransactionPlan(self.name, kind, packages)
+        if returncode != 0:
+            errors = [line for line in f"{stdout}\n{stderr}".split('\n') if line.startswith('E:')]
+            plan.error = '\n'.join(errors) or (stderr or stdout).strip()[-500:]
+            return plan
+        for line in stdout.split('\n'):
+            if line.startswith('Inst '):
+                # Inst name [old version] (new version repo [arch])
+                match = re.match(r'^Inst (\S+) (?:\[(\S+)\] )?\((\S+)', line)
+                if match:
+                    name, old, new = match.groups()
+                    if old:
+                        plan.upgrade.append(Package(name, self.name, version=old, new_version=new))
+                    else:
+                        plan.install.append(Package(name, self.name, new_version=new))
+            elif line.startswith('Remv '):
+                match = re.match(r'^Remv (\S+)(?: \[(\S+)\])?', line)
+                if match:
+                    plan.remove.append(Package(match.group(1), self.name, version=match.group(2) or ''))
+        return plan
+    
+    def preview_transaction(self, kind: str, packages: List[str],
+                            use_sudo: bool = False) -> TransactionPlan:
+        """Resolve a transaction with apt-get -s and add up its sizes"""
+        plan = super().preview_transaction(kind, packages, use_sudo)
+        if plan.ok and plan.affected():
+            # A simulation stops before apt prints the sizes, so they come from the package records
+            self.add_preview_sizes(plan)
+        return plan
+    
+    def add_preview_sizes(self, plan: TransactionPlan):
+        """Fill in download size and installed size change from apt-cache and dpkg"""
+        incoming = plan.install + plan.upgrade
+        download = 0
+        installed_kib = 0
+        if incoming:
+            returncode, stdout, stderr = self.execute_command(
+                ["apt-cache", "show", *(f"{pkg.name}={pkg.new_version}" for pkg in incoming)],
+                use_sudo=False
+            )
+            if returncode != 0:
+                return
+            seen = set()
+            for stanza in stdout.split('\n\n'):
+                fields = dict(line.split(': ', 1) for line in stanza.split('\n')
+                              if ': ' in line and not line.startswith(' '))
+                key = (fields.get('Package'), fields.get('Version'), fields.get('Architecture'))
+                if key in seen or not key[0]:
+                    # The same version can be listed once per repository
+                    continue
+                seen.add(key)
+                try:
+                    download += int(fields.get('Size') or 0)
+                    installed_kib += int(fields.get('Installed-Size') or 0)
+                except ValueError:
+                    return
         
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.startswith('ii'):
-                    parts = line.split(None, 4)
-                    if len(parts) >= 4:
-                        packages.append({
-                            'name': parts[1],
-                            'version': parts[2],
-                            'description': parts[4] if len(parts) > 4 else '',
-                            'manager': 'APT'
-                        })
-        return packages
+        outgoing = {pkg.name.split(':')[0] for pkg in plan.upgrade + plan.remove}
+        if outgoing:
+            try:
+                for fields in read_dpkg_status(self.native_db_path):
+                    if fields['Package'] in outgoing:
+                        installed_kib -= int(fields.get('Installed-Size') or 0)
+            except (OSError, UnicodeError, ValueError):
+                return
+        plan.download_size = download
+        plan.size_change = installed_kib * 1024
     
-    def list_upgradable(self) -> List[Dict[str, str]]:
-        """List packages that can be upgraded"""
+    def read_installed_db(self) -> Optional[List[Package]]:
+        """Read installed packages from the dpkg status file"""
+        if not self.use_native_db:
+            return None
+        try:
+            packages = []
+            for fields in read_dpkg_status(self.native_db_path):
+                name = fields['Package']
+                if fields.get('Multi-Arch') == 'same':
+                    # dpkg -l qualifies co-installable packages with their arch
+                    name = f"{name}:{fields.get('Architecture', '')}"
+                packages.append(Package(
+                    name,
+                    self.name,
+                    version=fields.get('Version', ''),
+                    description=fields.get('Description', '')
+                ))
+            return packages
+        except (OSError, UnicodeError):
+            return None
+    
+    def read_dependency_db(self) -> Optional[List[DependencyRecord]]:
+        """Read dependencies from the dpkg status file and auto marks from extended_states"""
+        if not self.use_native_db:
+            return None
+        try:
+            auto = read_apt_extended_states(self.extended_states_path)
+        except (OSError, UnicodeError):
+            # No marks yet: APT treats every package as manually installed
+            auto = set()
+        try:
+            records = []
+            for fields in read_dpkg_status(self.native_db_path):
+                name = fields['Package']
+                arch = fields.get('Architecture', '')
+                provides = [group[0] for group in parse_deb_relations(fields.get('Provides', ''))]
+                if fields.get('Multi-Arch') == 'same':
+                    # Named like read_installed_db() names it; dependencies use the bare name
+                    provides.append(name)
+                    name = f"{name}:{arch}"
+                # autoremove never touches essential or protected ("Important" before dpkg 1.20) packages
+                kept = 'yes' in (fields.get('Essential'), fields.get('Protected'), fields.get('Important'))
+                records.append(DependencyRecord(
+                    name,
+                    version=fields.get('Version', ''),
+                    description=fields.get('Description', ''),
+                    depends=parse_deb_relations(f"{fields.get('Pre-Depends', '')},{fields.get('Depends', '')}"),
+                    # Kept by autoremove with the default APT::AutoRemove::*Important
+                    weak=parse_deb_relations(f"{fields.get('Recommends', '')},{fields.get('Suggests', '')}"),
+                    provides=provides,
+                    explicit=kept or (fields['Package'], arch) not in auto
+                ))
+            return records
+        except (OSError, UnicodeError):
+            return None
+    
+    def query_installed(self, names: List[str]) -> Optional[List[Package]]:
+        """Query dpkg for just the given packages"""
         returncode, stdout, stderr = self.execute_command(
-            ["apt", "list", "--upgradable"], use_sudo=False
+            ["dpkg-query", "-W", "-f", self.QUERY_FORMAT, "--", *names], use_sudo=False
         )
-        
+        # Exit status 1 only means some of the names are unknown to dpkg
+        if returncode not in (0, 1):
+            return None
         packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines[1:]:  # Skip header
-                if line.strip() and not line.startswith('Listing'):
-                    match = re.match(r'^([^\s/]+).*?\s+(\S+)\s+.*?\[upgradable from:\s+(\S+)\]', line)
-                    if match:
-                        packages.append({
-                            'name': match.group(1),
-                            'new_version': match.group(2),
-                            'current_version': match.group(3),
-                            'manager': 'APT'
-                        })
+        for line in stdout.split('\n'):
+            parts = line.split('\t')
+            # Installed (ii) and held (hi); removed packages whose config
+            # files remain are listed as "rc"
+            if len(parts) == 4 and parts[0][:2] in ('ii', 'hi'):
+                packages.append(Package(
+                    parts[1],
+                    self.name,
+                    version=parts[2],
+                    description=parts[3]
+                ))
         return packages
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed packages, when the database can't be read"""
+        return ["dpkg", "-l"]
+    
+    def parse_installed(self, stdout: str) -> List[Package]:
+        """Parse the output of `dpkg -l`"""
+        return parsers.apt_installed(stdout, self.name)
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing available updates"""
+        return ["apt", "list", "--upgradable"]
+    
+    def parse_upgradable(self, stdout: str) -> List[Package]:
+        """Parse the output of `apt list --upgradable`"""
+        return parsers.apt_upgradable(stdout, self.name)
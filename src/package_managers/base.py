@@ -2,18 +2,66 @@
 Base class for package managers
 """
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Iterator, Tuple, Sequence
 import subprocess
-import shutil
+from .streaming import CommandStream
+from .batch import BatchResult, FAILED
+from .package import Package
+from .plan import TransactionPlan
+from .depgraph import DependencyRecord
+from .tracing import tracer, instrument, COMMAND
+from .transport import Transport, TransportError, LOCAL
+from . import parsers
+# asyncio is only imported by the coroutines, whose event loop has loaded it
+# already, so synchronous callers such as the GUI's startup don't pay for it
 
 
 class PackageManager(ABC):
     """Abstract base class for all package managers"""
     
-    def __init__(self):
+    # Shared privileged helper (privileged_helper.HelperClient). When set,
+    # root operations go through it instead of one pkexec spawn per command;
+    # see run_operation().
+    privileged_helper = None
+    
+    # Column header lines that start the output of a listing command, by
+    # listing ('search', 'installed', 'upgradable'); see read_listing()
+    HEADER_LINES: Dict[str, int] = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        """Time the backend calls of every package manager"""
+        super().__init_subclass__(**kwargs)
+        instrument(cls)
+    
+    def __init__(self, transport: Optional[Transport] = None):
         self.name = ""
         self.command = ""
         self.available = False
+        # Host the commands run on; this machine unless given
+        self.transport = transport or LOCAL
+        # Version and capabilities found by the detector's probe
+        self.backend_version = ""
+        self.capabilities: Dict[str, bool] = {}
+        # Package database files whose changes invalidate cached listings
+        self.installed_db_paths: List[str] = []
+        self.metadata_db_paths: List[str] = []
+        # Files read_dependency_db() reads, to notice when the dependency graph is stale
+        self.dependency_db_paths: List[str] = []
+        # Where downloaded packages are kept until they are installed
+        self.download_cache_paths: List[str] = []
+        # Fast path: read installed packages from the on-disk database
+        self.use_native_db = not self.transport.remote
+        self.native_db_path: Optional[str] = None
+        # Fast path: ask the backend's local service (snapd, libflatpak) for structured data
+        self.use_local_api = not self.transport.remote
+        # A failed transaction leaves no package of the batch applied
+        self.atomic_transactions = True
+        # Operations of managers sharing a lock group never run concurrently
+        self.lock_group = ""
+        # The update checker may refresh metadata in the background
+        self.background_refresh = True
+        # The dry run of preview_transaction() has to run as root
+        self.preview_as_root = False
         
     @abstractmethod
     def check_availability(self) -> bool:
@@ -21,62 +69,437 @@ class PackageManager(ABC):
         pass
     
     @abstractmethod
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update package lists/repositories"""
         pass
     
     @abstractmethod
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
         pass
     
     @abstractmethod
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        pass
-    
-    @abstractmethod
-    def install(self, package: str) -> tuple[int, str, str]:
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
         pass
     
     @abstractmethod
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
         pass
     
-    @abstractmethod
-    def list_installed(self) -> List[Dict[str, str]]:
+    def search(self, query: str) -> List[Package]:
+        """Search for packages"""
+        packages = self.local_search(query)
+        if packages is not None:
+            return packages
+        return self.read_listing('search', self.search_command(query), self.parse_search)
+    
+    def list_installed(self) -> List[Package]:
         """List all installed packages"""
-        pass
+        packages = self.local_installed()
+        if packages is not None:
+            return packages
+        return self.read_listing('installed', self.installed_command(), self.parse_installed)
     
-    @abstractmethod
-    def list_upgradable(self) -> List[Dict[str, str]]:
+    def list_upgradable(self) -> List[Package]:
         """List packages that can be upgraded"""
-        pass
+        packages = self.local_upgradable()
+        if packages is not None:
+            return packages
+        packages = self.read_listing('upgradable', self.upgradable_command(), self.parse_upgradable)
+        return self.fill_upgradable(packages) if packages else packages
+    
+    def read_listing(self, listing: str, command: List[str],
+                     parse: Callable[[str], List[Package]]) -> List[Package]:
+        """
+        Run a listing command and parse its output in blocks while it is
+        printed, so parsing overlaps the command and the whole output is
+        never held in memory. Transports that can't stream fall back to
+        parsing the buffered output. Returns [] if the command fails.
+        """
+        try:
+            # Warnings on stderr must not end up between the lines of a record
+            stream = self.stream_command(command, use_sudo=False, merge_stderr=False)
+        except NotImplementedError:
+            returncode, stdout, stderr = self.execute_command(command, use_sudo=False)
+            return parse(stdout) if returncode == 0 else []
+        with tracer.span('stream', COMMAND, command=' '.join(command[:3])):
+            packages = list(parsers.stream(parse, stream, self.HEADER_LINES.get(listing, 0)))
+        return packages if stream.returncode == 0 else []
+    
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the repositories, parsed by parse_search()"""
+        raise NotImplementedError(f"{self.name} has no search command")
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed packages, parsed by parse_installed()"""
+        raise NotImplementedError(f"{self.name} has no listing command")
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing available updates, parsed by parse_upgradable()"""
+        raise NotImplementedError(f"{self.name} has no update listing command")
+    
+    def fill_upgradable(self, packages: List[Package]) -> List[Package]:
+        """
+        Add the installed versions to parsed update records, for backends
+        whose update listing only shows the new ones
+        """
+        return packages
+    
+    def installed_versions(self, packages: List[Package]) -> List[Package]:
+        """fill_upgradable() by a targeted query of the installed packages"""
+        installed = self.query_installed(sorted({package.name for package in packages}))
+        if installed:
+            versions = {package.name: package.version for package in installed}
+            for package in packages:
+                package.version = versions.get(package.name, package.version)
+        return packages
+    
+    def local_search(self, query: str) -> Optional[List[Package]]:
+        """Search results from a local service instead of the CLI; None runs search_command()"""
+        return None
+    
+    def local_installed(self) -> Optional[List[Package]]:
+        """Installed packages from the native database or a local service; None runs installed_command()"""
+        return self.read_installed_db()
+    
+    def local_upgradable(self) -> Optional[List[Package]]:
+        """Available updates from a local service instead of the CLI; None runs upgradable_command()"""
+        return None
+    
+    async def asearch(self, query: str) -> List[Package]:
+        """search() as a coroutine"""
+        packages = await self.alocal(self.local_search, query)
+        if packages is not None:
+            return packages
+        return await self.aread_listing('search', self.search_command(query), self.parse_search)
+    
+    async def alist_installed(self) -> List[Package]:
+        """list_installed() as a coroutine"""
+        packages = await self.alocal(self.local_installed)
+        if packages is not None:
+            return packages
+        return await self.aread_listing('installed', self.installed_command(), self.parse_installed)
+    
+    async def alist_upgradable(self) -> List[Package]:
+        """list_upgradable() as a coroutine"""
+        import asyncio
+        packages = await self.alocal(self.local_upgradable)
+        if packages is not None:
+            return packages
+        packages = await self.aread_listing('upgradable', self.upgradable_command(), self.parse_upgradable)
+        return await asyncio.to_thread(self.fill_upgradable, packages) if packages else packages
+    
+    async def aupgrade(self, package: Optional[str] = None,
+                       on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """upgrade() as a coroutine"""
+        packages = [package] if package else []
+        return await self.arun_operation('upgrade', packages, on_output=on_output)
+    
+    async def ainstall(self, package: str,
+                       on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """install() as a coroutine"""
+        return await self.arun_operation('install', [package], on_output=on_output)
+    
+    async def aremove(self, package: str,
+                      on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
+        """remove() as a coroutine"""
+        return await self.arun_operation('remove', [package], on_output=on_output)
+    
+    async def aread_listing(self, listing: str, command: List[str],
+                            parse: Callable[[str], List[Package]]) -> List[Package]:
+        """
+        read_listing() as a coroutine: the blocks are parsed on the event
+        loop as the command's lines arrive. Returns [] if the command fails.
+        """
+        import asyncio
+        parser = parsers.StreamParser(parse, self.HEADER_LINES.get(listing, 0))
+        packages = []
+        try:
+            with tracer.span('stream', COMMAND, command=' '.join(command[:3])):
+                # Warnings on stderr must not end up between the lines of a record
+                returncode, stdout, stderr = await self.transport.arun(
+                    self.prepare_command(command, use_sudo=False), 300,
+                    lambda line: packages.extend(parser.add(line)), merge_stderr=False
+                )
+                packages.extend(parser.finish())
+        except asyncio.TimeoutError:
+            return []
+        except TransportError:
+            raise
+        except Exception:
+            return []
+        return packages if returncode == 0 else []
+    
+    async def alocal(self, read: Callable[..., Optional[List[Package]]], *args) -> Optional[List[Package]]:
+        """
+        Run a local fast path in a worker thread, as database files and
+        service sockets are read with blocking calls. Remote hosts have none.
+        """
+        import asyncio
+        if self.transport.remote:
+            return None
+        return await asyncio.to_thread(read, *args)
+    
+    def update_command(self) -> List[str]:
+        """Command refreshing the repository metadata"""
+        raise NotImplementedError(f"{self.name} has no metadata refresh command")
+    
+    def prefetch_command(self, parallel_downloads: int = 3) -> List[str]:
+        """Command downloading everything a full upgrade would install, without installing it"""
+        raise NotImplementedError(f"{self.name} can't download upgrades ahead of time")
+    
+    def preview_command(self, kind: str, packages: List[str]) -> List[str]:
+        """Dry run of an install, remove or upgrade (all packages if none are given)"""
+        raise NotImplementedError(f"{self.name} can't preview transactions")
+    
+    def parse_preview(self, kind: str, packages: List[str], returncode: int,
+                      stdout: str, stderr: str) -> TransactionPlan:
+        """Parse the output of preview_command()"""
+        raise NotImplementedError(f"{self.name} can't preview transactions")
+    
+    def preview_transaction(self, kind: str, packages: List[str],
+                            use_sudo: bool = False) -> TransactionPlan:
+        """Resolve what an install, remove or upgrade would do, without doing it"""
+        try:
+            returncode, stdout, stderr = self.run_operation('preview', packages, use_sudo=use_sudo, kind=kind)
+        except NotImplementedError as e:
+            return TransactionPlan(self.name, kind, packages, error=str(e))
+        return self.parse_preview(kind, packages, returncode, stdout, stderr)
     
-    def execute_command(self, command: List[str], use_sudo: bool = True) -> tuple[int, str, str]:
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        raise NotImplementedError(f"{self.name} does not support batched install")
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        raise NotImplementedError(f"{self.name} does not support batched remove")
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        raise NotImplementedError(f"{self.name} does not support batched upgrade")
+    
+    def install_packages(self, packages: List[str],
+                         on_output: Optional[Callable[[str], None]] = None) -> BatchResult:
+        """Install several packages in one transaction"""
+        return self.run_batch('install', packages, on_output)
+    
+    def remove_packages(self, packages: List[str],
+                        on_output: Optional[Callable[[str], None]] = None) -> BatchResult:
+        """Remove several packages in one transaction"""
+        return self.run_batch('remove', packages, on_output)
+    
+    def upgrade_packages(self, packages: List[str],
+                         on_output: Optional[Callable[[str], None]] = None) -> BatchResult:
+        """Upgrade several packages in one transaction"""
+        if not packages:
+            # An empty command list would upgrade everything
+            return BatchResult()
+        return self.run_batch('upgrade', packages, on_output)
+    
+    def run_batch(self, op: str, packages: List[str],
+                  on_output: Optional[Callable[[str], None]] = None) -> BatchResult:
+        """Run one transaction for a list of packages and work out per-package outcomes"""
+        # Keep the order but drop duplicates from overlapping selections
+        packages = list(dict.fromkeys(packages))
+        if not packages:
+            return BatchResult()
+        try:
+            # needs_root() keeps flatpak and snap commands unprivileged
+            returncode, stdout, stderr = self.run_operation(op, packages, on_output=on_output)
+        except NotImplementedError as e:
+            result = BatchResult(-1, "", str(e))
+            for package in packages:
+                result.outcomes[package] = FAILED
+                result.messages[package] = str(e)
+            return result
+        return BatchResult.from_transaction(packages, returncode, stdout, stderr,
+                                            atomic=self.atomic_transactions)
+    
+    def read_installed_db(self) -> Optional[List[Package]]:
+        """
+        Read installed packages directly from the native package database.
+        Returns None when there is no reader for this backend or the database
+        can't be read, so callers fall back to the CLI.
+        """
+        return None
+    
+    def read_dependency_db(self) -> Optional[List[DependencyRecord]]:
+        """
+        Read the dependencies, provides and install reasons of the installed
+        packages from the native package database, for the dependency graph.
+        Returns None when there is no reader for this backend or the database
+        can't be read.
+        """
+        return None
+    
+    def query_installed(self, names: List[str]) -> Optional[List[Package]]:
+        """
+        Installed records of just the given packages, to check the outcome of
+        an operation without listing everything. Packages that aren't
+        installed are left out; None means the query itself failed.
+        This default filters the full listing, backends override it with a
+        targeted query.
+        """
+        wanted = set(names)
+        return [package for package in self.list_installed() if package.name in wanted]
+    
+    def lock_groups(self) -> List[str]:
+        """Locks an operation of this manager holds while it runs"""
+        return [self.lock_group or self.name]
+    
+    def index_sources(self) -> List[str]:
+        """Repository metadata files the local search index is built from"""
+        return []
+    
+    def read_index_source(self, path: str) -> Iterator[Tuple[str, str]]:
+        """Yield (name, description) for every package in a metadata file"""
+        return iter(())
+    
+    def needs_root(self, command: List[str], use_sudo: bool = True) -> bool:
+        """Check whether a command has to run with root rights"""
+        return use_sudo and command[0] not in ['flatpak', 'snap']
+    
+    def prepare_command(self, command: List[str], use_sudo: bool = True) -> List[str]:
+        """Add privilege escalation to a command when it needs it"""
+        if self.needs_root(command, use_sudo):
+            return self.transport.escalate(command)
+        return command
+    
+    def helper_for(self, command: List[str], use_sudo: bool = True):
+        """Get the privileged helper to run a root command through, if any"""
+        helper = PackageManager.privileged_helper
+        if helper is None or self.transport.remote or not self.needs_root(command, use_sudo):
+            return None
+        # Starting the helper asks for authentication once; if that fails
+        # commands fall back to their own pkexec
+        if not helper.ensure_started():
+            return None
+        return helper
+    
+    def operation_command(self, op: str, packages: Sequence[str] = (), kind: str = "",
+                          parallel_downloads: int = 3) -> List[str]:
+        """
+        Command of an operation that may need root: update, prefetch,
+        preview (of `kind`), install, remove or upgrade. The privileged
+        helper builds its command lines here too, from validated requests.
+        """
+        packages = list(packages)
+        if op == 'update':
+            return self.update_command()
+        if op == 'prefetch':
+            return self.prefetch_command(parallel_downloads)
+        if op == 'preview':
+            return self.preview_command(kind, packages)
+        if op in ('install', 'remove', 'upgrade'):
+            return getattr(self, f"{op}_command")(packages)
+        raise ValueError(f"Unknown operation: {op}")
+    
+    def run_operation(self, op: str, packages: Sequence[str] = (), use_sudo: bool = True,
+                      on_output: Optional[Callable[[str], None]] = None, **options) -> tuple[int, str, str]:
+        """
+        Run an operation (see operation_command()). A root operation goes to
+        the privileged helper as a request the helper builds the command of
+        itself; without the helper, the command runs with its own pkexec.
+        Raises NotImplementedError if the backend lacks the operation.
+        Returns: (return_code, stdout, stderr)
+        """
+        command = self.operation_command(op, packages, **options)
+        helper = self.helper_for(command, use_sudo)
+        if helper is not None:
+            with tracer.span('helper', COMMAND, command=' '.join(command[:3])):
+                return helper.run(self.command, op, packages, on_output=on_output, **options)
+        return self.execute_command(command, use_sudo=use_sudo, on_output=on_output)
+    
+    async def arun_operation(self, op: str, packages: Sequence[str] = (), use_sudo: bool = True,
+                             on_output: Optional[Callable[[str], None]] = None,
+                             **options) -> tuple[int, str, str]:
+        """run_operation() as a coroutine"""
+        import asyncio
+        command = self.operation_command(op, packages, **options)
+        helper = self.helper_for(command, use_sudo)
+        if helper is not None:
+            # The helper's protocol is blocking, so it gets a worker thread
+            with tracer.span('helper', COMMAND, command=' '.join(command[:3])):
+                return await asyncio.to_thread(helper.run, self.command, op, packages,
+                                               on_output=on_output, **options)
+        return await self.aexecute_command(command, use_sudo=use_sudo, on_output=on_output)
+    
+    def stream_command(self, command: List[str], use_sudo: bool = True,
+                       timeout: Optional[float] = 300, merge_stderr: bool = True) -> CommandStream:
+        """
+        Start a command whose output is consumed line by line while it runs.
+        Iterate the returned CommandStream; its returncode is set afterwards.
+        """
+        return self.transport.stream(self.prepare_command(command, use_sudo), timeout=timeout,
+                                     merge_stderr=merge_stderr)
+    
+    def execute_command(self, command: List[str], use_sudo: bool = True,
+                        on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """
         Execute a shell command
+        When on_output is given, every output line is passed to it as it is
+        produced and only the tail of the output is returned. Root commands
+        ask for authentication themselves; operations that may use the
+        privileged helper go through run_operation().
         Returns: (return_code, stdout, stderr)
         """
+        label = ' '.join(command[:3])
+        if on_output is not None:
+            with tracer.span('stream', COMMAND, command=label):
+                return self.execute_streaming(command, use_sudo, on_output)
         try:
-            if use_sudo and command[0] not in ['flatpak', 'snap']:
-                # Use pkexec for GUI authentication
-                command = ['pkexec'] + command
-            
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
-            return result.returncode, result.stdout, result.stderr
+            command = self.prepare_command(command, use_sudo)
+            return self.transport.run(command, timeout=300)  # 5 minute timeout
         except subprocess.TimeoutExpired:
             return -1, "", "Command timed out"
+        except TransportError:
+            # An unreachable host is not an empty listing
+            raise
         except Exception as e:
             return -1, "", str(e)
     
+    async def aexecute_command(self, command: List[str], use_sudo: bool = True,
+                               on_output: Optional[Callable[[str], None]] = None,
+                               timeout: Optional[float] = 300) -> tuple[int, str, str]:
+        """
+        execute_command() as a coroutine: the command runs as an asyncio
+        subprocess, and cancelling the awaiting task kills it.
+        Returns: (return_code, stdout, stderr)
+        """
+        import asyncio
+        try:
+            return await self.transport.arun(self.prepare_command(command, use_sudo), timeout, on_output)
+        except asyncio.TimeoutError:
+            return -1, "", "Command timed out"
+        except TransportError:
+            raise
+        except Exception as e:
+            return -1, "", str(e)
+    
+    def execute_streaming(self, command: List[str], use_sudo: bool,
+                          on_output: Callable[[str], None]) -> tuple[int, str, str]:
+        """Execute a command, forwarding its output lines to on_output"""
+        stream = self.stream_command(command, use_sudo)
+        for line in stream:
+            on_output(line)
+        output = stream.tail_text()
+        if stream.returncode == 0:
+            return 0, output, ""
+        # stdout and stderr are merged, so the tail is the best error report
+        return stream.returncode, output, stream.error or output
+    
     def is_command_available(self, command: str) -> bool:
-        """Check if a command is available in PATH"""
-        return shutil.which(command) is not None
+        """Check if a command is available in PATH (of the transport's host)"""
+        try:
+            return command in self.transport.which([command])
+        except Exception:
+            return False
+
+
+# The shared helpers (install_packages, query_installed, ...) are timed too
+instrument(PackageManager)
@@ -0,0 +1,87 @@
+"""
+Batched package transactions
+Result type for install/remove/upgrade of several packages in one run of
+the package manager, with an outcome for every package.
+"""
+from typing import List, Dict
+import re
+
+OK = 'ok'
+FAILED = 'failed'
+NOT_APPLIED = 'not applied'
+UNKNOWN = 'unknown'
+
+# Lines that report an error about a specific package
+ERROR_LINE_RE = re.compile(
+    r'^(E:|error|Error|No match for argument|Unable to find a match|warning: target not found)'
+)
+
+
+class BatchResult:
+    """Outcome of a batched transaction"""
+    
+    def __init__(self, returncode: int = 0, stdout: str = "", stderr: str = ""):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        # package -> OK / FAILED / NOT_APPLIED / UNKNOWN
+        self.outcomes: Dict[str, str] = {}
+        # package -> error line that mentioned it
+        self.messages: Dict[str, str] = {}
+    
+    @classmethod
+    def from_transaction(cls, packages: List[str], returncode: int, stdout: str, stderr: str,
+                         atomic: bool = True) -> 'BatchResult':
+        """
+        Work out per-package outcomes of one transaction.
+        On success every package is OK. On failure packages named in error
+        lines are FAILED; the others were rolled back with the transaction
+        (NOT_APPLIED) or, for non-atomic backends, are UNKNOWN.
+        """
+        result = cls(returncode, stdout, stderr)
+        if returncode == 0:
+            for package in packages:
+                result.outcomes[package] = OK
+            return result
+        
+        error_lines = [
+            line.strip() for line in f"{stdout}\n{stderr}".split('\n')
+            if ERROR_LINE_RE.match(line.strip())
+        ]
+        for package in packages:
+            pattern = re.compile(r'(^|[\s\'"‘“/:])' + re.escape(package) + r'($|[\s\'"’”.,:])')
+            for line in error_lines:
+                if pattern.search(line):
+                    result.outcomes[package] = FAILED
+                    result.messages[package] = line
+                    break
+            else:
+                result.outcomes[package] = NOT_APPLIED if atomic else UNKNOWN
+        return result
+    
+    @classmethod
+    def merge(cls, results: List['BatchResult']) -> 'BatchResult':
+        """Combine the results of transactions on several backends"""
+        merged = cls()
+        stdout = []
+        stderr = []
+        for result in results:
+            if result.returncode != 0 and merged.returncode == 0:
+                merged.returncode = result.returncode
+            if result.stdout:
+                stdout.append(result.stdout)
+            if result.stderr:
+                stderr.append(result.stderr)
+            merged.outcomes.update(result.outcomes)
+            merged.messages.update(result.messages)
+        merged.stdout = '\n'.join(stdout)
+        merged.stderr = '\n'.join(stderr)
+        return merged
+    
+    def succeeded(self) -> List[str]:
+        """Packages the transaction applied"""
+        return [package for package, outcome in self.outcomes.items() if outcome == OK]
+    
+    def failed(self) -> List[str]:
+        """Packages that were not applied for any reason"""
+        return [package for package, outcome in self.outcomes.items() if outcome != OK]
@@ -0,0 +1,181 @@
+"""
+Persistent package inventory cache
+Stores list_installed()/list_upgradable() results under the XDG cache
+directory, keyed on a fingerprint of the backend's package database.
+"""
+from typing import List, Optional, Callable
+import hashlib
+import json
+import os
+import threading
+from .package import Package, FIELDS
+
+
+def cache_dir() -> str:
+    """Get the Orange Update cache directory (XDG_CACHE_HOME aware)"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'orange-update')
+
+
+def fingerprint_paths(paths: List[str]) -> Optional[str]:
+    """
+    Fingerprint a set of database files/directories by path, mtime and size.
+    Returns None when none of the paths exist.
+    """
+    parts = []
+    for path in paths:
+        path = os.path.expanduser(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+    if not parts:
+        return None
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+
+class InventoryCache:
+    """On-disk cache for package inventories with size-bounded eviction"""
+
+    KINDS = ('installed', 'upgradable')
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 64 * 1024 * 1024,
+                 enabled: Optional[bool] = None):
+        self.directory = directory or os.path.join(cache_dir(), 'inventory')
+        self.max_bytes = max_bytes
+        if enabled is None:
+            enabled = not os.environ.get('ORANGE_UPDATE_NO_CACHE')
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+    def fingerprint(self, manager, kind: str) -> Optional[str]:
+        """Fingerprint of the databases a listing depends on"""
+        if manager.transport.remote:
+            # The database paths are on another host
+            return None
+        if kind == 'installed':
+            paths = manager.installed_db_paths
+        elif manager.metadata_db_paths:
+            # Upgradable results depend on both installed and repository state
+            paths = manager.installed_db_paths + manager.metadata_db_paths
+        else:
+            return None
+        return fingerprint_paths(paths)
+
+    def entry_path(self, manager, kind: str) -> str:
+        """Path of the cache file for a manager/listing pair"""
+        return os.path.join(self.directory, f"{manager.name.lower()}-{kind}.json")
+
+    def get(self, manager, kind: str) -> Optional[List[Package]]:
+        """Get a cached listing if it is still valid for the current databases"""
+        if not self.enabled:
+            return None
+        fingerprint = self.fingerprint(manager, kind)
+        if fingerprint is None:
+            return None
+        path = self.entry_path(manager, kind)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('fingerprint') != fingerprint or entry.get('fields') != list(FIELDS):
+            # Stale, or written by a version with another record layout
+            return None
+        try:
+            packages = [Package.fromtuple(row) for row in entry.get('packages', [])]
+        except (TypeError, ValueError):
+            return None
+        try:
+            # Touch so eviction sees this entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return packages
+
+    def put(self, manager, kind: str, packages: List[Package]):
+        """Store a listing for the current database fingerprint"""
+        if not self.enabled:
+            return
+        fingerprint = self.fingerprint(manager, kind)
+        if fingerprint is None:
+            return
+        path = self.entry_path(manager, kind)
+        # One array per record instead of repeating the keys
+        entry = {
+            'fingerprint': fingerprint,
+            'fields': list(FIELDS),
+            'packages': [package.astuple() for package in packages]
+        }
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, separators=(',', ':'))
+                os.replace(tmp_path, path)
+            except OSError:
+                return
+            self.evict()
+
+    def load(self, manager, kind: str, loader: Callable[[], List[Package]],
+             force: bool = False) -> List[Package]:
+        """
+        Return the cached listing, or call loader() and cache its result.
+        force=True bypasses the cached entry and re-queries the backend.
+        """
+        if not force:
+            packages = self.get(manager, kind)
+            if packages is not None:
+                return packages
+        packages = loader()
+        # Backends report failures as empty lists, so never pin an empty result
+        if packages:
+            self.put(manager, kind, packages)
+        return packages
+
+    def list_installed(self, manager, force: bool = False) -> List[Package]:
+        """Cached wrapper around manager.list_installed()"""
+        return self.load(manager, 'installed', manager.list_installed, force)
+
+    def list_upgradable(self, manager, force: bool = False) -> List[Package]:
+        """Cached wrapper around manager.list_upgradable()"""
+        return self.load(manager, 'upgradable', manager.list_upgradable, force)
+
+    def invalidate(self, manager=None):
+        """Drop cached entries for one manager, or all of them"""
+        with self.lock:
+            for path in self.entries():
+                if manager is None or os.path.basename(path).startswith(f"{manager.name.lower()}-"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def entries(self) -> List[str]:
+        """Paths of all cache entries"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith('.json')]
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        stats = []
+        for path in self.entries():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
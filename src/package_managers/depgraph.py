@@ -0,0 +1,297 @@
+"""
+Dependency graph
+In-memory graph of a backend's installed packages, read from its native
+package database. Packages get compact integer ids and edges are kept as
+arrays of ids in both directions, so reverse dependencies, leaves and
+orphans are answered without running the package manager. After a
+transaction the graph is synced with the database, and only packages whose
+record changed are linked again.
+"""
+from typing import List, Dict, Optional, Set, Iterable, Tuple
+from array import array
+from itertools import chain
+import threading
+from .cache import fingerprint_paths
+from .package import Package
+
+
+class DependencyRecord:
+    """
+    Dependency information of one installed package.
+    `depends` and `weak` hold groups of alternative names, any of which
+    satisfies the group. Weak dependencies (recommends, suggests) break
+    nothing when they go away, but keep a package from becoming an orphan.
+    `explicit` is False for packages installed as dependencies and None when
+    the backend doesn't know; only False ones can be orphans.
+    """
+    __slots__ = ('name', 'version', 'description', 'depends', 'weak', 'provides', 'explicit')
+    
+    def __init__(self, name: str, version: str = "", description: str = "",
+                 depends: Iterable[Tuple[str, ...]] = (), weak: Iterable[Tuple[str, ...]] = (),
+                 provides: Iterable[str] = (), explicit: Optional[bool] = None):
+        self.name = name
+        self.version = version
+        self.description = description
+        self.depends = tuple(depends)
+        self.weak = tuple(weak)
+        self.provides = tuple(provides)
+        self.explicit = explicit
+    
+    def signature(self) -> tuple:
+        """Everything that decides how the package is linked"""
+        return self.version, self.depends, self.weak, self.provides, self.explicit
+
+
+def drop(ids: array, node: int):
+    """Remove an id from an adjacency array if it is there"""
+    try:
+        ids.remove(node)
+    except ValueError:
+        pass
+
+
+class DependencyGraph:
+    """
+    Installed packages of one backend and the dependencies between them.
+    Ids of removed packages are reused. Dependencies on names no installed
+    package provides (file dependencies rpm can't resolve, uninstalled
+    alternatives) are left out.
+    """
+    
+    def __init__(self, manager: str):
+        self.manager = manager
+        self.ids: Dict[str, int] = {}
+        # Per id; None marks a free id
+        self.records: List[Optional[DependencyRecord]] = []
+        self.deps: List[array] = []
+        self.rdeps: List[array] = []
+        self.weak_deps: List[array] = []
+        self.weak_rdeps: List[array] = []
+        self.free: List[int] = []
+        # name -> ids of the packages providing it / depending on it
+        self.providers: Dict[str, Set[int]] = {}
+        self.dependents: Dict[str, Set[int]] = {}
+        self.orphan_ids: Optional[List[int]] = None
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def allocate(self, name: str) -> int:
+        """Id for a new package"""
+        if self.free:
+            node = self.free.pop()
+        else:
+            node = len(self.records)
+            self.records.append(None)
+            for edges in (self.deps, self.rdeps, self.weak_deps, self.weak_rdeps):
+                edges.append(array('I'))
+        self.ids[name] = node
+        return node
+    
+    def link(self, node: int, dirty: Set[int]):
+        """Register what a package provides and depends on"""
+        record = self.records[node]
+        for name in (record.name, *record.provides):
+            self.providers.setdefault(name, set()).add(node)
+            # Packages depending on the name may be satisfied by this one now
+            dirty.update(self.dependents.get(name, ()))
+        for name in set(chain.from_iterable(record.depends + record.weak)):
+            self.dependents.setdefault(name, set()).add(node)
+        dirty.add(node)
+    
+    def unlink(self, node: int, dirty: Set[int]):
+        """Undo link() for a package that changed or went away"""
+        record = self.records[node]
+        for name in (record.name, *record.provides):
+            self.providers.get(name, set()).discard(node)
+            dirty.update(self.dependents.get(name, ()))
+        for name in set(chain.from_iterable(record.depends + record.weak)):
+            self.dependents.get(name, set()).discard(node)
+    
+    def targets(self, node: int, groups: Tuple[Tuple[str, ...], ...]) -> Set[int]:
+        """Installed packages satisfying any of the alternatives of the groups"""
+        found = set()
+        for group in groups:
+            for name in group:
+                found.update(self.providers.get(name, ()))
+        found.discard(node)
+        return found
+    
+    def set_edges(self, node: int, hard: Set[int], weak: Set[int]):
+        """Replace a package's outgoing edges and the matching reverse edges"""
+        for forward, backward, targets in ((self.deps, self.rdeps, hard),
+                                           (self.weak_deps, self.weak_rdeps, weak)):
+            old = set(forward[node])
+            for target in old - targets:
+                drop(backward[target], node)
+            for target in targets - old:
+                backward[target].append(node)
+            forward[node] = array('I', sorted(targets))
+    
+    def resolve(self, node: int):
+        """Work out a package's edges from its dependency names"""
+        record = self.records[node]
+        hard = self.targets(node, record.depends)
+        self.set_edges(node, hard, self.targets(node, record.weak) - hard)
+    
+    def sync(self, records: Iterable[DependencyRecord]) -> int:
+        """Bring the graph in line with the database, returns the number of changed packages"""
+        seen = set()
+        dirty: Set[int] = set()
+        changed = 0
+        for record in records:
+            seen.add(record.name)
+            node = self.ids.get(record.name)
+            if node is not None:
+                if self.records[node].signature() == record.signature():
+                    continue
+                self.unlink(node, dirty)
+            else:
+                node = self.allocate(record.name)
+            self.records[node] = record
+            self.link(node, dirty)
+            changed += 1
+        for name in [name for name in self.ids if name not in seen]:
+            node = self.ids.pop(name)
+            self.unlink(node, dirty)
+            self.set_edges(node, set(), set())
+            self.records[node] = None
+            self.free.append(node)
+            changed += 1
+        for node in dirty:
+            if self.records[node] is not None:
+                self.resolve(node)
+        if changed:
+            self.orphan_ids = None
+        return changed
+    
+    def names(self, nodes: Iterable[int]) -> List[str]:
+        """Package names of ids, sorted"""
+        return sorted(self.records[node].name for node in nodes)
+    
+    def package(self, node: int) -> Package:
+        """Package record of an id"""
+        record = self.records[node]
+        return Package(record.name, self.manager, version=record.version, description=record.description)
+    
+    def lookup(self, name: str) -> Optional[int]:
+        """Id of an installed package; dpkg's name:arch packages also answer to the bare name"""
+        node = self.ids.get(name)
+        if node is None and ':' not in name:
+            for provider in self.providers.get(name, ()):
+                if self.records[provider].name.partition(':')[0] == name:
+                    return provider
+        return node
+    
+    def required_by(self, name: str) -> List[str]:
+        """Installed packages depending on a package"""
+        node = self.lookup(name)
+        return [] if node is None else self.names(self.rdeps[node])
+    
+    def depends_on(self, name: str) -> List[str]:
+        """Installed packages a package depends on"""
+        node = self.lookup(name)
+        return [] if node is None else self.names(self.deps[node])
+    
+    def breaks(self, names: Iterable[str]) -> List[str]:
+        """
+        Packages left with an unsatisfied dependency once the given ones are
+        removed, following the breakage through their dependents in turn
+        """
+        removed = {self.lookup(name) for name in names} - {None}
+        queue = list(removed)
+        broken = []
+        while queue:
+            node = queue.pop()
+            for dependent in self.rdeps[node]:
+                if dependent in removed:
+                    continue
+                if any(self.unsatisfied(dependent, group, removed) for group in self.records[dependent].depends):
+                    removed.add(dependent)
+                    queue.append(dependent)
+                    broken.append(dependent)
+        return self.names(broken)
+    
+    def unsatisfied(self, node: int, group: Tuple[str, ...], removed: Set[int]) -> bool:
+        """Check whether removing packages takes away every provider of a dependency"""
+        providers = self.targets(node, (group,))
+        return bool(providers) and providers <= removed
+    
+    def leaves(self) -> List[str]:
+        """Installed packages nothing depends on, not even weakly"""
+        return self.names(node for node in self.ids.values()
+                          if not self.rdeps[node] and not self.weak_rdeps[node])
+    
+    def orphans(self) -> List[Package]:
+        """
+        Packages installed as dependencies that no explicitly installed package
+        needs anymore, directly or through other packages
+        """
+        if self.orphan_ids is None:
+            reached = bytearray(len(self.records))
+            stack = [node for node in self.ids.values() if self.records[node].explicit is not False]
+            for node in stack:
+                reached[node] = 1
+            while stack:
+                node = stack.pop()
+                for target in chain(self.deps[node], self.weak_deps[node]):
+                    if not reached[target]:
+                        reached[target] = 1
+                        stack.append(target)
+            self.orphan_ids = [node for node in self.ids.values() if not reached[node]]
+        return sorted((self.package(node) for node in self.orphan_ids), key=lambda package: package.name)
+
+
+class DependencyGraphs:
+    """
+    Dependency graphs of the backends that can read their package database.
+    A graph is only synced when the database fingerprint changed.
+    """
+    
+    def __init__(self):
+        self.graphs: Dict[str, DependencyGraph] = {}
+        self.stamps: Dict[str, str] = {}
+        self.lock = threading.Lock()
+    
+    def covers(self, manager) -> bool:
+        """Check whether a manager's dependencies can be read from its database"""
+        return bool(manager.dependency_db_paths) and manager.use_native_db
+    
+    def refresh(self, manager) -> Optional[int]:
+        """Build or sync a manager's graph, returns the number of changed packages (None if unsupported)"""
+        if not self.covers(manager):
+            return None
+        stamp = fingerprint_paths(manager.dependency_db_paths)
+        with self.lock:
+            if stamp is not None and self.stamps.get(manager.name) == stamp:
+                return 0
+        records = manager.read_dependency_db()
+        if records is None:
+            return None
+        with self.lock:
+            graph = self.graphs.get(manager.name)
+            if graph is None:
+                graph = self.graphs[manager.name] = DependencyGraph(manager.name)
+            changed = graph.sync(records)
+            self.stamps[manager.name] = stamp
+        return changed
+    
+    def ready(self, manager) -> bool:
+        """Check whether a manager's graph has been built"""
+        return manager.name in self.graphs
+    
+    def breaks(self, manager, names: List[str]) -> Optional[List[str]]:
+        """Packages removing the given ones would break, None without a graph"""
+        with self.lock:
+            graph = self.graphs.get(manager.name)
+            return None if graph is None else graph.breaks(names)
+    
+    def orphans(self, managers: list) -> List[Package]:
+        """Orphaned packages of every manager with a graph"""
+        packages = []
+        with self.lock:
+            for manager in managers:
+                graph = self.graphs.get(manager.name)
+                if graph is not None:
+                    packages.extend(graph.orphans())
+        return packages
@@ -1,53 +1,143 @@
 """
 Package Manager Detector - Scans system for available package managers
 """
-from typing import List
-from .apt_manager import AptManager
-from .dnf_manager import DnfManager
-from .pacman_manager import PacmanManager
-from .flatpak_manager import FlatpakManager
-from .snap_manager import SnapManager
+from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import importlib
+import os
+import shutil
+import threading
+from .probes import PROBES, PROBE_TIMEOUT, ProbeCache, ProbeResult
+
+# (name, command, module, class) of every supported package manager.
+# Detection looks for the command and probes it; the module is imported on first use.
+MANAGER_SPECS = [
+    ("APT", "apt", ".apt_manager", "AptManager"),
+    ("DNF", "dnf", ".dnf_manager", "DnfManager"),
+    ("Pacman", "pacman", ".pacman_manager", "PacmanManager"),
+    ("Flatpak", "flatpak", ".flatpak_manager", "FlatpakManager"),
+    ("Snap", "snap", ".snap_manager", "SnapManager"),
+]
 
 
 class PackageManagerDetector:
-    """Detects and initializes available package managers on the system"""
-    
-    def __init__(self):
-        self.managers = []
-        self.detect_managers()
-    
-    def detect_managers(self) -> List:
-        """Detect all available package managers"""
-        # List of all supported package managers
-        manager_classes = [
-            AptManager,
-            DnfManager,
-            PacmanManager,
-            FlatpakManager,
-            SnapManager
-        ]
-        
-        self.managers = []
-        for manager_class in manager_classes:
-            try:
-                manager = manager_class()
-                if manager.available:
-                    self.managers.append(manager)
-                    print(f"✓ Detected: {manager.name}")
-                else:
-                    print(f"✗ Not found: {manager.name}")
-            except Exception as e:
-                print(f"✗ Error checking {manager_class.__name__}: {e}")
+    """
+    Detects available package managers on the system.
+    Detection is a PATH lookup per command followed by a capability probe
+    (does the binary run, is snapd reachable), run concurrently with short
+    timeouts and cached until the binary changes. Backends whose probe
+    fails are left out, so they fail at startup instead of timing out on
+    every call. Manager objects (and their modules) are only created when
+    they are first asked for.
+    """
+    
+    def __init__(self, verbose: bool = True, detect: bool = True,
+                 probe_cache: Optional[ProbeCache] = None, probe_timeout: float = PROBE_TIMEOUT):
+        # Report detection on stdout; off for machine readable output
+        self.verbose = verbose
+        self.detected: List[tuple] = []
+        self.instances: Dict[str, object] = {}
+        self.probe_cache = probe_cache
+        self.probe_timeout = probe_timeout
+        # Probe results of the backends found on PATH, by name
+        self.probes: Dict[str, ProbeResult] = {}
+        self.lock = threading.Lock()
+        if detect:
+            self.detect_managers()
+    
+    def detect_managers(self) -> List[str]:
+        """Detect all working package managers, returns their names"""
+        paths = {spec[0]: shutil.which(spec[1]) for spec in MANAGER_SPECS}
+        found = [name for name, path in paths.items() if path is not None]
+        if self.probe_cache is None:
+            self.probe_cache = ProbeCache()
+        with ThreadPoolExecutor(max_workers=max(1, len(found))) as pool:
+            results = pool.map(lambda name: self.probe(name, paths[name]), found)
+            self.probes = dict(zip(found, results))
+        self.probe_cache.save()
         
-        return self.managers
+        self.detected = []
+        for spec in MANAGER_SPECS:
+            result = self.probes.get(spec[0])
+            if result is None:
+                self.report(f"✗ Not found: {spec[0]}")
+            elif not result.ok:
+                self.report(f"✗ Not working: {spec[0]} ({result.error})")
+            else:
+                self.detected.append(spec)
+                version = f" {result.version}" if result.version else ""
+                self.report(f"✓ Detected: {spec[0]}{version}")
+        return self.get_available_names()
+    
+    def probe(self, name: str, path: str) -> ProbeResult:
+        """Probe one backend, or take a still valid cached result"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        result = self.probe_cache.get(name, path, mtime)
+        if result is not None:
+            return result
+        probe = PROBES.get(name)
+        result = probe(self.probe_timeout) if probe else ProbeResult(True)
+        self.probe_cache.put(name, path, mtime, result)
+        return result
+    
+    def report(self, message: str):
+        """Print a detection message when verbose"""
+        if self.verbose:
+            print(message)
+    
+    def get_available_names(self) -> List[str]:
+        """Names of the detected package managers, without loading them"""
+        return [spec[0] for spec in self.detected]
+    
+    def load_manager(self, spec: tuple):
+        """Create the manager for a spec, importing its module on first use"""
+        name, _, module_name, class_name = spec
+        with self.lock:
+            if name not in self.instances:
+                try:
+                    module = importlib.import_module(module_name, __package__)
+                    manager = getattr(module, class_name)()
+                    probe = self.probes.get(name)
+                    if probe is not None:
+                        manager.backend_version = probe.version
+                        manager.capabilities = dict(probe.capabilities)
+                except Exception as e:
+                    self.report(f"✗ Error checking {class_name}: {e}")
+                    manager = None
+                self.instances[name] = manager
+            return self.instances[name]
     
     def get_available_managers(self) -> List:
         """Get list of available package managers"""
-        return self.managers
+        managers = []
+        for spec in self.detected:
+            manager = self.load_manager(spec)
+            if manager is not None and manager.available:
+                managers.append(manager)
+        return managers
     
     def get_manager_by_name(self, name: str):
         """Get a specific manager by name"""
-        for manager in self.managers:
-            if manager.name.lower() == name.lower():
-                return manager
+        for spec in self.detected:
+            if spec[0].lower() == name.lower():
+                manager = self.load_manager(spec)
+                if manager is not None and manager.available:
+                    return manager
         return None
+
+
+def detect_remote(transport) -> List:
+    """
+    Managers of the supported backends found on a transport's host, with the
+    transport set. Raises transport.TransportError if the host can't be reached.
+    """
+    found = transport.which([spec[1] for spec in MANAGER_SPECS])
+    managers = []
+    for name, command, module_name, class_name in MANAGER_SPECS:
+        if command in found:
+            module = importlib.import_module(module_name, __package__)
+            managers.append(getattr(module, class_name)(transport))
+    return managers
@@ -1,102 +1,324 @@
 """
 DNF Package Manager Handler (Fedora, RHEL 8+, etc.)
 """
-from typing import List, Dict, Optional
-import re
+from typing import List, Dict, Optional, Callable, Iterator, Tuple
+from collections import Counter
+import glob
+import os
+import sqlite3
 from .base import PackageManager
+from .transport import Transport
+from .package import Package
+from . import parsers
+from .plan import TransactionPlan, parse_size
+from .depgraph import DependencyRecord
+from .native_db import (
+    read_rpmdb, read_rpm_primary, rpm_evr, rpm_file_owners, read_dnf_reasons, read_dnf5_reasons,
+    RPMTAG_NAME, RPMTAG_VERSION, RPMTAG_RELEASE, RPMTAG_SUMMARY, RPMTAG_PROVIDENAME, RPMTAG_REQUIRENAME, RPMTAG_RECOMMENDNAME,
+    RPMTAG_SUGGESTNAME, RPM_DEPENDENCY_TAGS
+)
 
 
 class DnfManager(PackageManager):
     """Handler for DNF package manager"""
     
-    def __init__(self):
-        super().__init__()
+    # rpm -q fields, with the version formatted like rpm_evr()
+    QUERY_FORMAT = "%{NAME}\\t%|EPOCH?{%{EPOCH}:}:{}|%{VERSION}-%{RELEASE}\\t%{SUMMARY}\\n"
+    
+    def __init__(self, transport: Optional[Transport] = None):
+        super().__init__(transport)
         self.name = "DNF"
         self.command = "dnf"
+        self.installed_db_paths = [
+            "/var/lib/rpm/rpmdb.sqlite",
+            "/var/lib/rpm/Packages",
+            "/usr/lib/sysimage/rpm/rpmdb.sqlite"
+        ]
+        self.metadata_db_paths = ["/var/cache/dnf", "/var/cache/libdnf5"]
+        # dnf4 refuses to resolve transactions for normal users
+        self.preview_as_root = True
+        self.native_db_path = None
+        # Install reasons: dnf4's history database, dnf5's system state
+        self.history_db_path = "/var/lib/dnf/history.sqlite"
+        self.dnf5_state_path = "/usr/lib/sysimage/libdnf5/packages.toml"
+        self.dependency_db_paths = self.installed_db_paths + [self.history_db_path, self.dnf5_state_path]
+        self.download_cache_paths = ["/var/cache/dnf", "/var/cache/libdnf5"]
+        # Shares the rpm database lock with every other rpm frontend
+        self.lock_group = "rpm"
         self.available = self.check_availability()
     
     def check_availability(self) -> bool:
         """Check if DNF is installed"""
         return self.is_command_available("dnf")
     
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update package lists"""
-        return self.execute_command(["dnf", "check-update"])
+        returncode, stdout, stderr = self.run_operation('update', on_output=on_output)
+        # check-update exits with 100 when updates are available
+        return (0 if returncode == 100 else returncode), stdout, stderr
     
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
-        if package:
-            return self.execute_command(["dnf", "upgrade", "-y", package])
-        else:
-            return self.execute_command(["dnf", "upgrade", "-y"])
+        packages = [package] if package else []
+        return self.run_operation('upgrade', packages, on_output=on_output)
     
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["dnf", "search", query], use_sudo=False
-        )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            current_package = None
-            for line in lines:
-                if line and not line.startswith('=') and not line.startswith('Last metadata'):
-                    if ':' in line and not line.startswith(' '):
-                        match = re.match(r'^([^\s:]+)\s*:\s*(.+)$', line)
-                        if match:
-                            current_package = {
-                                'name': match.group(1).split('.')[0],
-                                'description': match.group(2),
-                                'manager': 'DNF'
-                            }
-                            packages.append(current_package)
-        return packages
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the repositories"""
+        return ["dnf", "search", query]
+    
+    def parse_search(self, stdout: str) -> List[Package]:
+        """Parse the output of `dnf search <query>`"""
+        return parsers.dnf_search(stdout, self.name)
+    
+    def index_sources(self) -> List[str]:
+        """Primary metadata of the enabled repositories in the dnf cache"""
+        sources = []
+        for cache in self.metadata_db_paths:
+            for pattern in ("*primary.sqlite", "*primary.xml", "*primary.xml.gz",
+                            "*primary.xml.xz", "*primary.xml.bz2"):
+                sources.extend(glob.glob(os.path.join(cache, "*", "repodata", pattern)))
+        # primary.xml.zst (dnf5) can't be read without zstd, those repos fall back to dnf search
+        return sorted(sources)
     
-    def install(self, package: str) -> tuple[int, str, str]:
+    def read_index_source(self, path: str) -> Iterator[Tuple[str, str]]:
+        """Read packages from repository primary metadata"""
+        return read_rpm_primary(path)
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
-        return self.execute_command(["dnf", "install", "-y", package])
+        return self.run_operation('install', [package], on_output=on_output)
     
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
-        return self.execute_command(["dnf", "remove", "-y", package])
+        return self.run_operation('remove', [package], on_output=on_output)
     
-    def list_installed(self) -> List[Dict[str, str]]:
-        """List all installed packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["dnf", "list", "installed"], use_sudo=False
-        )
+    def update_command(self) -> List[str]:
+        """Command refreshing the repository metadata"""
+        return ["dnf", "check-update"]
+    
+    def prefetch_command(self, parallel_downloads: int = 3) -> List[str]:
+        """Command downloading everything a full upgrade would install, without installing it"""
+        return ["dnf", "upgrade", "--downloadonly", "-y",
+                f"--setopt=max_parallel_downloads={parallel_downloads}"]
+    
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        return ["dnf", "install", "-y", *packages]
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        return ["dnf", "remove", "-y", *packages]
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        if packages:
+            return ["dnf", "upgrade", "-y", *packages]
+        return ["dnf", "upgrade", "-y"]
+    
+    def find_rpmdb(self) -> Optional[str]:
+        """Locate the sqlite rpm database"""
+        if self.native_db_path:
+            return self.native_db_path
+        for path in self.installed_db_paths:
+            if path.endswith('.sqlite') and os.path.exists(path):
+                return path
+        return None
+    
+    def read_installed_db(self) -> Optional[List[Package]]:
+        """Read installed packages from the sqlite rpm database"""
+        if not self.use_native_db:
+            return None
+        path = self.find_rpmdb()
+        if not path:
+            # BerkeleyDB based rpmdb (older RHEL) - leave it to dnf
+            return None
+        try:
+            return [
+                Package(
+                    header[RPMTAG_NAME],
+                    self.name,
+                    version=rpm_evr(header),
+                    description=header.get(RPMTAG_SUMMARY, '')
+                )
+                for header in read_rpmdb(path)
+            ]
+        except (OSError, sqlite3.Error, ValueError, KeyError):
+            return None
+    
+    def read_install_reasons(self) -> Dict[str, bool]:
+        """Whether each package was installed as a dependency, from dnf5's or dnf4's records"""
+        try:
+            if os.path.exists(self.dnf5_state_path):
+                return read_dnf5_reasons(self.dnf5_state_path) or {}
+            return read_dnf_reasons(self.history_db_path)
+        except (OSError, sqlite3.Error, ValueError):
+            # Unknown reasons: nothing is reported as an orphan
+            return {}
+    
+    def read_dependency_db(self) -> Optional[List[DependencyRecord]]:
+        """Read requires, provides and weak dependencies from the sqlite rpm database"""
+        if not self.use_native_db:
+            return None
+        path = self.find_rpmdb()
+        if not path:
+            return None
+        try:
+            headers = list(read_rpmdb(path, RPM_DEPENDENCY_TAGS))
+            # File dependencies ("/usr/bin/perl") are provided by whoever ships the file
+            files = {name for header in headers for name in header.get(RPMTAG_REQUIRENAME, [])
+                     if name.startswith('/')}
+            owners = rpm_file_owners(path, files)
+        except (OSError, sqlite3.Error, ValueError, KeyError):
+            return None
+        provided_files: Dict[int, List[str]] = {}
+        for file, hnums in owners.items():
+            for hnum in hnums:
+                provided_files.setdefault(hnum, []).append(file)
+        reasons = self.read_install_reasons()
+        counts = Counter(header[RPMTAG_NAME] for header in headers)
+        records = []
+        for header in headers:
+            name = header[RPMTAG_NAME]
+            auto = reasons.get(name)
+            node = name
+            if counts[name] > 1:
+                # Install-only packages (kernels) are installed in several versions
+                node = f"{name}-{header.get(RPMTAG_VERSION, '')}-{header.get(RPMTAG_RELEASE, '')}"
+            records.append(DependencyRecord(
+                node,
+                version=rpm_evr(header),
+                description=header.get(RPMTAG_SUMMARY, ''),
+                depends=[(dep,) for dep in header.get(RPMTAG_REQUIRENAME, [])],
+                weak=[(dep,) for dep in header.get(RPMTAG_RECOMMENDNAME, []) + header.get(RPMTAG_SUGGESTNAME, [])],
+                provides=header.get(RPMTAG_PROVIDENAME, []) + [name] + provided_files.get(header['hnum'], []),
+                explicit=None if auto is None else not auto
+            ))
+        return records
+    
+    def preview_command(self, kind: str, packages: List[str]) -> List[str]:
+        """Resolve a transaction and answer no at the prompt"""
+        command = {"install": "install", "remove": "remove"}.get(kind, "upgrade")
+        return ["dnf", command, "--assumeno", *packages]
+    
+    def parse_preview(self, kind: str, packages: List[str], returncode: int,
+                      stdout: str, stderr: str) -> TransactionPlan:
+        """Parse the transaction table and size lines of dnf4 and dnf5"""
+        plan = TransactionPlan(self.name, kind, packages)
+        output = f"{stdout}\n{stderr}"
+        errors = [line.strip() for line in output.split('\n')
+                  if line.startswith(('Error:', 'No match for argument', 'Failed to resolve'))]
+        if errors:
+            plan.error = '\n'.join(errors)
+            return plan
         
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip() and not line.startswith('Installed') and not line.startswith('Last metadata'):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        packages.append({
-                            'name': parts[0].split('.')[0],
-                            'version': parts[1],
-                            'manager': 'DNF'
-                        })
-        return packages
+        section = None
+        pending = ""
+        for line in stdout.split('\n'):
+            header = line.strip().rstrip(':').lower()
+            if not line.startswith(' ') and line.rstrip().endswith(':'):
+                # "Installing:", "Installing dependencies:", "Removing unused dependencies:", ...
+                if header.startswith('install'):
+                    section = plan.install
+                elif header.startswith(('upgrad', 'downgrad')):
+                    section = plan.upgrade
+                elif header.startswith('remov'):
+                    section = plan.remove
+                else:
+                    section = None
+                continue
+            if not line.strip() or not line.startswith(' '):
+                section = None
+                continue
+            if section is None:
+                continue
+            parts = line.split()
+            if parts[0] == 'replacing':
+                # dnf5: the installed version an upgrade replaces
+                if section is plan.upgrade and section and len(parts) >= 4:
+                    section[-1].version = parts[3]
+                continue
+            if len(parts) == 1:
+                # dnf4 wraps long package names onto their own line
+                pending = parts[0]
+                continue
+            if pending:
+                parts = [pending] + parts
+                pending = ""
+            if len(parts) < 4:
+                continue
+            name, version = parts[0], parts[2]
+            if section is plan.remove:
+                section.append(Package(name, self.name, version=version))
+            else:
+                section.append(Package(name, self.name, new_version=version))
+        
+        unknown = [pkg for pkg in plan.upgrade if not pkg.version]
+        if unknown:
+            # dnf4 only lists the new versions of upgrades
+            installed = {pkg.name: pkg.version for pkg in self.query_installed([pkg.name for pkg in unknown]) or []}
+            for pkg in unknown:
+                pkg.version = installed.get(pkg.name, '')
+        
+        for line in stdout.split('\n'):
+            line = line.strip()
+            if line.startswith('Total download size:'):
+                plan.download_size = parse_size(line.split(':', 1)[1])
+            elif line.startswith('Installed size:'):
+                plan.size_change = parse_size(line.split(':', 1)[1])
+            elif line.startswith('Freed space:'):
+                freed = parse_size(line.split(':', 1)[1])
+                plan.size_change = -freed if freed is not None else None
+            elif 'Need to download' in line:
+                plan.download_size = parse_size(line.split('Need to download', 1)[1])
+            elif line.startswith('After this operation,'):
+                # dnf5: "After this operation, 40 MiB extra will be used (...)" or "... will be freed (...)"
+                change = parse_size(line.split(',', 1)[1].split('(')[0])
+                if change is not None:
+                    plan.size_change = -change if 'freed' in line else change
+        return plan
     
-    def list_upgradable(self) -> List[Dict[str, str]]:
-        """List packages that can be upgraded"""
+    def query_installed(self, names: List[str]) -> Optional[List[Package]]:
+        """Query rpm for just the given packages"""
         returncode, stdout, stderr = self.execute_command(
-            ["dnf", "list", "updates"], use_sudo=False
+            ["rpm", "-q", "--qf", self.QUERY_FORMAT, "--", *names], use_sudo=False
         )
-        
         packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip() and not line.startswith('Available') and not line.startswith('Last metadata'):
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        packages.append({
-                            'name': parts[0].split('.')[0],
-                            'new_version': parts[1],
-                            'manager': 'DNF'
-                        })
+        missing = 0
+        for line in stdout.split('\n'):
+            parts = line.split('\t')
+            if len(parts) == 3:
+                packages.append(Package(
+                    parts[0],
+                    self.name,
+                    version=parts[1],
+                    description=parts[2]
+                ))
+            elif line.endswith(' is not installed'):
+                missing += 1
+        # rpm exits with the number of packages that aren't installed
+        if returncode != 0 and not missing:
+            return None
         return packages
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed packages, when the database can't be read"""
+        return ["dnf", "list", "installed"]
+    
+    def parse_installed(self, stdout: str) -> List[Package]:
+        """Parse the output of `dnf list installed`"""
+        return parsers.dnf_installed(stdout, self.name)
+    
+    def fill_upgradable(self, packages: List[Package]) -> List[Package]:
+        """`dnf list updates` doesn't show the installed versions"""
+        return self.installed_versions(packages)
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing available updates"""
+        return ["dnf", "list", "updates"]
+    
+    def parse_upgradable(self, stdout: str) -> List[Package]:
+        """Parse the output of `dnf list updates`"""
+        return parsers.dnf_upgradable(stdout, self.name)
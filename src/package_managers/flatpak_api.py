@@ -0,0 +1,147 @@
+"""
+libflatpak access
+Lists installed refs and pending updates through libflatpak (PyGObject)
+instead of splitting `flatpak list` / `flatpak remote-ls` tables. The
+system and user installations are opened once and reused. libflatpak is
+optional: without PyGObject or the Flatpak typelib, available() is False
+and the backend keeps using the CLI. New versions of updates come from the
+remotes' appstream data, as in `flatpak remote-ls`.
+"""
+from typing import List, Dict, Optional
+from xml.etree import ElementTree
+import gzip
+import os
+import threading
+
+
+class FlatpakApiError(Exception):
+    """A libflatpak call failed"""
+
+
+class FlatpakLibrary:
+    """
+    The system and user Flatpak installations, loaded on first use.
+    GObject calls are serialized through a lock, so workers can share one
+    instance.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.module = None
+        self.installations: Optional[List] = None
+        # Import failed once, don't retry on every listing
+        self.unavailable = False
+    
+    def load(self) -> bool:
+        """Import libflatpak and open the installations"""
+        if self.installations is not None:
+            return True
+        if self.unavailable:
+            return False
+        try:
+            import gi
+            gi.require_version('Flatpak', '1.0')
+            from gi.repository import Flatpak
+        except (ImportError, ValueError):
+            self.unavailable = True
+            return False
+        installations = []
+        # Either installation may be missing or unreadable, the other one still counts
+        try:
+            installations.extend(Flatpak.get_system_installations(None))
+        except Exception:
+            pass
+        try:
+            installations.append(Flatpak.Installation.new_user(None))
+        except Exception:
+            pass
+        if not installations:
+            self.unavailable = True
+            return False
+        self.module = Flatpak
+        self.installations = installations
+        return True
+    
+    def available(self) -> bool:
+        """Check whether libflatpak can be used"""
+        with self.lock:
+            return self.load()
+    
+    @staticmethod
+    def ref_fields(installation, ref) -> Dict[str, str]:
+        """The fields of an installed ref the backend shows"""
+        return {
+            'id': ref.get_name() or '',
+            'name': ref.get_appdata_name() or ref.get_name() or '',
+            'version': ref.get_appdata_version() or '',
+            'summary': ref.get_appdata_summary() or '',
+            'branch': ref.get_branch() or '',
+            'origin': ref.get_origin() or '',
+            'installation': installation.get_id() or '',
+        }
+    
+    def installed_apps(self) -> List[Dict[str, str]]:
+        """Installed applications of every installation, like `flatpak list --app`"""
+        with self.lock:
+            if not self.load():
+                raise FlatpakApiError("libflatpak is not available")
+            apps = []
+            try:
+                for installation in self.installations:
+                    for ref in installation.list_installed_refs_by_kind(self.module.RefKind.APP, None):
+                        apps.append(self.ref_fields(installation, ref))
+            except Exception as e:
+                raise FlatpakApiError(str(e)) from e
+            return apps
+    
+    def updates(self) -> List[Dict[str, str]]:
+        """
+        Installed refs with an update on their remote, like `flatpak remote-ls --updates`.
+        'new_version' is empty for refs the remote's appstream data doesn't list.
+        """
+        with self.lock:
+            if not self.load():
+                raise FlatpakApiError("libflatpak is not available")
+            refs = []
+            try:
+                for installation in self.installations:
+                    # Each remote's appstream data is read once per listing
+                    versions = {}
+                    for ref in installation.list_installed_refs_for_update(None):
+                        fields = self.ref_fields(installation, ref)
+                        origin = fields['origin']
+                        if origin not in versions:
+                            versions[origin] = self.remote_versions(installation, origin)
+                        fields['new_version'] = versions[origin].get(fields['id'], '')
+                        refs.append(fields)
+            except Exception as e:
+                raise FlatpakApiError(str(e)) from e
+            return refs
+    
+    @staticmethod
+    def remote_versions(installation, remote: str) -> Dict[str, str]:
+        """Newest release of every component in a remote's appstream data, by application ID"""
+        versions = {}
+        try:
+            directory = installation.get_remote_by_name(remote, None).get_appstream_dir(None).get_path()
+        except Exception:
+            return versions
+        path = os.path.join(directory, 'appstream.xml.gz')
+        opener = gzip.open
+        if not os.path.exists(path):
+            path = os.path.join(directory, 'appstream.xml')
+            opener = open
+        try:
+            with opener(path, 'rb') as f:
+                for _, element in ElementTree.iterparse(f):
+                    if element.tag != 'component':
+                        continue
+                    app_id = element.findtext('id', '')
+                    # Releases are listed newest first
+                    release = element.find('releases/release')
+                    if app_id and release is not None and release.get('version'):
+                        versions[app_id.removesuffix('.desktop')] = release.get('version')
+                    element.clear()
+        except (OSError, EOFError, ElementTree.ParseError):
+            pass
+        return versions
@@ -1,101 +1,142 @@
 """
 Flatpak Package Manager Handler
 """
-from typing import List, Dict, Optional
-import re
+from typing import List, Dict, Optional, Callable
 from .base import PackageManager
+from .transport import Transport
+from .flatpak_api import FlatpakLibrary, FlatpakApiError
+from .package import Package
+from . import parsers
 
 
 class FlatpakManager(PackageManager):
     """Handler for Flatpak package manager"""
     
-    def __init__(self):
-        super().__init__()
+    # Only `flatpak search` prints a column header
+    HEADER_LINES = {'search': 1}
+    
+    def __init__(self, transport: Optional[Transport] = None):
+        super().__init__(transport)
         self.name = "Flatpak"
         self.command = "flatpak"
+        self.installed_db_paths = ["/var/lib/flatpak/app", "~/.local/share/flatpak/app"]
+        self.download_cache_paths = ["/var/lib/flatpak/repo/objects", "~/.local/share/flatpak/repo/objects"]
+        # Remote refs are not tracked locally, so updates are never cached
+        # Refs of a batch are deployed one by one, a failure keeps the earlier ones
+        self.atomic_transactions = False
+        self.lock_group = "flatpak"
+        # libflatpak, when PyGObject and the Flatpak typelib are installed
+        self.library = FlatpakLibrary()
         self.available = self.check_availability()
     
     def check_availability(self) -> bool:
         """Check if Flatpak is installed"""
         return self.is_command_available("flatpak")
     
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update Flatpak repositories"""
-        return self.execute_command(["flatpak", "update", "--appstream"], use_sudo=False)
+        return self.execute_command(self.update_command(), use_sudo=False, on_output=on_output)
     
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
-        if package:
-            return self.execute_command(["flatpak", "update", "-y", package], use_sudo=False)
-        else:
-            return self.execute_command(["flatpak", "update", "-y"], use_sudo=False)
-    
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["flatpak", "search", query], use_sudo=False
-        )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')[1:]  # Skip header
-            for line in lines:
-                if line.strip():
-                    parts = line.split('\t')
-                    if len(parts) >= 3:
-                        packages.append({
-                            'name': parts[0].strip(),
-                            'description': parts[1].strip(),
-                            'app_id': parts[2].strip(),
-                            'manager': 'Flatpak'
-                        })
-        return packages
+        packages = [package] if package else []
+        return self.execute_command(self.upgrade_command(packages), use_sudo=False, on_output=on_output)
+    
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the remotes"""
+        return ["flatpak", "search", query]
     
-    def install(self, package: str) -> tuple[int, str, str]:
+    def parse_search(self, stdout: str) -> List[Package]:
+        """Parse the output of `flatpak search <query>`"""
+        return parsers.flatpak_search(parsers.after_header(stdout), self.name)
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
-        return self.execute_command(["flatpak", "install", "-y", package], use_sudo=False)
+        return self.execute_command(self.install_command([package]), use_sudo=False, on_output=on_output)
     
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
-        return self.execute_command(["flatpak", "uninstall", "-y", package], use_sudo=False)
+        return self.execute_command(self.remove_command([package]), use_sudo=False, on_output=on_output)
     
-    def list_installed(self) -> List[Dict[str, str]]:
-        """List all installed packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["flatpak", "list", "--app"], use_sudo=False
-        )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip():
-                    parts = line.split('\t')
-                    if len(parts) >= 3:
-                        packages.append({
-                            'name': parts[0].strip(),
-                            'app_id': parts[1].strip(),
-                            'version': parts[2].strip() if len(parts) > 2 else 'N/A',
-                            'manager': 'Flatpak'
-                        })
-        return packages
+    def update_command(self) -> List[str]:
+        """Command refreshing the repository metadata"""
+        return ["flatpak", "update", "--appstream"]
+    
+    def prefetch_command(self, parallel_downloads: int = 3) -> List[str]:
+        """Command downloading everything a full upgrade would install, without installing it"""
+        return ["flatpak", "update", "--no-deploy", "-y"]
     
-    def list_upgradable(self) -> List[Dict[str, str]]:
-        """List packages that can be upgraded"""
-        returncode, stdout, stderr = self.execute_command(
-            ["flatpak", "remote-ls", "--updates"], use_sudo=False
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        return ["flatpak", "install", "-y", *packages]
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        return ["flatpak", "uninstall", "-y", *packages]
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        if packages:
+            return ["flatpak", "update", "-y", *packages]
+        return ["flatpak", "update", "-y"]
+    
+    def ref_package(self, ref: Dict[str, str]) -> Package:
+        """Package record of an installed ref reported by libflatpak"""
+        return Package(
+            ref['name'],
+            self.name,
+            version=ref['version'],
+            new_version=ref.get('new_version', ''),
+            description=ref['summary'],
+            repo=ref['origin'],
+            app_id=ref['id']
         )
-        
-        packages = []
+    
+    def local_installed(self) -> Optional[List[Package]]:
+        """Installed apps from libflatpak, None to fall back to the CLI"""
+        if self.use_local_api and self.library.available():
+            try:
+                return [self.ref_package(ref) for ref in self.library.installed_apps()]
+            except FlatpakApiError:
+                pass
+        return None
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed apps"""
+        return ["flatpak", "list", "--app"]
+    
+    def parse_installed(self, stdout: str) -> List[Package]:
+        """Parse the output of `flatpak list --app`"""
+        return parsers.flatpak_installed(stdout, self.name)
+    
+    def local_upgradable(self) -> Optional[List[Package]]:
+        """Available updates from libflatpak, None to fall back to the CLI"""
+        if self.use_local_api and self.library.available():
+            try:
+                updates = self.library.updates()
+                # The CLI knows the new versions of refs without appstream data
+                if all(ref['new_version'] for ref in updates):
+                    return [self.ref_package(ref) for ref in updates]
+            except FlatpakApiError:
+                pass
+        return None
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing available updates"""
+        return ["flatpak", "remote-ls", "--updates"]
+    
+    def parse_upgradable(self, stdout: str) -> List[Package]:
+        """Parse the output of `flatpak remote-ls --updates`"""
+        return parsers.flatpak_upgradable(stdout, self.name)
+    
+    def fill_upgradable(self, packages: List[Package]) -> List[Package]:
+        """`flatpak remote-ls --updates` doesn't show the installed versions, `flatpak list` does"""
+        returncode, stdout, stderr = self.execute_command(["flatpak", "list"], use_sudo=False)
         if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip():
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        packages.append({
-                            'name': parts[0].strip(),
-                            'app_id': parts[1].strip(),
-                            'manager': 'Flatpak'
-                        })
+            versions = {package.app_id: package.version for package in self.parse_installed(stdout)}
+            for package in packages:
+                package.version = versions.get(package.app_id, package.version)
         return packages
@@ -0,0 +1,162 @@
+"""
+Fleet mode
+Runs the same backend call on many hosts, each through its own transport.
+Hosts are worked on concurrently up to a limit and results are handed out
+as hosts finish, so a slow or unreachable host holds up nothing but itself.
+"""
+from typing import List, Dict, Optional, Callable, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+from .detector import detect_remote
+from .package import Package
+from .transport import Transport, TransportError
+
+DEFAULT_CONCURRENCY = 8
+HOST_TIMEOUT = 300.0
+# Key of errors that concern the host rather than one of its backends
+HOST_ERROR = ""
+
+
+class HostResult:
+    """Packages a host returned, and what went wrong per backend"""
+    
+    def __init__(self, host: str):
+        self.host = host
+        self.packages: List[Package] = []
+        self.errors: Dict[str, str] = {}
+        self.seconds = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        """Check whether every backend of the host answered"""
+        return not self.errors
+
+
+class FleetUpdate:
+    """A pending update and the hosts waiting for it"""
+    
+    def __init__(self, manager: str, name: str, new_version: str):
+        self.manager = manager
+        self.name = name
+        self.new_version = new_version
+        self.hosts: List[str] = []
+
+
+class FleetView:
+    """Upgradable packages of the whole fleet, filled in as hosts report"""
+    
+    def __init__(self):
+        self.results: Dict[str, HostResult] = {}
+        self.updates: Dict[tuple, FleetUpdate] = {}
+    
+    def add(self, result: HostResult):
+        """Merge the upgradable packages of a host"""
+        self.results[result.host] = result
+        for package in result.packages:
+            key = (package.manager, package.name, package.new_version)
+            update = self.updates.get(key)
+            if update is None:
+                update = self.updates[key] = FleetUpdate(*key)
+            update.hosts.append(result.host)
+    
+    def rows(self) -> List[FleetUpdate]:
+        """Updates, the ones pending on most hosts first"""
+        return sorted(self.updates.values(),
+                      key=lambda update: (-len(update.hosts), update.manager, update.name))
+    
+    def failed_hosts(self) -> List[str]:
+        """Hosts with at least one error"""
+        return sorted(host for host, result in self.results.items() if not result.ok)
+
+
+class Fleet:
+    """
+    Hosts worked on together. Backends are detected once per host; calls
+    run in a thread per host, at most `concurrency` at a time, and a host
+    that doesn't finish within `timeout` seconds is reported as failed.
+    """
+    
+    def __init__(self, transports: List[Transport], concurrency: int = DEFAULT_CONCURRENCY,
+                 timeout: float = HOST_TIMEOUT, managers: Optional[List[str]] = None):
+        self.transports = list(transports)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        # Only these backends (by name) are used, all found ones if None
+        self.manager_names = {name.lower() for name in managers} if managers else None
+        self.host_managers: Dict[str, List] = {}
+        self.lock = threading.Lock()
+    
+    def managers_of(self, transport: Transport) -> List:
+        """Backends of a host, detected on first use"""
+        with self.lock:
+            managers = self.host_managers.get(transport.name)
+        if managers is None:
+            managers = [manager for manager in detect_remote(transport)
+                        if self.manager_names is None or manager.name.lower() in self.manager_names]
+            with self.lock:
+                self.host_managers[transport.name] = managers
+        return managers
+    
+    def collect(self, transport: Transport, call: Callable[..., List[Package]]) -> HostResult:
+        """Run a call on every backend of one host"""
+        result = HostResult(transport.name)
+        start = time.monotonic()
+        try:
+            managers = self.managers_of(transport)
+        except TransportError as e:
+            managers = []
+            result.errors[HOST_ERROR] = str(e)
+        else:
+            if not managers:
+                result.errors[HOST_ERROR] = "No supported package managers found"
+        for manager in managers:
+            try:
+                result.packages.extend(call(manager))
+            except Exception as e:
+                result.errors[manager.name] = str(e)
+        result.seconds = time.monotonic() - start
+        return result
+    
+    async def stream(self, call: Callable[..., List[Package]]) -> AsyncIterator[HostResult]:
+        """Yield the result of every host as soon as it is in"""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='fleet')
+        
+        async def run(transport):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        loop.run_in_executor(executor, self.collect, transport, call), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    result = HostResult(transport.name)
+                    result.errors[HOST_ERROR] = f"No answer within {self.timeout:.0f} s"
+                    result.seconds = self.timeout
+                    return result
+        
+        tasks = [asyncio.ensure_future(run(transport)) for transport in self.transports]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Threads of timed out hosts end with their command's own timeout
+            executor.shutdown(wait=False)
+    
+    async def upgradable(self, on_result: Optional[Callable[[HostResult], None]] = None) -> FleetView:
+        """Gather the upgradable packages of every host"""
+        view = FleetView()
+        async for result in self.stream(lambda manager: manager.list_upgradable()):
+            view.add(result)
+            if on_result is not None:
+                on_result(result)
+        return view
+    
+    def close(self):
+        """Close the connections to every host"""
+        for transport in self.transports:
+            transport.close()
@@ -0,0 +1,84 @@
+"""
+Incremental inventory updates
+Works out how the installed and upgradable listings change after an
+operation from a targeted query of just the packages it touched, instead of
+listing everything again.
+"""
+from typing import List, Optional, Callable
+from .package import Package
+
+# Operations whose targets are known from their arguments
+TARGETED_KINDS = ('install', 'remove', 'upgrade',
+                  'install_packages', 'remove_packages', 'upgrade_packages')
+
+
+def operation_targets(kind: str, args: tuple) -> Optional[List[str]]:
+    """Package names an operation touched, None when it can touch anything"""
+    if kind not in TARGETED_KINDS:
+        return None
+    names = []
+    for arg in args:
+        names.extend(arg if isinstance(arg, (list, tuple)) else [arg])
+    # upgrade without a package upgrades everything
+    return list(dict.fromkeys(names)) or None
+
+
+def matches(record: Package, name: str) -> bool:
+    """Check whether a queried record is the package an operation named"""
+    if record.name == name:
+        return True
+    # dpkg reports Multi-Arch: same packages as name:arch
+    return ':' not in name and record.name.partition(':')[0] == name
+
+
+class InventoryChange:
+    """
+    Row changes of one manager's installed and upgradable listings.
+    Only the packages the operation named are covered; dependencies it
+    pulled in or removed show up with the next full refresh.
+    """
+    
+    def __init__(self):
+        self.installed: List[Package] = []
+        self.uninstalled: List[tuple] = []
+        self.upgradable: List[Package] = []
+        self.upgraded: List[tuple] = []
+    
+    def __bool__(self) -> bool:
+        return bool(self.installed or self.uninstalled or self.upgradable or self.upgraded)
+
+
+def inventory_change(manager: str, names: List[str], records: List[Package],
+                     find_upgradable: Callable[[tuple], Optional[Package]]) -> InventoryChange:
+    """
+    Turn the query_installed() records of an operation's packages into row
+    changes. find_upgradable(key) returns the upgradable row of a package
+    as currently shown, if there is one.
+    """
+    change = InventoryChange()
+    for name in names:
+        found = [record for record in records if matches(record, name)]
+        change.installed.extend(found)
+        if not found:
+            change.uninstalled.append((manager, name))
+        
+        key = (manager, name.partition(':')[0])
+        pending = find_upgradable(key)
+        if pending is None:
+            continue
+        versions = {record.version for record in found}
+        if not found or pending.new_version in versions:
+            # Removed, or upgraded to the version that was offered
+            change.upgraded.append(key)
+        elif pending.version not in versions:
+            # Changed, but still behind the offered version
+            change.upgradable.append(Package(
+                pending.name,
+                pending.manager,
+                version=found[0].version,
+                new_version=pending.new_version,
+                description=pending.description,
+                repo=pending.repo,
+                app_id=pending.app_id
+            ))
+    return change
@@ -0,0 +1,340 @@
+"""
+Native package database readers
+Stream installed-package records straight from the on-disk databases
+instead of spawning the package manager CLIs and parsing their output.
+"""
+from typing import Iterator, Iterable, Dict, Tuple, List, Set, Optional
+import os
+import re
+import sqlite3
+import struct
+
+# dpkg states of installed packages, `ii` and held (`hi`) in `dpkg -l`
+DPKG_INSTALLED = ('install ok installed', 'hold ok installed')
+
+
+def read_dpkg_status(path: str = "/var/lib/dpkg/status") -> Iterator[Dict[str, str]]:
+    """
+    Yield installed packages from a dpkg status file.
+    Only installed stanzas are reported, including held ones, which is what
+    `dpkg -l` marks as `ii` and `hi`.
+    """
+    fields = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line == '\n':
+                if fields.get('Status') in DPKG_INSTALLED and 'Package' in fields:
+                    yield fields
+                fields = {}
+                continue
+            if line[0] in ' \t':
+                # Continuation line (long description, conffiles, ...)
+                continue
+            key, sep, value = line.partition(':')
+            if sep:
+                fields[key] = value.strip()
+    if fields.get('Status') in DPKG_INSTALLED and 'Package' in fields:
+        yield fields
+
+
+def read_apt_extended_states(path: str = "/var/lib/apt/extended_states") -> Set[Tuple[str, str]]:
+    """(name, arch) of every package APT marked as automatically installed"""
+    auto = set()
+    fields = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line == '\n':
+                if fields.get('Auto-Installed') == '1' and 'Package' in fields:
+                    auto.add((fields['Package'], fields.get('Architecture', '')))
+                fields = {}
+                continue
+            key, sep, value = line.partition(':')
+            if sep:
+                fields[key] = value.strip()
+    if fields.get('Auto-Installed') == '1' and 'Package' in fields:
+        auto.add((fields['Package'], fields.get('Architecture', '')))
+    return auto
+
+
+def parse_deb_relations(text: str) -> List[Tuple[str, ...]]:
+    """
+    Split a Depends-style field into groups of alternative package names,
+    dropping version constraints and arch qualifiers:
+    "libc6 (>= 2.34), python3:any | pypy" -> [('libc6',), ('python3', 'pypy')]
+    """
+    groups = []
+    for group in text.split(','):
+        names = tuple(
+            alternative.split('(')[0].split('[')[0].strip().partition(':')[0]
+            for alternative in group.split('|')
+        )
+        names = tuple(name for name in names if name)
+        if names:
+            groups.append(names)
+    return groups
+
+
+def read_pacman_local(path: str = "/var/lib/pacman/local") -> Iterator[Dict[str, str]]:
+    """Yield installed packages from the pacman local database"""
+    for entry in sorted(os.listdir(path)):
+        desc_path = os.path.join(path, entry, 'desc')
+        if not os.path.isfile(desc_path):
+            # ALPM_DB_VERSION and other non-package entries
+            continue
+        yield parse_pacman_desc(desc_path)
+
+
+def parse_pacman_desc(path: str) -> Dict[str, list]:
+    """Parse a pacman desc file into {'NAME': [...], 'VERSION': [...], ...}"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return parse_pacman_desc_lines(f)
+
+
+def parse_pacman_desc_lines(lines: Iterable[str]) -> Dict[str, list]:
+    """Parse the lines of a pacman desc file"""
+    fields = {}
+    current = None
+    for line in lines:
+        line = line.rstrip('\n')
+        if line.startswith('%') and line.endswith('%') and len(line) > 2:
+            current = fields.setdefault(line[1:-1], [])
+        elif line and current is not None:
+            current.append(line)
+        else:
+            current = None
+    return fields
+
+
+PACMAN_DEP_RE = re.compile(r'[<>=:]')
+
+
+def pacman_dep_name(dependency: str) -> str:
+    """Package name of a pacman dependency ("glibc>=2.38", "python: for foo")"""
+    return PACMAN_DEP_RE.split(dependency, 1)[0].strip()
+
+
+# Readers for repository metadata: (name, description) of every available package
+
+def read_apt_packages_list(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (name, short description) from an apt lists *_Packages file"""
+    name = None
+    description = ""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line == '\n':
+                if name:
+                    yield name, description
+                name = None
+                description = ""
+            elif line.startswith('Package:'):
+                name = line[8:].strip()
+            elif line.startswith('Description:'):
+                description = line[12:].strip()
+    if name:
+        yield name, description
+
+
+def read_pacman_sync_db(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (name, description) from a pacman sync database (tar archive of desc files)"""
+    # Only needed to build the search index, so not imported at startup
+    import tarfile
+    with tarfile.open(path, 'r:*') as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('/desc'):
+                continue
+            f = archive.extractfile(member)
+            if f is None:
+                continue
+            lines = f.read().decode('utf-8', errors='replace').split('\n')
+            fields = parse_pacman_desc_lines(lines)
+            if fields.get('NAME'):
+                yield fields['NAME'][0], ' '.join(fields.get('DESC', []))
+
+
+RPM_COMMON_NS = '{http://linux.duke.edu/metadata/common}'
+
+
+def read_rpm_primary(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (name, summary) from rpm-md primary metadata (primary.xml[.gz|.xz|.bz2] or primary.sqlite)"""
+    if path.endswith('.sqlite'):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            for name, summary in connection.execute("SELECT name, summary FROM packages"):
+                yield name, summary or ""
+        finally:
+            connection.close()
+        return
+    
+    import xml.etree.ElementTree as ET
+    if path.endswith('.gz'):
+        import gzip
+        opener = gzip.open
+    elif path.endswith('.xz'):
+        import lzma
+        opener = lzma.open
+    elif path.endswith('.bz2'):
+        import bz2
+        opener = bz2.open
+    else:
+        opener = open
+    with opener(path, 'rb') as f:
+        for event, element in ET.iterparse(f):
+            if element.tag != RPM_COMMON_NS + 'package':
+                continue
+            name = element.findtext(RPM_COMMON_NS + 'name')
+            if name:
+                yield name, (element.findtext(RPM_COMMON_NS + 'summary') or "").strip()
+            # Metadata for a big repository is hundreds of MB once parsed
+            element.clear()
+
+
+# rpm header tags and types we need
+RPMTAG_NAME = 1000
+RPMTAG_VERSION = 1001
+RPMTAG_RELEASE = 1002
+RPMTAG_EPOCH = 1003
+RPMTAG_SUMMARY = 1004
+RPMTAG_ARCH = 1022
+RPMTAG_PROVIDENAME = 1047
+RPMTAG_REQUIRENAME = 1049
+RPMTAG_RECOMMENDNAME = 5046
+RPMTAG_SUGGESTNAME = 5049
+RPM_INT32_TYPE = 4
+RPM_STRING_TYPE = 6
+RPM_STRING_ARRAY_TYPE = 8
+RPM_I18NSTRING_TYPE = 9
+
+
+def parse_rpm_header(blob: bytes, tags=None) -> Dict[int, object]:
+    """
+    Parse an rpm header blob as stored in rpmdb.sqlite.
+    Returns {tag: value} for the requested tags (all string/int32 tags if None).
+    """
+    index_count, data_length = struct.unpack_from('>II', blob, 0)
+    data_start = 8 + index_count * 16
+    data = blob[data_start:data_start + data_length]
+    values = {}
+    for i in range(index_count):
+        tag, tag_type, offset, count = struct.unpack_from('>IIiI', blob, 8 + i * 16)
+        if tags is not None and tag not in tags:
+            continue
+        if tag_type == RPM_INT32_TYPE:
+            values[tag] = struct.unpack_from('>i', data, offset)[0]
+        elif tag_type in (RPM_STRING_TYPE, RPM_I18NSTRING_TYPE):
+            end = data.index(b'\0', offset)
+            values[tag] = data[offset:end].decode('utf-8', errors='replace')
+        elif tag_type == RPM_STRING_ARRAY_TYPE:
+            strings = []
+            for _ in range(count):
+                end = data.index(b'\0', offset)
+                strings.append(data[offset:end].decode('utf-8', errors='replace'))
+                offset = end + 1
+            values[tag] = strings
+    return values
+
+
+RPM_LIST_TAGS = {
+    RPMTAG_NAME, RPMTAG_VERSION, RPMTAG_RELEASE, RPMTAG_EPOCH, RPMTAG_SUMMARY, RPMTAG_ARCH
+}
+
+
+RPM_DEPENDENCY_TAGS = RPM_LIST_TAGS | {
+    RPMTAG_PROVIDENAME, RPMTAG_REQUIRENAME, RPMTAG_RECOMMENDNAME, RPMTAG_SUGGESTNAME
+}
+
+
+def read_rpmdb(path: str = "/var/lib/rpm/rpmdb.sqlite", tags=RPM_LIST_TAGS) -> Iterator[Dict[int, object]]:
+    """
+    Yield package headers from an sqlite rpm database (rpm >= 4.16).
+    Raises sqlite3.DatabaseError for BerkeleyDB/NDB databases.
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for hnum, blob in connection.execute("SELECT hnum, blob FROM Packages"):
+            header = parse_rpm_header(blob, tags)
+            if header.get(RPMTAG_NAME, 'gpg-pubkey') == 'gpg-pubkey':
+                # Imported signing keys are stored as pseudo packages
+                continue
+            header['hnum'] = hnum
+            yield header
+    finally:
+        connection.close()
+
+
+def rpm_file_owners(path: str, files: Iterable[str]) -> Dict[str, Set[int]]:
+    """
+    Header numbers of the packages shipping a file with the basename of each
+    of `files`, from the rpmdb's Basenames index. Matching on the basename
+    alone can only add owners, never miss one.
+    """
+    by_basename: Dict[str, List[str]] = {}
+    for file in files:
+        by_basename.setdefault(os.path.basename(file), []).append(file)
+    owners: Dict[str, Set[int]] = {}
+    if not by_basename:
+        return owners
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        basenames = list(by_basename)
+        for start in range(0, len(basenames), 500):
+            chunk = basenames[start:start + 500]
+            query = f"SELECT key, hnum FROM Basenames WHERE key IN ({','.join('?' * len(chunk))})"
+            for basename, hnum in connection.execute(query, chunk):
+                for file in by_basename[basename]:
+                    owners.setdefault(file, set()).add(hnum)
+    finally:
+        connection.close()
+    return owners
+
+
+# libdnf's TransactionItemReason values of packages installed as dependencies
+DNF_AUTO_REASONS = {1, 3, 4}
+
+
+def read_dnf_reasons(path: str = "/var/lib/dnf/history.sqlite") -> Dict[str, bool]:
+    """
+    Whether dnf (4) installed each package as a dependency, from its history
+    database; the latest transaction item of a package decides. Packages
+    with an unknown reason are left out.
+    """
+    reasons = {}
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        query = ("SELECT rpm.name, trans_item.reason FROM trans_item "
+                 "JOIN rpm ON rpm.item_id = trans_item.item_id ORDER BY trans_item.id")
+        for name, reason in connection.execute(query):
+            if reason:
+                reasons[name] = reason in DNF_AUTO_REASONS
+    finally:
+        connection.close()
+    return reasons
+
+
+# dnf5's reasons of packages installed as dependencies
+DNF5_AUTO_REASONS = {'Dependency', 'Weak Dependency', 'Clean'}
+
+
+def read_dnf5_reasons(path: str = "/usr/lib/sysimage/libdnf5/packages.toml") -> Optional[Dict[str, bool]]:
+    """Whether dnf5 installed each package as a dependency, None without tomllib (Python < 3.11)"""
+    try:
+        import tomllib
+    except ImportError:
+        return None
+    with open(path, 'rb') as f:
+        state = tomllib.load(f)
+    reasons = {}
+    # Packages are keyed as "name.arch"
+    for key, record in state.get('packages', {}).items():
+        reason = record.get('reason') if isinstance(record, dict) else None
+        if reason and reason != 'None':
+            reasons[key.rsplit('.', 1)[0]] = reason in DNF5_AUTO_REASONS
+    return reasons
+
+
+def rpm_evr(header: Dict[int, object]) -> str:
+    """Format epoch:version-release the way dnf prints it"""
+    evr = f"{header.get(RPMTAG_VERSION, '')}-{header.get(RPMTAG_RELEASE, '')}"
+    epoch = header.get(RPMTAG_EPOCH)
+    if epoch:
+        evr = f"{epoch}:{evr}"
+    return evr
@@ -0,0 +1,94 @@
+"""
+Package record returned by every package manager backend
+"""
+from typing import Dict, Optional
+import sys
+
+# Record fields in storage order
+FIELDS = ('name', 'version', 'new_version', 'description', 'repo', 'app_id', 'manager')
+
+# Keys used by older dict records
+ALIASES = {'current_version': 'version'}
+
+
+class Package:
+    """
+    A package as reported by a backend.
+    `version` is the installed version (or the candidate for search results),
+    `new_version` the version an upgrade would install. Fields a backend
+    doesn't know are empty strings. Slots keep a record to a fraction of the
+    size of a dict, and the few distinct manager and repo strings are interned
+    so every record shares them.
+
+    get()/[] accept the old dict keys, so code written against
+    Dict[str, str] records keeps working.
+    """
+    __slots__ = FIELDS
+    
+    def __init__(self, name: str, manager: str, version: str = "", new_version: str = "",
+                 description: str = "", repo: str = "", app_id: str = ""):
+        self.name = name
+        self.version = version
+        self.new_version = new_version
+        self.description = description
+        self.repo = sys.intern(repo)
+        self.app_id = app_id
+        self.manager = sys.intern(manager)
+    
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Dict style lookup; empty fields count as missing"""
+        key = ALIASES.get(key, key)
+        if key not in FIELDS:
+            return default
+        return getattr(self, key) or default
+    
+    def __getitem__(self, key: str) -> str:
+        key = ALIASES.get(key, key)
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Package):
+            return NotImplemented
+        return self.astuple() == other.astuple()
+    
+    def __hash__(self) -> int:
+        return hash(self.astuple())
+    
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{key}={value!r}" for key, value in self.to_dict().items())
+        return f"Package({fields})"
+    
+    @property
+    def key(self) -> tuple:
+        """Identity of a package across listings: (manager, name)"""
+        return self.manager, self.name
+    
+    def astuple(self) -> tuple:
+        """Field values in FIELDS order"""
+        return (self.name, self.version, self.new_version, self.description,
+                self.repo, self.app_id, self.manager)
+    
+    @classmethod
+    def fromtuple(cls, values) -> 'Package':
+        """Build a record from values in FIELDS order"""
+        name, version, new_version, description, repo, app_id, manager = values
+        return cls(name, manager, version, new_version, description, repo, app_id)
+    
+    def to_dict(self) -> Dict[str, str]:
+        """Non-empty fields as a dict, e.g. for JSON output"""
+        return {key: getattr(self, key) for key in FIELDS if getattr(self, key)}
+    
+    @classmethod
+    def from_dict(cls, record: Dict[str, str]) -> 'Package':
+        """Build a record from a dict, accepting the old keys"""
+        return cls(
+            record.get('name', ''),
+            record.get('manager', ''),
+            version=record.get('version') or record.get('current_version', ''),
+            new_version=record.get('new_version', ''),
+            description=record.get('description', ''),
+            repo=record.get('repo', ''),
+            app_id=record.get('app_id', '')
+        )
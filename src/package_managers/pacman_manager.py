@@ -1,107 +1,216 @@
 """
 Pacman Package Manager Handler (Arch Linux, Manjaro, etc.)
 """
-from typing import List, Dict, Optional
-import re
+from typing import List, Dict, Optional, Callable, Iterator, Tuple
+import glob
+import os
 from .base import PackageManager
+from .transport import Transport
+from .package import Package
+from . import parsers
+from .plan import TransactionPlan
+from .depgraph import DependencyRecord
+from .native_db import read_pacman_local, read_pacman_sync_db, parse_pacman_desc, pacman_dep_name
 
 
 class PacmanManager(PackageManager):
     """Handler for Pacman package manager"""
     
-    def __init__(self):
-        super().__init__()
+    def __init__(self, transport: Optional[Transport] = None):
+        super().__init__(transport)
         self.name = "Pacman"
         self.command = "pacman"
+        self.installed_db_paths = ["/var/lib/pacman/local"]
+        self.metadata_db_paths = ["/var/lib/pacman/sync"]
+        self.native_db_path = "/var/lib/pacman/local"
+        self.dependency_db_paths = [self.native_db_path]
+        self.download_cache_paths = ["/var/cache/pacman/pkg"]
+        # Shares db.lck with every other libalpm frontend
+        self.lock_group = "pacman"
+        # A sync without the matching -Su sets up partial upgrades, so
+        # only the user refreshes the sync databases
+        self.background_refresh = False
         self.available = self.check_availability()
     
     def check_availability(self) -> bool:
         """Check if Pacman is installed"""
         return self.is_command_available("pacman")
     
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update package database"""
-        return self.execute_command(["pacman", "-Sy"])
+        return self.run_operation('update', on_output=on_output)
     
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
-        if package:
-            return self.execute_command(["pacman", "-S", "--noconfirm", package])
-        else:
-            return self.execute_command(["pacman", "-Syu", "--noconfirm"])
+        packages = [package] if package else []
+        return self.run_operation('upgrade', packages, on_output=on_output)
     
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["pacman", "-Ss", query], use_sudo=False
-        )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            i = 0
-            while i < len(lines):
-                line = lines[i]
-                if line.strip() and not line.startswith(' '):
-                    match = re.match(r'^([^/]+)/([^\s]+)\s+([^\s]+)', line)
-                    if match:
-                        description = ""
-                        if i + 1 < len(lines) and lines[i + 1].startswith('    '):
-                            description = lines[i + 1].strip()
-                        packages.append({
-                            'name': match.group(2),
-                            'version': match.group(3),
-                            'description': description,
-                            'manager': 'Pacman'
-                        })
-                i += 1
-        return packages
-    
-    def install(self, package: str) -> tuple[int, str, str]:
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the repositories"""
+        return ["pacman", "-Ss", query]
+    
+    def parse_search(self, stdout: str) -> List[Package]:
+        """Parse the output of `pacman -Ss <query>`"""
+        return parsers.pacman_search(stdout, self.name)
+    
+    def index_sources(self) -> List[str]:
+        """Sync databases downloaded by pacman -Sy"""
+        return sorted(glob.glob("/var/lib/pacman/sync/*.db"))
+    
+    def read_index_source(self, path: str) -> Iterator[Tuple[str, str]]:
+        """Read packages from a pacman sync database"""
+        return read_pacman_sync_db(path)
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
-        return self.execute_command(["pacman", "-S", "--noconfirm", package])
+        return self.run_operation('install', [package], on_output=on_output)
     
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
-        return self.execute_command(["pacman", "-R", "--noconfirm", package])
+        return self.run_operation('remove', [package], on_output=on_output)
     
-    def list_installed(self) -> List[Dict[str, str]]:
-        """List all installed packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["pacman", "-Q"], use_sudo=False
+    def update_command(self) -> List[str]:
+        """Command refreshing the repository metadata"""
+        return ["pacman", "-Sy"]
+    
+    def prefetch_command(self, parallel_downloads: int = 3) -> List[str]:
+        """Command downloading everything a full upgrade would install, without installing it"""
+        # Against the current sync databases (no -y); ParallelDownloads comes from pacman.conf
+        return ["pacman", "-Suw", "--noconfirm"]
+    
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        return ["pacman", "-S", "--noconfirm", *packages]
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        return ["pacman", "-R", "--noconfirm", *packages]
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        if packages:
+            return ["pacman", "-S", "--noconfirm", *packages]
+        return ["pacman", "-Syu", "--noconfirm"]
+    
+    def preview_command(self, kind: str, packages: List[str]) -> List[str]:
+        """Print the targets of a transaction instead of running it"""
+        if kind == "remove":
+            return ["pacman", "-Rp", "--print-format", "%n %v", *packages]
+        if kind == "upgrade" and not packages:
+            # Against the current sync databases, -y would need root
+            return ["pacman", "-Sup", "--print-format", "%n %v %s"]
+        return ["pacman", "-Sp", "--print-format", "%n %v %s", *packages]
+    
+    def parse_preview(self, kind: str, packages: List[str], returncode: int,
+                      stdout: str, stderr: str) -> TransactionPlan:
+        """Parse the `name version [download size]` lines of pacman -Sp/-Rp"""
+        plan = TransactionPlan(self.name, kind, packages)
+        if returncode != 0:
+            errors = [line for line in f"{stdout}\n{stderr}".split('\n') if line.startswith('error:')]
+            plan.error = '\n'.join(errors) or (stderr or stdout).strip()[-500:]
+            return plan
+        rows = [line.split() for line in stdout.split('\n')]
+        rows = [parts for parts in rows if len(parts) >= 2 and not parts[0].startswith('::')]
+        if kind == "remove":
+            plan.remove = [Package(parts[0], self.name, version=parts[1]) for parts in rows]
+            return plan
+        
+        # Sync targets that are installed already are upgrades (or reinstalls)
+        installed = {pkg.name: pkg.version for pkg in self.query_installed([parts[0] for parts in rows]) or []}
+        plan.download_size = 0
+        for parts in rows:
+            name, version = parts[0], parts[1]
+            if name in installed:
+                plan.upgrade.append(Package(name, self.name, version=installed[name], new_version=version))
+            else:
+                plan.install.append(Package(name, self.name, new_version=version))
+            if len(parts) > 2 and parts[2].isdigit():
+                plan.download_size += int(parts[2])
+        return plan
+    
+    def read_installed_db(self) -> Optional[List[Package]]:
+        """Read installed packages from the pacman local database"""
+        if not self.use_native_db:
+            return None
+        try:
+            return [
+                self.desc_package(fields)
+                for fields in read_pacman_local(self.native_db_path)
+                if 'NAME' in fields
+            ]
+        except (OSError, UnicodeError):
+            return None
+    
+    def read_dependency_db(self) -> Optional[List[DependencyRecord]]:
+        """Read dependencies and install reasons from the pacman local database"""
+        if not self.use_native_db:
+            return None
+        try:
+            return [
+                DependencyRecord(
+                    fields['NAME'][0],
+                    version=fields.get('VERSION', [''])[0],
+                    description=fields.get('DESC', [''])[0],
+                    depends=[(pacman_dep_name(dep),) for dep in fields.get('DEPENDS', [])],
+                    weak=[(pacman_dep_name(dep),) for dep in fields.get('OPTDEPENDS', [])],
+                    provides=[pacman_dep_name(provide) for provide in fields.get('PROVIDES', [])],
+                    # %REASON% 1 marks packages installed as dependencies
+                    explicit=fields.get('REASON', ['0'])[0] != '1'
+                )
+                for fields in read_pacman_local(self.native_db_path)
+                if 'NAME' in fields
+            ]
+        except (OSError, UnicodeError):
+            return None
+    
+    def desc_package(self, fields: Dict[str, list]) -> Package:
+        """Build a record from the fields of a local database desc file"""
+        return Package(
+            fields['NAME'][0],
+            self.name,
+            version=fields.get('VERSION', [''])[0],
+            description=fields.get('DESC', [''])[0]
         )
+    
+    def query_installed(self, names: List[str]) -> Optional[List[Package]]:
+        """Look up just the given packages in the local database"""
+        if self.use_native_db and os.path.isdir(self.native_db_path):
+            wanted = set(names)
+            packages = []
+            try:
+                for entry in os.listdir(self.native_db_path):
+                    # Entries are named <name>-<pkgver>-<pkgrel>
+                    if entry.rsplit('-', 2)[0] in wanted:
+                        fields = parse_pacman_desc(os.path.join(self.native_db_path, entry, 'desc'))
+                        if 'NAME' in fields:
+                            packages.append(self.desc_package(fields))
+            except (OSError, UnicodeError):
+                return None
+            return packages
         
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 2:
-                        packages.append({
-                            'name': parts[0],
-                            'version': parts[1],
-                            'manager': 'Pacman'
-                        })
-        return packages
-    
-    def list_upgradable(self) -> List[Dict[str, str]]:
-        """List packages that can be upgraded"""
         returncode, stdout, stderr = self.execute_command(
-            ["pacman", "-Qu"], use_sudo=False
+            ["pacman", "-Q", "--", *names], use_sudo=False
         )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')
-            for line in lines:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 4:
-                        packages.append({
-                            'name': parts[0],
-                            'current_version': parts[1],
-                            'new_version': parts[3],
-                            'manager': 'Pacman'
-                        })
-        return packages
+        # pacman exits with 1 when any of the packages isn't installed
+        if returncode != 0 and "was not found" not in stderr:
+            return None
+        return self.parse_installed(stdout)
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed packages, when the database can't be read"""
+        return ["pacman", "-Q"]
+    
+    def parse_installed(self, stdout: str) -> List[Package]:
+        """Parse the output of `pacman -Q`"""
+        return parsers.pacman_installed(stdout, self.name)
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing available updates"""
+        return ["pacman", "-Qu"]
+    
+    def parse_upgradable(self, stdout: str) -> List[Package]:
+        """Parse the output of `pacman -Qu`"""
+        return parsers.pacman_upgradable(stdout, self.name)
@@ -0,0 +1,221 @@
+"""
+Output parsers
+Parsers for the package manager CLIs' output. Most scan the text in a
+single pass with one precompiled multi-line pattern, which pays off on
+outputs with multi-line records (apt, pacman and DNF search). `dnf list`
+rows and flatpak's tab separated columns are split instead, which measured
+faster. stream() and StreamParser run a backend's parse_* method over
+lines while the command is still producing them, a block at a time.
+
+Scope: the parsers were meant to be 3x faster than the per-line parsing
+they replaced; only apt search gets there (its old parser matched
+nothing). Building the Package records alone takes about a quarter of the
+old parse time and splitting lines is no cheaper than the old loops, so
+the other parsers stay between 1.2x and 2.7x in pure Python. The remaining
+gain is that listings are parsed while their command still runs.
+
+Every backend fills the same fields for a listing:
+    installed   name, version, and description/repo/app_id where shown
+    upgradable  name, new_version and repo/app_id where shown; version
+                where shown, PackageManager.fill_upgradable() adds it
+                for the others
+    search      name, description, and version (the candidate)/repo/app_id
+                where shown
+"""
+from typing import List, Iterable, Iterator, Callable
+import re
+from .package import Package
+
+# Lines handed to a parser at once by stream()
+CHUNK_LINES = 512
+
+# "vim/jammy-updates,jammy-security 2:8.2-1 amd64 [flags]" and its indented description
+APT_SEARCH = re.compile(r'^([^\s/]+)/([^\s,]*)\S* (\S+) .*\n  (.*)$', re.M)
+# dpkg -l rows of installed (ii) and held (hi) packages
+APT_INSTALLED = re.compile(r'^[ih]i +(\S+) +(\S+) +\S+ *(.*)$', re.M)
+APT_UPGRADABLE = re.compile(r'^([^\s/]+)/([^\s,]*)\S* (\S+) \S+ \[upgradable from: ([^\]\s]+)\]', re.M)
+# "name.arch : summary", overlong summaries continue on lines starting with ": "
+DNF_SEARCH = re.compile(r'^([^\s=]\S*?)(?:\.[^.\s]+)? : (.*(?:\n\s+: .*)*)$', re.M)
+DNF_CONTINUATION = re.compile(r'\n\s+: ')
+# "extra/vim 9.1-1 [installed]" and its indented description
+PACMAN_SEARCH = re.compile(r'^([^\s/]+)/(\S+) (\S+).*\n {4}(.*)$', re.M)
+PACMAN_INSTALLED = re.compile(r'^(\S+) (\S+)$', re.M)
+PACMAN_UPGRADABLE = re.compile(r'^(\S+) (\S+) -> (\S+)', re.M)
+# Columns name, version, publisher, notes, summary
+SNAP_SEARCH = re.compile(r'^(\S+) +(\S+) +\S+ +\S+ +(.*)$', re.M)
+# Name and version, the first two columns of `snap list` and `snap refresh --list`
+SNAP_FIRST_COLUMNS = re.compile(r'^(\S+) +(\S+)', re.M)
+
+
+def after_header(text: str) -> str:
+    """Output without its first line, the column header"""
+    return text.partition('\n')[2]
+
+
+class StreamParser:
+    """
+    Runs a parser of whole outputs over lines pushed in as they come, e.g.
+    from a command's output callback. Blocks are only cut before unindented
+    lines, as continuation lines are indented in every format, so no record
+    is split between two blocks. The first `header` lines (a column header)
+    start every block, so parsers that skip them see each block as an output.
+    """
+    
+    def __init__(self, parse: Callable[[str], List[Package]], header: int = 0):
+        self.parse = parse
+        self.header = header
+        self.head: List[str] = []
+        self.block: List[str] = []
+    
+    def add(self, line: str) -> List[Package]:
+        """Take a line; returns the packages of a block it completed, if any"""
+        if len(self.head) < self.header:
+            self.head.append(line)
+            return []
+        packages = []
+        if len(self.block) >= CHUNK_LINES and line[:1] not in (' ', '\t'):
+            packages = self.flush()
+        self.block.append(line)
+        return packages
+    
+    def flush(self) -> List[Package]:
+        """Parse the lines taken since the last block"""
+        if not self.block:
+            return []
+        block, self.block = self.block, []
+        return self.parse('\n'.join(self.head + block))
+    
+    def finish(self) -> List[Package]:
+        """Packages of the last block, once the output has ended"""
+        return self.flush()
+
+
+def stream(parse: Callable[[str], List[Package]], lines: Iterable[str], header: int = 0) -> Iterator[Package]:
+    """StreamParser over lines pulled from an iterable, e.g. a CommandStream"""
+    parser = StreamParser(parse, header)
+    for line in lines:
+        yield from parser.add(line)
+    yield from parser.finish()
+
+
+def apt_search(text: str, manager: str) -> List[Package]:
+    """`apt search`"""
+    return [Package(name, manager, version, '', description, suite)
+            for name, suite, version, description in APT_SEARCH.findall(text)]
+
+
+def apt_installed(text: str, manager: str) -> List[Package]:
+    """`dpkg -l`"""
+    return [Package(name, manager, version, '', description)
+            for name, version, description in APT_INSTALLED.findall(text)]
+
+
+def apt_upgradable(text: str, manager: str) -> List[Package]:
+    """`apt list --upgradable`"""
+    return [Package(name, manager, version, new_version, '', suite)
+            for name, suite, new_version, version in APT_UPGRADABLE.findall(text)]
+
+
+def dnf_rows(text: str) -> List[tuple]:
+    """
+    (name, version, repo) of the "name.arch version repo" rows of `dnf list`.
+    A name too long for its column pushes the rest of the row onto the next,
+    indented line. Splitting the rows is faster than a pattern here.
+    """
+    rows = []
+    wrapped = None
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and wrapped is not None and line[:1] in (' ', '\t'):
+            fields.insert(0, wrapped)
+        wrapped = fields[0] if len(fields) == 1 else None
+        if len(fields) == 3:
+            name, dot, arch = fields[0].rpartition('.')
+            # Not a "Key : value" line
+            if name and arch and fields[1][0] != ':':
+                repo = fields[2]
+                rows.append((name, fields[1], repo[1:] if repo[0] == '@' else repo))
+    return rows
+
+
+def dnf_installed(text: str, manager: str) -> List[Package]:
+    """`dnf list installed`"""
+    return [Package(name, manager, version, '', '', repo) for name, version, repo in dnf_rows(text)]
+
+
+def dnf_upgradable(text: str, manager: str) -> List[Package]:
+    """`dnf list updates`"""
+    return [Package(name, manager, '', version, '', repo) for name, version, repo in dnf_rows(text)]
+
+
+def dnf_search(text: str, manager: str) -> List[Package]:
+    """`dnf search`"""
+    return [Package(name, manager, '', '', DNF_CONTINUATION.sub(' ', summary) if '\n' in summary else summary)
+            for name, summary in DNF_SEARCH.findall(text)]
+
+
+def pacman_search(text: str, manager: str) -> List[Package]:
+    """`pacman -Ss`"""
+    return [Package(name, manager, version, '', description, repo)
+            for repo, name, version, description in PACMAN_SEARCH.findall(text)]
+
+
+def pacman_installed(text: str, manager: str) -> List[Package]:
+    """`pacman -Q`"""
+    return [Package(name, manager, version) for name, version in PACMAN_INSTALLED.findall(text)]
+
+
+def pacman_upgradable(text: str, manager: str) -> List[Package]:
+    """`pacman -Qu`, where ignored updates are followed by "[ignored]" """
+    return [Package(name, manager, version, new_version)
+            for name, version, new_version in PACMAN_UPGRADABLE.findall(text)]
+
+
+def flatpak_search(text: str, manager: str) -> List[Package]:
+    """`flatpak search` without its header: name, description, application ID, version, branch, remotes"""
+    packages = []
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) > 5:
+            packages.append(Package(fields[0], manager, fields[3], '', fields[1], fields[5], fields[2]))
+        elif len(fields) > 2:
+            # Older flatpak versions leave out the trailing columns
+            packages.append(Package(fields[0], manager, '', '', fields[1], '', fields[2]))
+    return packages
+
+
+def flatpak_installed(text: str, manager: str) -> List[Package]:
+    """`flatpak list --app`: name, application ID, version, branch, installation"""
+    packages = []
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) > 2:
+            packages.append(Package(fields[0], manager, fields[2], '', '', '', fields[1]))
+    return packages
+
+
+def flatpak_upgradable(text: str, manager: str) -> List[Package]:
+    """`flatpak remote-ls --updates`: name, application ID, version, branch, remote"""
+    packages = []
+    for line in text.splitlines():
+        fields = line.split('\t')
+        if len(fields) > 4:
+            packages.append(Package(fields[0], manager, '', fields[2], '', fields[4], fields[1]))
+        elif len(fields) > 1:
+            packages.append(Package(fields[0], manager, '', '', '', '', fields[1]))
+    return packages
+
+
+def snap_search(text: str, manager: str) -> List[Package]:
+    """`snap find` without its header"""
+    return [Package(name, manager, version, '', summary) for name, version, summary in SNAP_SEARCH.findall(text)]
+
+
+def snap_installed(text: str, manager: str) -> List[Package]:
+    """`snap list` without its header"""
+    return [Package(name, manager, version) for name, version in SNAP_FIRST_COLUMNS.findall(text)]
+
+
+def snap_upgradable(text: str, manager: str) -> List[Package]:
+    """`snap refresh --list` without its header; the version shown is the new one"""
+    return [Package(name, manager, '', version) for name, version in SNAP_FIRST_COLUMNS.findall(text)]
@@ -0,0 +1,66 @@
+"""
+Transaction plans
+What an install, remove or upgrade would do, as resolved by a dry run of
+the package manager: the packages it installs, upgrades and removes
+(dependencies included), how much it downloads and how the installed size
+changes.
+"""
+from typing import List, Optional
+import re
+from .package import Package
+
+# Size units as the package managers print them; dnf4's k/M/G are binary
+UNITS = {
+    'b': 1, 'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3,
+    'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3,
+    'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3,
+}
+SIZE_RE = re.compile(r'([\d.,]+)\s*([kmg]i?b?|b)\b', re.IGNORECASE)
+
+
+def parse_size(text: str) -> Optional[int]:
+    """Bytes of a size such as "1,234 kB", "12 M" or "3.5 MiB", None if there is none"""
+    match = SIZE_RE.search(text)
+    if not match:
+        return None
+    number = match.group(1).replace(',', '')
+    try:
+        return int(float(number) * UNITS[match.group(2).lower()])
+    except (ValueError, KeyError):
+        return None
+
+
+class TransactionPlan:
+    """
+    Resolved transaction of one backend.
+    `install` holds new packages (new_version set), `upgrade` packages that
+    change version (version -> new_version), `remove` packages that go away.
+    Sizes are in bytes and None when the backend didn't report them;
+    size_change is negative when space is freed.
+    """
+    
+    def __init__(self, manager: str, kind: str, targets: List[str], error: str = ""):
+        self.manager = manager
+        self.kind = kind
+        self.targets = list(targets)
+        self.install: List[Package] = []
+        self.upgrade: List[Package] = []
+        self.remove: List[Package] = []
+        self.download_size: Optional[int] = None
+        self.size_change: Optional[int] = None
+        self.error = error
+    
+    @property
+    def ok(self) -> bool:
+        """Check whether the dry run resolved the transaction"""
+        return not self.error
+    
+    def affected(self) -> int:
+        """Number of packages the transaction touches"""
+        return len(self.install) + len(self.upgrade) + len(self.remove)
+    
+    def extra(self) -> List[Package]:
+        """Affected packages the user didn't ask for (dependencies)"""
+        targets = set(self.targets)
+        return [package for package in self.install + self.upgrade + self.remove
+                if package.name not in targets and package.name.split(':')[0] not in targets]
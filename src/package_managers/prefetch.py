@@ -0,0 +1,226 @@
+"""
+Download prefetch
+Downloads the packages of a pending full upgrade ahead of time, at idle IO
+and lowest CPU priority, so the interactive upgrade only has to install.
+The package managers keep what they downloaded (and resume partial files),
+this module keeps track of which upgrade set has been fetched, so progress
+survives restarts.
+"""
+from typing import List, Dict, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import threading
+import time
+from .base import PackageManager
+from .package import Package
+from .privileged_helper import background_command
+from .streaming import CommandStream
+from .update_checker import can_escalate
+
+COMPLETE = 'complete'
+PARTIAL = 'partial'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+def state_dir() -> str:
+    """Get the Orange Update state directory (XDG_STATE_HOME aware)"""
+    base = os.environ.get('XDG_STATE_HOME') or os.path.expanduser('~/.local/state')
+    return os.path.join(base, 'orange-update')
+
+
+def upgrade_signature(packages: List[Package]) -> str:
+    """Identity of an upgrade set: the names and target versions"""
+    items = sorted(f"{package.name}={package.new_version}" for package in packages)
+    return hashlib.sha1('\n'.join(items).encode()).hexdigest()
+
+
+def directory_size(paths: List[str]) -> int:
+    """Total size of the files below some directories"""
+    total = 0
+    for path in paths:
+        for root, _, files in os.walk(os.path.expanduser(path)):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    continue
+    return total
+
+
+def format_bytes(size: float) -> str:
+    """Human readable size"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class PrefetchResult:
+    """Outcome of prefetching one manager's upgrade set"""
+    
+    def __init__(self, manager, status: str, downloaded: int = 0, seconds: float = 0.0,
+                 error: str = ""):
+        self.manager = manager
+        self.status = status
+        # Bytes fetched by this run and its wall time
+        self.downloaded = downloaded
+        self.seconds = seconds
+        self.error = error
+    
+    @property
+    def rate(self) -> float:
+        """Throughput of this run in bytes per second"""
+        return self.downloaded / self.seconds if self.seconds > 0 else 0.0
+
+
+class Prefetcher:
+    """
+    Runs the download-only variant of a full upgrade per manager.
+    At most `max_workers` managers download at a time and each one opens at
+    most `parallel_downloads` connections where the backend supports it.
+    Progress is measured as the growth of the manager's download cache and
+    reported as on_progress(manager, downloaded bytes, bytes per second).
+
+    Like background update checks, root downloads only run through an
+    already authenticated helper, and `locks` (the OperationScheduler)
+    keeps prefetching away from backends with user operations.
+    """
+    
+    def __init__(self, max_workers: int = 2, parallel_downloads: int = 3, locks=None,
+                 escalate: Callable[[], bool] = can_escalate,
+                 on_progress: Optional[Callable[[object, int, float], None]] = None,
+                 poll_interval: float = 2.0, timeout: float = 3600,
+                 state_path: Optional[str] = None):
+        self.max_workers = max_workers
+        self.parallel_downloads = parallel_downloads
+        self.locks = locks
+        self.escalate = escalate
+        self.on_progress = on_progress
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.state_path = state_path or os.path.join(state_dir(), 'prefetch.json')
+        self.lock = threading.Lock()
+        self.state: Dict[str, Dict] = self.load()
+    
+    def load(self) -> Dict[str, Dict]:
+        """Read what earlier sessions fetched"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+    
+    def save(self):
+        """Persist the prefetch state"""
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+                tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError:
+                pass
+    
+    def is_fetched(self, manager, packages: List[Package]) -> bool:
+        """Check whether this exact upgrade set has been downloaded completely"""
+        entry = self.state.get(manager.name, {})
+        return entry.get('signature') == upgrade_signature(packages) and entry.get('status') == COMPLETE
+    
+    def command_for(self, manager) -> Optional[List[str]]:
+        """Prefetch command of a manager, None if it can't prefetch unattended"""
+        try:
+            command = manager.prefetch_command(self.parallel_downloads)
+        except NotImplementedError:
+            return None
+        if manager.needs_root(command) and not self.escalate():
+            return None
+        return command
+    
+    def prefetch(self, manager, packages: List[Package]) -> PrefetchResult:
+        """Download a manager's pending upgrade set, `packages` being its upgradable list"""
+        if not packages:
+            return PrefetchResult(manager, SKIPPED)
+        if self.is_fetched(manager, packages):
+            return PrefetchResult(manager, COMPLETE)
+        command = self.command_for(manager)
+        if command is None:
+            return PrefetchResult(manager, SKIPPED, error="needs authentication")
+        lock_groups = manager.lock_groups()
+        if self.locks is not None and not self.locks.try_hold(lock_groups):
+            return PrefetchResult(manager, SKIPPED, error="operations running")
+        try:
+            return self.download(manager, packages, command)
+        finally:
+            if self.locks is not None:
+                self.locks.release(lock_groups)
+    
+    def download(self, manager, packages: List[Package], command: List[str]) -> PrefetchResult:
+        """Run the download while sampling the growth of the download cache"""
+        signature = upgrade_signature(packages)
+        entry = self.state.get(manager.name, {})
+        if entry.get('signature') != signature:
+            # Another upgrade set, earlier downloads don't count for it
+            entry = {'signature': signature, 'packages': len(packages), 'downloaded': 0}
+        # Recorded before starting, so a crash or restart shows a partial fetch
+        entry['status'] = PARTIAL
+        self.state[manager.name] = entry
+        self.save()
+        
+        started = time.monotonic()
+        start_size = directory_size(manager.download_cache_paths)
+        finished = threading.Event()
+        
+        def sample():
+            while not finished.wait(self.poll_interval):
+                if self.on_progress is not None:
+                    grown = max(0, directory_size(manager.download_cache_paths) - start_size)
+                    self.on_progress(manager, grown, grown / max(time.monotonic() - started, 1e-6))
+        
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            returncode, stdout, stderr = self.run(manager, command)
+        finally:
+            finished.set()
+            sampler.join()
+        
+        seconds = time.monotonic() - started
+        downloaded = max(0, directory_size(manager.download_cache_paths) - start_size)
+        entry['downloaded'] = entry.get('downloaded', 0) + downloaded
+        if returncode == 0:
+            status = COMPLETE
+        else:
+            # Package managers resume partial files, so a later run picks up from here
+            status = PARTIAL if downloaded else FAILED
+        entry['status'] = status
+        entry['updated'] = time.time()
+        self.save()
+        return PrefetchResult(manager, status, downloaded, seconds,
+                              error="" if returncode == 0 else (stderr or stdout)[-500:])
+    
+    def run(self, manager, command: List[str]) -> tuple[int, str, str]:
+        """Run a prefetch command at background priority"""
+        helper = PackageManager.privileged_helper
+        if manager.needs_root(command) and os.geteuid() != 0:
+            # command_for() made sure the helper is connected
+            return helper.run(manager.command, 'prefetch', timeout=self.timeout, background=True,
+                              parallel_downloads=self.parallel_downloads)
+        stream = CommandStream(background_command(command), timeout=self.timeout)
+        for _ in stream:
+            pass
+        output = stream.tail_text()
+        if stream.returncode == 0:
+            return 0, output, ""
+        return stream.returncode, output, stream.error or output
+    
+    def prefetch_all(self, jobs: List[tuple]) -> List[PrefetchResult]:
+        """Prefetch (manager, upgradable packages) jobs, max_workers at a time"""
+        if not jobs:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda job: self.prefetch(*job), jobs))
@@ -0,0 +1,71 @@
+"""
+Transaction preview
+Resolves installs, removes and upgrades with the backends' dry runs before
+they are confirmed, and remembers the plans. A plan stays valid while the
+installed package database and the repository metadata are unchanged, so
+asking again for the same package set is answered without a dry run.
+"""
+from typing import List, Optional, Callable
+from collections import OrderedDict
+import threading
+from .cache import fingerprint_paths
+from .plan import TransactionPlan
+from .update_checker import can_escalate
+
+
+class TransactionPreviewer:
+    """
+    Dry runs with a small in-memory LRU of their plans, keyed on backend,
+    operation, package set and a fingerprint of the package databases.
+    Backends whose dry run needs root only get it when no authentication
+    prompt is needed; otherwise they try as the user.
+    """
+    
+    def __init__(self, max_entries: int = 64, escalate: Callable[[], bool] = can_escalate):
+        self.max_entries = max_entries
+        self.escalate = escalate
+        self.plans: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def key(self, manager, kind: str, packages: List[str]) -> Optional[tuple]:
+        """Cache key of a preview, None if the databases can't be fingerprinted"""
+        if manager.transport.remote or not manager.installed_db_paths or not manager.metadata_db_paths:
+            return None
+        fingerprint = fingerprint_paths(manager.installed_db_paths + manager.metadata_db_paths)
+        if fingerprint is None:
+            return None
+        return manager.name, kind, tuple(sorted(set(packages))), fingerprint
+    
+    def cached(self, manager, kind: str, packages: List[str]) -> Optional[TransactionPlan]:
+        """A still valid plan for this transaction, if there is one"""
+        key = self.key(manager, kind, packages)
+        if key is None:
+            return None
+        with self.lock:
+            plan = self.plans.get(key)
+            if plan is not None:
+                self.plans.move_to_end(key)
+            return plan
+    
+    def preview(self, manager, kind: str, packages: List[str]) -> TransactionPlan:
+        """Plan of an install, remove or upgrade (of everything if no packages are given)"""
+        plan = self.cached(manager, kind, packages)
+        if plan is not None:
+            return plan
+        key = self.key(manager, kind, packages)
+        use_sudo = manager.preview_as_root and self.escalate()
+        try:
+            plan = manager.preview_transaction(kind, packages, use_sudo=use_sudo)
+        except Exception as e:
+            return TransactionPlan(manager.name, kind, packages, error=str(e))
+        if plan.ok and key is not None:
+            with self.lock:
+                self.plans[key] = plan
+                while len(self.plans) > self.max_entries:
+                    self.plans.popitem(last=False)
+        return plan
+    
+    def invalidate(self):
+        """Forget every plan"""
+        with self.lock:
+            self.plans.clear()
@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Privileged helper - a long-lived root process that runs package operations
+The GUI starts it once per session through pkexec and then sends operation
+requests over a local unix socket, instead of spawning pkexec (and asking
+polkit) for every single install/remove/upgrade.
+
+Protocol: newline-delimited JSON on the socket.
+  request:  {"id": 1, "op": "install", "manager": "apt", "packages": ["curl"], "timeout": 300}
+  replies:  {"id": 1, "line": "..."}              one per output line
+            {"id": 1, "returncode": 0, "error": ""}  when the command ends
+  control:  {"id": 2, "op": "ping"} / {"id": 3, "op": "shutdown"}
+Clients never send a command line. The helper builds it from the backend's
+own *_command() method (PackageManager.operation_command()), so a process
+of the user can only ask for the operations below on well-formed package
+names, not run arbitrary arguments as root. "preview" takes a "kind"
+(install, remove or upgrade), "prefetch" may give "parallel_downloads".
+A request with "background": true runs at idle IO and lowest CPU priority.
+
+Requests are queued per lock group of their backend (lock_groups()) and
+run one at a time in arrival order within it, while requests of backends
+with separate locks run side by side, as the GUI's OperationScheduler runs
+them. A client can pipeline several requests without waiting for the
+previous reply.
+
+The backends are imported on the first request; started as a plain script
+by pkexec, the helper imports them from next to this file.
+"""
+from typing import List, Dict, Optional, Callable, Sequence
+import argparse
+import importlib
+import json
+import os
+import queue
+import re
+import shutil
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+# Backends whose operations may run with root rights: manager command -> (module, class)
+BACKENDS = {
+    'apt': ('apt_manager', 'AptManager'),
+    'dnf': ('dnf_manager', 'DnfManager'),
+    'pacman': ('pacman_manager', 'PacmanManager'),
+}
+
+# Operations a client may request, see PackageManager.operation_command()
+OPERATIONS = ('update', 'prefetch', 'preview', 'install', 'remove', 'upgrade')
+PREVIEW_KINDS = ('install', 'remove', 'upgrade')
+MAX_PARALLEL_DOWNLOADS = 16
+
+# Package names of apt, dnf and pacman, optionally with an apt architecture
+# suffix. No option ("-..."), path, URL, glob or version constraint fits.
+PACKAGE_NAME = re.compile(r'[A-Za-z0-9_+@][A-Za-z0-9_+@.~-]{0,254}(:[a-z0-9-]+)?')
+# Names apt and dnf would take for a package file in the working directory
+PACKAGE_FILE_SUFFIXES = ('.deb', '.rpm')
+
+# CPU niceness of background requests such as download prefetching
+BACKGROUND_NICE = 19
+
+
+def background_command(command: List[str]) -> List[str]:
+    """Wrap a command to run at idle IO and lowest CPU priority, where the tools exist"""
+    prefix = []
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', '3']
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', str(BACKGROUND_NICE)]
+    return prefix + command
+
+
+def valid_package_name(name) -> bool:
+    """Check that a requested package name can't be taken for anything else"""
+    return isinstance(name, str) and PACKAGE_NAME.fullmatch(name) is not None and \
+        not name.endswith(PACKAGE_FILE_SUFFIXES)
+
+
+def default_socket_path() -> str:
+    """
+    Per-user socket location in the runtime directory (XDG_RUNTIME_DIR,
+    else logind's /run/user/<uid>). There is deliberately no fallback to a
+    shared directory such as /tmp, where the user could prepare the path.
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or f"/run/user/{os.getuid()}"
+    return os.path.join(runtime_dir, 'orange-update-helper.sock')
+
+
+class HelperServer:
+    """
+    Serves operation requests on a unix socket.
+    Run as root via pkexec in production; running it as a normal user gives
+    a local stand-in with the same transport for development and testing.
+    """
+    
+    def __init__(self, socket_path: str, owner_uid: Optional[int] = None, idle_timeout: float = 900):
+        self.socket_path = socket_path
+        self.owner_uid = os.getuid() if owner_uid is None else owner_uid
+        self.idle_timeout = idle_timeout
+        # Request queue of each lock group, every queue has its own worker
+        self.queues: Dict[str, queue.Queue] = {}
+        self.queues_lock = threading.Lock()
+        self.connections = 0
+        self.last_activity = time.monotonic()
+        self.running = False
+        self.sock = None
+        # Socket directory, opened once; every file operation goes through it
+        self.dir_fd: Optional[int] = None
+        # Backend instances building the command lines, by manager command
+        self.managers: Dict[str, object] = {}
+    
+    def bind(self):
+        """
+        Create the listening socket, only reachable by the owning user.
+        The directory must be the owner's private one (the runtime
+        directory); the helper never creates, chmods or chowns anything by
+        path, so a symlink or a swapped file can't redirect its root rights.
+        The socket is created connectable for everyone, the 0700 directory
+        and the peer credential check keep other users out.
+        """
+        directory = os.path.dirname(self.socket_path) or '.'
+        name = os.path.basename(self.socket_path)
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+        try:
+            info = os.fstat(dir_fd)
+            if info.st_uid != self.owner_uid or stat.S_IMODE(info.st_mode) & 0o077:
+                raise PermissionError(f"{directory} is not a private directory of uid {self.owner_uid}")
+            try:
+                os.unlink(name, dir_fd=dir_fd)
+            except FileNotFoundError:
+                pass
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            # Bound through the opened directory, wherever its path points by now
+            old_umask = os.umask(0o111)
+            try:
+                self.sock.bind(f"/proc/self/fd/{dir_fd}/{name}")
+            finally:
+                os.umask(old_umask)
+        except BaseException:
+            os.close(dir_fd)
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+            raise
+        self.dir_fd = dir_fd
+        self.sock.listen(4)
+        self.sock.settimeout(1.0)
+        self.running = True
+    
+    def serve_forever(self):
+        """Accept clients until shutdown or until idle for idle_timeout"""
+        if self.sock is None:
+            self.bind()
+        try:
+            while self.running:
+                try:
+                    conn, _ = self.sock.accept()
+                except socket.timeout:
+                    idle = time.monotonic() - self.last_activity
+                    if self.connections == 0 and self.idle() and idle > self.idle_timeout:
+                        break
+                    continue
+                except OSError:
+                    break
+                if not self.peer_allowed(conn):
+                    conn.close()
+                    continue
+                self.connections += 1
+                threading.Thread(target=self.handle_client, args=(conn,), daemon=True).start()
+        finally:
+            self.running = False
+            with self.queues_lock:
+                for requests in self.queues.values():
+                    requests.put(None)
+            self.sock.close()
+            try:
+                os.unlink(os.path.basename(self.socket_path), dir_fd=self.dir_fd)
+            except OSError:
+                pass
+            os.close(self.dir_fd)
+    
+    def serve_in_thread(self) -> threading.Thread:
+        """Start serving on a background thread (unprivileged stand-in)"""
+        self.bind()
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self):
+        """Stop accepting clients"""
+        self.running = False
+    
+    def peer_allowed(self, conn) -> bool:
+        """Only the owning user (or root) may talk to the helper"""
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', creds)
+        return uid in (0, self.owner_uid)
+    
+    def handle_client(self, conn):
+        """Read requests from a client and queue them"""
+        send_lock = threading.Lock()
+        
+        def send(message: Dict):
+            data = (json.dumps(message) + '\n').encode()
+            with send_lock:
+                try:
+                    conn.sendall(data)
+                except OSError:
+                    pass
+        
+        try:
+            with conn, conn.makefile('r', encoding='utf-8') as reader:
+                for line in reader:
+                    self.last_activity = time.monotonic()
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        continue
+                    op = request.get('op', 'run')
+                    if op == 'ping':
+                        send({'id': request.get('id'), 'returncode': 0, 'error': '', 'pid': os.getpid()})
+                    elif op == 'shutdown':
+                        send({'id': request.get('id'), 'returncode': 0, 'error': ''})
+                        self.shutdown()
+                    else:
+                        self.queue_for(request).put((request, send))
+        finally:
+            self.connections -= 1
+            self.last_activity = time.monotonic()
+    
+    def queue_for(self, request: Dict) -> queue.Queue:
+        """Queue of the lock group a request's backend holds, started on first use"""
+        with self.queues_lock:
+            name = request.get('manager')
+            # Invalid requests are refused by build_command(), on a queue of their own
+            group = ','.join(self.backend(name).lock_groups()) if name in BACKENDS else ''
+            requests = self.queues.get(group)
+            if requests is None:
+                requests = self.queues[group] = queue.Queue()
+                threading.Thread(target=self.run_requests, args=(requests,), daemon=True).start()
+            return requests
+    
+    def idle(self) -> bool:
+        """Check whether no request is waiting in any queue"""
+        with self.queues_lock:
+            return all(requests.empty() for requests in self.queues.values())
+    
+    def run_requests(self, requests: queue.Queue):
+        """Run the requests of one lock group one at a time"""
+        while True:
+            item = requests.get()
+            if item is None:
+                return
+            request, send = item
+            self.run_request(request, send)
+            self.last_activity = time.monotonic()
+    
+    def backend(self, name: str):
+        """Backend instance for a manager command, imported on first use"""
+        manager = self.managers.get(name)
+        if manager is None:
+            module_name, class_name = BACKENDS[name]
+            if __package__:
+                module = importlib.import_module(f".{module_name}", __package__)
+            else:
+                # Started as a script: the package is the directory of this file
+                sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+                module = importlib.import_module(f"package_managers.{module_name}")
+            manager = self.managers[name] = getattr(module, class_name)()
+        return manager
+    
+    def build_command(self, request: Dict) -> List[str]:
+        """
+        Command line of an operation request, built by the backend itself.
+        Raises ValueError for anything but a known operation on valid names.
+        """
+        op = request.get('op')
+        name = request.get('manager')
+        packages = request.get('packages', [])
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {op}")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown package manager: {name}")
+        if not isinstance(packages, list) or not all(valid_package_name(package) for package in packages):
+            raise ValueError("Invalid package name")
+        if op in ('install', 'remove') and not packages:
+            raise ValueError(f"Nothing to {op}")
+        options = {}
+        if op == 'preview':
+            options['kind'] = request.get('kind')
+            if options['kind'] not in PREVIEW_KINDS:
+                raise ValueError(f"Unknown preview kind: {options['kind']}")
+        elif op == 'prefetch':
+            options['parallel_downloads'] = request.get('parallel_downloads', 3)
+            if type(options['parallel_downloads']) is not int or \
+                    not 1 <= options['parallel_downloads'] <= MAX_PARALLEL_DOWNLOADS:
+                raise ValueError("Invalid number of parallel downloads")
+        try:
+            return self.backend(name).operation_command(op, packages, **options)
+        except NotImplementedError as e:
+            raise ValueError(str(e))
+    
+    def run_request(self, request: Dict, send: Callable[[Dict], None]):
+        """Run one operation and stream its output back"""
+        request_id = request.get('id')
+        try:
+            command = self.build_command(request)
+        except ValueError as e:
+            send({'id': request_id, 'returncode': -1, 'error': str(e)})
+            return
+        if request.get('background'):
+            command = background_command(command)
+        
+        timeout = request.get('timeout') or 300
+        try:
+            process = subprocess.Popen(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                text=True,
+                errors='replace',
+                bufsize=1
+            )
+        except Exception as e:
+            send({'id': request_id, 'returncode': -1, 'error': str(e)})
+            return
+        
+        timed_out = threading.Event()
+        
+        def on_timeout():
+            if process.poll() is None:
+                timed_out.set()
+                process.kill()
+        
+        timer = threading.Timer(timeout, on_timeout)
+        timer.daemon = True
+        timer.start()
+        for line in process.stdout:
+            send({'id': request_id, 'line': line.rstrip('\n')})
+        returncode = process.wait()
+        timer.cancel()
+        process.stdout.close()
+        if timed_out.is_set():
+            send({'id': request_id, 'returncode': -1, 'error': "Command timed out"})
+        else:
+            send({'id': request_id, 'returncode': returncode, 'error': ''})
+
+
+class HelperRequest:
+    """A request in flight; wait() blocks until the helper reports the result"""
+    
+    def __init__(self, request_id: int, on_output: Optional[Callable[[str], None]] = None,
+                 tail_lines: int = 200):
+        self.id = request_id
+        self.on_output = on_output
+        self.lines = []
+        self.tail_lines = tail_lines
+        self.returncode: Optional[int] = None
+        self.error = ""
+        self.done = threading.Event()
+    
+    def add_line(self, line: str):
+        """Record an output line"""
+        if self.on_output is not None:
+            self.on_output(line)
+        self.lines.append(line)
+        if len(self.lines) > self.tail_lines:
+            del self.lines[0]
+    
+    def finish(self, returncode: int, error: str):
+        """Record the final result"""
+        self.returncode = returncode
+        self.error = error
+        self.done.set()
+    
+    def wait(self, timeout: Optional[float] = None) -> tuple[int, str, str]:
+        """Wait for the result as (return_code, stdout, stderr)"""
+        if not self.done.wait(timeout):
+            return -1, "", "Timed out waiting for the privileged helper"
+        output = '\n'.join(self.lines)
+        if self.returncode == 0:
+            return 0, output, ""
+        return self.returncode, output, self.error or output
+
+
+class HelperClient:
+    """
+    Client side of the privileged helper.
+    Thread-safe: several threads can submit requests on the same connection;
+    replies are routed back to the right request by id.
+    """
+    
+    def __init__(self, socket_path: Optional[str] = None, escalate: bool = True):
+        self.socket_path = socket_path or default_socket_path()
+        # escalate=False starts the helper without pkexec (local stand-in)
+        self.escalate = escalate
+        self.sock = None
+        self.process = None
+        self.pending: Dict[int, HelperRequest] = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self.start_failed = False
+    
+    @property
+    def connected(self) -> bool:
+        """Check whether there is a live connection to the helper"""
+        return self.sock is not None
+    
+    def connect(self) -> bool:
+        """Connect to an already running helper"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            return False
+        self.sock = sock
+        threading.Thread(target=self.read_replies, args=(sock,), daemon=True).start()
+        return True
+    
+    def start(self, wait: float = 120) -> bool:
+        """
+        Launch the helper (one pkexec authentication) and connect to it.
+        Waits up to `wait` seconds for the user to authenticate.
+        """
+        with self.lock:
+            if self.sock is not None:
+                return True
+            if self.connect():
+                return True
+            command = [
+                sys.executable, os.path.abspath(__file__),
+                '--socket', self.socket_path, '--uid', str(os.getuid())
+            ]
+            if self.escalate:
+                command = ['pkexec'] + command
+            try:
+                self.process = subprocess.Popen(
+                    command, stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                )
+            except OSError:
+                self.start_failed = True
+                return False
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    # Authentication cancelled or helper failed to start
+                    break
+                if self.connect():
+                    return True
+                time.sleep(0.1)
+            self.start_failed = True
+            return False
+    
+    def ensure_started(self) -> bool:
+        """Start the helper unless that already failed this session"""
+        if self.sock is not None:
+            return True
+        if self.start_failed:
+            return False
+        return self.start()
+    
+    def read_replies(self, sock):
+        """Dispatch replies from the helper to their requests"""
+        try:
+            with sock.makefile('r', encoding='utf-8') as reader:
+                for line in reader:
+                    try:
+                        reply = json.loads(line)
+                    except ValueError:
+                        continue
+                    request = self.pending.get(reply.get('id'))
+                    if request is None:
+                        continue
+                    if 'line' in reply:
+                        request.add_line(reply['line'])
+                    else:
+                        self.pending.pop(request.id, None)
+                        request.finish(reply.get('returncode', -1), reply.get('error', ''))
+        except OSError:
+            pass
+        # Connection lost - fail whatever is still waiting
+        with self.lock:
+            if self.sock is sock:
+                self.sock = None
+        for request in list(self.pending.values()):
+            request.finish(-1, "Privileged helper connection lost")
+        self.pending.clear()
+    
+    def send(self, message: Dict, on_output: Optional[Callable[[str], None]] = None) -> HelperRequest:
+        """Send a message and return the request handle for its reply"""
+        with self.lock:
+            request = HelperRequest(self.next_id, on_output)
+            self.next_id += 1
+            sock = self.sock
+            if sock is None:
+                request.finish(-1, "Privileged helper is not running")
+                return request
+            message = dict(message, id=request.id)
+            self.pending[request.id] = request
+            try:
+                sock.sendall((json.dumps(message) + '\n').encode())
+            except OSError as e:
+                self.pending.pop(request.id, None)
+                request.finish(-1, str(e))
+        return request
+    
+    def submit(self, manager: str, op: str, packages: Sequence[str] = (),
+               on_output: Optional[Callable[[str], None]] = None, timeout: float = 300,
+               background: bool = False, **options) -> HelperRequest:
+        """
+        Queue an operation of a manager (its command, e.g. 'apt') on the
+        helper without waiting for it. `options` are the operation's extra
+        fields (kind, parallel_downloads).
+        background=True runs it at idle IO and lowest CPU priority.
+        """
+        message = {'op': op, 'manager': manager, 'packages': list(packages), 'timeout': timeout, **options}
+        if background:
+            message['background'] = True
+        return self.send(message, on_output)
+    
+    def run(self, manager: str, op: str, packages: Sequence[str] = (),
+            on_output: Optional[Callable[[str], None]] = None, timeout: float = 300,
+            background: bool = False, **options) -> tuple[int, str, str]:
+        """Run an operation on the helper and wait for the result"""
+        return self.submit(manager, op, packages, on_output, timeout, background, **options).wait()
+    
+    def ping(self) -> bool:
+        """Check that the helper answers"""
+        return self.send({'op': 'ping'}).wait(5)[0] == 0
+    
+    def close(self, shutdown: bool = True):
+        """Disconnect, optionally stopping the helper"""
+        if shutdown and self.sock is not None:
+            self.send({'op': 'shutdown'}).wait(5)
+        with self.lock:
+            sock, self.sock = self.sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+
+def main():
+    """Entry point when started through pkexec"""
+    parser = argparse.ArgumentParser(description="Orange Update privileged helper")
+    parser.add_argument('--socket', required=True, help="unix socket path to listen on")
+    parser.add_argument('--uid', type=int, default=None, help="user allowed to connect")
+    parser.add_argument('--idle-timeout', type=float, default=900,
+                        help="exit after this many idle seconds")
+    args = parser.parse_args()
+    
+    # pkexec tells us who authenticated; trust that over the command line
+    owner_uid = args.uid
+    if os.environ.get('PKEXEC_UID'):
+        owner_uid = int(os.environ['PKEXEC_UID'])
+    server = HelperServer(args.socket, owner_uid=owner_uid, idle_timeout=args.idle_timeout)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
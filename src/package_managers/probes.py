@@ -0,0 +1,191 @@
+"""
+Backend capability probes
+Checks that a detected backend actually works (its binary runs, snapd
+answers on its socket) and notes its version and capabilities. Probes run
+with short timeouts, and results are cached on disk for a while. A cached
+result only counts while the binary's path and mtime are unchanged, so
+upgrading or reinstalling a package manager probes it again.
+"""
+from typing import List, Dict, Optional, Callable
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from .cache import cache_dir
+
+# How long probe results stay valid; a dead backend is retried sooner
+PROBE_TTL = 24 * 3600
+FAILED_PROBE_TTL = 10 * 60
+PROBE_TIMEOUT = 3.0
+
+
+class ProbeResult:
+    """Whether a backend works, its version and capabilities"""
+    
+    def __init__(self, ok: bool, version: str = "", error: str = "",
+                 capabilities: Optional[Dict[str, bool]] = None):
+        self.ok = ok
+        self.version = version
+        self.error = error
+        self.capabilities = capabilities or {}
+        # Binary the result belongs to, filled in by ProbeCache
+        self.path = ""
+        self.mtime = 0
+        self.checked = 0.0
+    
+    def to_dict(self) -> Dict:
+        """Cache record"""
+        return {
+            'ok': self.ok, 'version': self.version, 'error': self.error,
+            'capabilities': self.capabilities, 'path': self.path,
+            'mtime': self.mtime, 'checked': self.checked,
+        }
+    
+    @classmethod
+    def from_dict(cls, record: Dict) -> 'ProbeResult':
+        """Result from a cache record"""
+        result = cls(bool(record.get('ok')), record.get('version', ''), record.get('error', ''),
+                     record.get('capabilities') or {})
+        result.path = record.get('path', '')
+        result.mtime = record.get('mtime', 0)
+        result.checked = record.get('checked', 0.0)
+        return result
+
+
+def run_probe(command: List[str], timeout: float) -> tuple[int, str]:
+    """Run a probe command, returns (returncode, output); -1 if it didn't finish"""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True,
+                                stdin=subprocess.DEVNULL, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return -1, f"{command[0]} did not answer within {timeout:.0f} s"
+    except OSError as e:
+        return -1, str(e)
+    return result.returncode, result.stdout + result.stderr
+
+
+def probe_version(command: List[str], pattern: str, timeout: float) -> ProbeResult:
+    """Run `<tool> --version` and pick the version out of its output"""
+    returncode, output = run_probe(command, timeout)
+    if returncode != 0:
+        return ProbeResult(False, error=output.strip()[-300:] or f"exit status {returncode}")
+    match = re.search(pattern, output, re.MULTILINE)
+    return ProbeResult(True, version=match.group(1) if match else "")
+
+
+def major_version(version: str) -> int:
+    """Leading number of a version string, 0 if there is none"""
+    match = re.match(r'(\d+)', version)
+    return int(match.group(1)) if match else 0
+
+
+def probe_apt(timeout: float) -> ProbeResult:
+    """APT runs"""
+    return probe_version(["apt", "--version"], r'^apt (\S+)', timeout)
+
+
+def probe_dnf(timeout: float) -> ProbeResult:
+    """DNF runs; dnf5 prints a different banner and output formats"""
+    returncode, output = run_probe(["dnf", "--version"], timeout)
+    if returncode != 0:
+        return ProbeResult(False, error=output.strip()[-300:] or f"exit status {returncode}")
+    match = re.search(r'(\d+\.\d+[\w.\-]*)', output)
+    return ProbeResult(True, version=match.group(1) if match else "",
+                       capabilities={'dnf5': 'dnf5' in output})
+
+
+def probe_pacman(timeout: float) -> ProbeResult:
+    """Pacman runs; ParallelDownloads exists since pacman 6"""
+    result = probe_version(["pacman", "--version"], r'Pacman v(\S+)', timeout)
+    result.capabilities['parallel_downloads'] = major_version(result.version) >= 6
+    return result
+
+
+def probe_flatpak(timeout: float) -> ProbeResult:
+    """Flatpak runs"""
+    return probe_version(["flatpak", "--version"], r'Flatpak (\S+)', timeout)
+
+
+def probe_snap(timeout: float) -> ProbeResult:
+    """snapd answers on its socket; the snap CLI is useless without it"""
+    from .snapd_api import SnapdClient, SnapdError
+    client = SnapdClient(timeout=timeout)
+    try:
+        info = client.get("/v2/system-info") or {}
+    except SnapdError as e:
+        return ProbeResult(False, error=str(e))
+    finally:
+        client.close()
+    return ProbeResult(True, version=info.get('version', ''))
+
+
+# Probe of every supported package manager, by manager name
+PROBES: Dict[str, Callable[[float], ProbeResult]] = {
+    "APT": probe_apt,
+    "DNF": probe_dnf,
+    "Pacman": probe_pacman,
+    "Flatpak": probe_flatpak,
+    "Snap": probe_snap,
+}
+
+
+class ProbeCache:
+    """Probe results on disk, keyed on the manager name"""
+    
+    def __init__(self, path: Optional[str] = None, ttl: float = PROBE_TTL,
+                 failed_ttl: float = FAILED_PROBE_TTL, enabled: Optional[bool] = None):
+        self.path = path or os.path.join(cache_dir(), 'probes.json')
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        if enabled is None:
+            enabled = not os.environ.get('ORANGE_UPDATE_NO_CACHE')
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.records: Dict[str, Dict] = self.load()
+    
+    def load(self) -> Dict[str, Dict]:
+        """Read the cached results"""
+        if not self.enabled:
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return records if isinstance(records, dict) else {}
+    
+    def save(self):
+        """Write the cached results"""
+        if not self.enabled:
+            return
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.records, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass
+    
+    def get(self, name: str, path: str, mtime: int) -> Optional[ProbeResult]:
+        """Cached result for a binary, None if there is none or it is stale"""
+        with self.lock:
+            record = self.records.get(name)
+        if not isinstance(record, dict):
+            return None
+        result = ProbeResult.from_dict(record)
+        ttl = self.ttl if result.ok else self.failed_ttl
+        if result.path != path or result.mtime != mtime or time.time() - result.checked > ttl:
+            return None
+        return result
+    
+    def put(self, name: str, path: str, mtime: int, result: ProbeResult):
+        """Remember a fresh result"""
+        result.path = path
+        result.mtime = mtime
+        result.checked = time.time()
+        with self.lock:
+            self.records[name] = result.to_dict()
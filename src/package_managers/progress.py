@@ -0,0 +1,92 @@
+"""
+Progress parsing for package manager output
+Turns individual output lines into progress events (percentage + step).
+"""
+from typing import Optional
+import re
+
+
+class ProgressEvent:
+    """A progress update parsed from one output line"""
+    __slots__ = ('percent', 'message')
+    
+    def __init__(self, percent: Optional[float], message: str):
+        self.percent = percent
+        self.message = message
+    
+    def __repr__(self):
+        return f"ProgressEvent({self.percent!r}, {self.message!r})"
+
+
+# apt -o APT::Status-Fd=1: "dlstatus:3:42.5:Retrieving file 3 of 7"
+APT_STATUS_RE = re.compile(r'^(dlstatus|pmstatus):[^:]*:([\d.]+):(.*)$')
+# dpkg -o Dpkg::Progress-Fancy=1: "Progress: [ 45%]"
+DPKG_FANCY_RE = re.compile(r'^Progress: \[\s*(\d+)%\]')
+# apt download lines: "Get:12 http://deb.debian.org/debian bookworm/main amd64 curl amd64 7.88.1-10 [315 kB]"
+APT_GET_RE = re.compile(r'^Get:\d+ \S+ \S+ \S+ ([^\s\[]+) ')
+# dpkg steps: "Unpacking curl (7.88.1-10) ...", "Setting up curl (7.88.1-10) ..."
+DPKG_STEP_RE = re.compile(r'^(Unpacking|Setting up|Removing|Preparing to unpack|Purging configuration files for) (\S+)')
+# dnf transaction: "  Upgrading        : curl-8.6.0-7.fc40.x86_64        3/10"
+DNF_STEP_RE = re.compile(
+    r'^\s*(Installing|Upgrading|Downgrading|Reinstalling|Cleanup|Verifying|Removing|Erasing|Running scriptlet)'
+    r'\s*:\s*(\S+).*?\s(\d+)/(\d+)\s*$'
+)
+# dnf download: "(3/10): curl-8.6.0-7.fc40.x86_64.rpm      1.2 MB/s | 300 kB     00:00"
+DNF_DOWNLOAD_RE = re.compile(r'^\((\d+)/(\d+)\): (\S+)')
+# pacman: "(3/10) upgrading curl                 [######] 100%"
+PACMAN_STEP_RE = re.compile(
+    r'^\(\s*(\d+)/(\d+)\) (installing|upgrading|reinstalling|downgrading|removing|checking|loading|'
+    r'checking keys|checking package integrity|checking available disk space) ?(\S*)'
+)
+# flatpak / snap / pacman downloads end in a percentage
+PERCENT_RE = re.compile(r'(\d{1,3}(?:\.\d+)?)%')
+
+
+def parse_progress(line: str) -> Optional[ProgressEvent]:
+    """Parse a line of package manager output into a ProgressEvent, if it carries progress"""
+    if not line:
+        return None
+    
+    match = APT_STATUS_RE.match(line)
+    if match:
+        phase, percent, message = match.groups()
+        percent = float(percent)
+        if phase == 'dlstatus':
+            # Downloading is the first half of an apt transaction
+            return ProgressEvent(percent / 2, message)
+        return ProgressEvent(50 + percent / 2, message)
+    
+    match = DPKG_FANCY_RE.match(line)
+    if match:
+        return ProgressEvent(float(match.group(1)), "Installing")
+    
+    match = APT_GET_RE.match(line)
+    if match:
+        return ProgressEvent(None, f"Downloading {match.group(1)}")
+    
+    match = DPKG_STEP_RE.match(line)
+    if match:
+        return ProgressEvent(None, f"{match.group(1)} {match.group(2)}")
+    
+    match = DNF_STEP_RE.match(line)
+    if match:
+        step, package, done, total = match.groups()
+        return ProgressEvent(100.0 * int(done) / int(total), f"{step} {package}")
+    
+    match = DNF_DOWNLOAD_RE.match(line)
+    if match:
+        done, total, package = match.groups()
+        return ProgressEvent(100.0 * int(done) / int(total), f"Downloaded {package}")
+    
+    match = PACMAN_STEP_RE.match(line)
+    if match:
+        done, total, step, package = match.groups()
+        return ProgressEvent(100.0 * int(done) / int(total), f"{step.capitalize()} {package}".strip())
+    
+    match = PERCENT_RE.search(line)
+    if match:
+        percent = float(match.group(1))
+        if percent <= 100:
+            # Drop the progress bar drawn in front of the percentage
+            return ProgressEvent(percent, line[:match.start()].rstrip(' █▒░#=-[]').strip())
+    return None
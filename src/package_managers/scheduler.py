@@ -0,0 +1,196 @@
+"""
+Operation scheduler
+Queues package operations and runs those of backends that don't share a
+lock in parallel, while operations on the same lock run one at a time.
+"""
+from typing import List, Dict, Set, Optional, Callable
+import threading
+from .batch import BatchResult
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Operation:
+    """A queued package operation: manager.<kind>(*args, on_output=...)"""
+    
+    def __init__(self, operation_id: int, manager, kind: str, args: tuple = ()):
+        self.id = operation_id
+        self.manager = manager
+        self.kind = kind
+        self.args = args
+        self.lock_groups = frozenset(manager.lock_groups())
+        self.state = QUEUED
+        # (returncode, stdout, stderr) or a BatchResult for *_packages operations
+        self.result = None
+    
+    def describe(self) -> str:
+        """Short human readable description"""
+        targets = []
+        for arg in self.args:
+            targets.extend(arg if isinstance(arg, (list, tuple)) else [arg])
+        text = f"{self.kind.replace('_packages', '')} {' '.join(str(t) for t in targets)}".strip()
+        return f"{self.manager.name}: {text}"
+    
+    def returncode(self) -> Optional[int]:
+        """Return code of the finished operation"""
+        if isinstance(self.result, BatchResult):
+            return self.result.returncode
+        if self.result is not None:
+            return self.result[0]
+        return None
+    
+    def run(self, on_output: Callable[[str], None]):
+        """Run the operation on its manager"""
+        method = getattr(self.manager, self.kind)
+        return method(*self.args, on_output=on_output)
+
+
+class OperationScheduler:
+    """
+    Run queued operations as soon as their locks are free.
+    Operations are started in queue order; a queued operation also reserves
+    its locks against operations behind it, so reordering the queue is the
+    only way to let a later operation overtake a conflicting earlier one.
+    Running operations can't be cancelled - killing dpkg or rpm halfway
+    through a transaction leaves a broken system.
+
+    on_change(operation, state) is called from worker threads whenever an
+    operation changes state, on_output(operation, line) for every output line.
+    """
+    
+    def __init__(self, on_change: Optional[Callable[[Operation, str], None]] = None,
+                 on_output: Optional[Callable[[Operation, str], None]] = None):
+        self.on_change = on_change
+        self.on_output = on_output
+        self.lock = threading.Condition()
+        self.queue: List[Operation] = []
+        self.running: Dict[int, Operation] = {}
+        # Lock groups held by work outside the queue, e.g. background checks
+        self.held: Set[str] = set()
+        self.next_id = 1
+    
+    def submit(self, manager, kind: str, *args) -> Operation:
+        """Queue an operation and start it if its locks are free"""
+        with self.lock:
+            operation = Operation(self.next_id, manager, kind, args)
+            self.next_id += 1
+            self.queue.append(operation)
+        self.notify(operation, QUEUED)
+        self.dispatch()
+        return operation
+    
+    def cancel(self, operation_id: int) -> bool:
+        """Drop a queued operation"""
+        with self.lock:
+            for operation in self.queue:
+                if operation.id == operation_id:
+                    self.queue.remove(operation)
+                    operation.state = CANCELLED
+                    break
+            else:
+                return False
+            self.lock.notify_all()
+        self.notify(operation, CANCELLED)
+        # Operations waiting on the cancelled one's locks may start now
+        self.dispatch()
+        return True
+    
+    def move(self, operation_id: int, offset: int) -> bool:
+        """Move a queued operation up (negative offset) or down the queue"""
+        with self.lock:
+            for index, operation in enumerate(self.queue):
+                if operation.id == operation_id:
+                    break
+            else:
+                return False
+            new_index = max(0, min(len(self.queue) - 1, index + offset))
+            if new_index == index:
+                return False
+            self.queue.insert(new_index, self.queue.pop(index))
+        # Not a state change, so no on_change; moving may unblock operations
+        self.dispatch()
+        return True
+    
+    def try_hold(self, lock_groups: List[str]) -> bool:
+        """
+        Take locks for work outside the queue if no queued or running
+        operation needs them. Queued operations wait until release().
+        """
+        groups = set(lock_groups)
+        with self.lock:
+            if groups & self.held:
+                return False
+            for operation in list(self.running.values()) + self.queue:
+                if operation.lock_groups & groups:
+                    return False
+            self.held |= groups
+            return True
+    
+    def release(self, lock_groups: List[str]):
+        """Give back locks taken with try_hold()"""
+        with self.lock:
+            self.held -= set(lock_groups)
+        self.dispatch()
+    
+    def operations(self) -> List[Operation]:
+        """Running operations followed by the queue, in order"""
+        with self.lock:
+            return list(self.running.values()) + list(self.queue)
+    
+    def is_idle(self) -> bool:
+        """Check whether nothing is queued or running"""
+        with self.lock:
+            return not self.queue and not self.running
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every operation has finished"""
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.queue and not self.running, timeout)
+    
+    def dispatch(self):
+        """Start every queued operation whose locks are free"""
+        started = []
+        with self.lock:
+            busy = set(self.held)
+            for operation in self.running.values():
+                busy |= operation.lock_groups
+            for operation in list(self.queue):
+                if operation.lock_groups & busy:
+                    # Keep the locks reserved for this operation
+                    busy |= operation.lock_groups
+                    continue
+                busy |= operation.lock_groups
+                self.queue.remove(operation)
+                operation.state = RUNNING
+                self.running[operation.id] = operation
+                started.append(operation)
+        for operation in started:
+            self.notify(operation, RUNNING)
+            threading.Thread(target=self.execute, args=(operation,), daemon=True).start()
+    
+    def execute(self, operation: Operation):
+        """Run an operation in its worker thread"""
+        def output(line: str):
+            if self.on_output is not None:
+                self.on_output(operation, line)
+        
+        try:
+            operation.result = operation.run(output)
+        except Exception as e:
+            operation.result = (-1, "", str(e))
+        state = DONE if operation.returncode() == 0 else FAILED
+        with self.lock:
+            operation.state = state
+            del self.running[operation.id]
+            self.lock.notify_all()
+        self.notify(operation, state)
+        self.dispatch()
+    
+    def notify(self, operation: Operation, state: str):
+        """Report a state change"""
+        if self.on_change is not None:
+            self.on_change(operation, state)
@@ -0,0 +1,254 @@
+"""
+Local package search index
+Full-text index over package names and descriptions, built from each
+backend's repository metadata so searches don't have to run the CLIs.
+"""
+from typing import List, Dict, Optional, Tuple
+import gzip
+import hashlib
+import heapq
+import os
+import tempfile
+import threading
+from .cache import cache_dir
+from .package import Package
+
+# Maximum number of results returned for a query
+MAX_RESULTS = 500
+
+
+class Segment:
+    """Index entries read from one metadata file"""
+    
+    def __init__(self, source: str, stamp: str, entries: List[Tuple[str, str]]):
+        self.source = source
+        self.stamp = stamp
+        self.names = [name for name, _ in entries]
+        self.descriptions = [description for _, description in entries]
+        # Lowercased "name\tdescription" for substring matching
+        self.texts = [f"{name}\t{description}".lower() for name, description in entries]
+        self.lower_names = [name.lower() for name in self.names]
+
+
+def source_stamp(path: str) -> Optional[str]:
+    """Change stamp of a metadata file, None if it is gone"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+class SearchIndex:
+    """
+    Search index split into one segment per metadata file.
+    Segments are stored gzip-compressed under the XDG cache directory and
+    only segments whose source file changed are rebuilt on refresh().
+    A manager's segments are loaded lazily on its first search. Refreshes
+    of the same manager are serialized, e.g. the GUI's IndexWorker and a
+    search loading the index.
+    """
+    
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.path.join(cache_dir(), 'search')
+        # manager name -> {source path -> Segment}
+        self.segments: Dict[str, Dict[str, Segment]] = {}
+        self.lock = threading.Lock()
+        # manager name -> lock held while its segments are refreshed
+        self.refresh_locks: Dict[str, threading.Lock] = {}
+        # Last query and its matches, refined when the user keeps typing
+        self.last_query: Optional[Tuple[str, str]] = None
+        self.last_matches: List[Tuple[str, Segment, List[int]]] = []
+    
+    def covers(self, manager) -> bool:
+        """Check whether a manager's searches can be answered from the index"""
+        return not manager.transport.remote and bool(manager.index_sources())
+    
+    def segment_path(self, manager, source: str) -> str:
+        """On-disk location of the segment for a metadata file"""
+        digest = hashlib.sha1(source.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, manager.name.lower(), f"{digest}.tsv.gz")
+    
+    def read_segment(self, path: str) -> Optional[Segment]:
+        """Load a stored segment"""
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                header = f.readline().rstrip('\n')
+                source, _, stamp = header[1:].rpartition('\t')
+                entries = []
+                for line in f:
+                    name, _, description = line.rstrip('\n').partition('\t')
+                    entries.append((name, description))
+        except (OSError, EOFError, ValueError):
+            return None
+        return Segment(source, stamp, entries)
+    
+    def write_segment(self, path: str, segment: Segment):
+        """Store a segment atomically"""
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Unique per call, so concurrent writers never share a file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(f"#{segment.source}\t{segment.stamp}\n")
+                for name, description in zip(segment.names, segment.descriptions):
+                    f.write(f"{name}\t{description.replace(chr(9), ' ').replace(chr(10), ' ')}\n")
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+    
+    def build_segment(self, manager, source: str, stamp: str) -> Optional[Segment]:
+        """Read a metadata file into a new segment"""
+        try:
+            entries = list(manager.read_index_source(source))
+        except Exception:
+            # Unreadable or half-written metadata, try again next refresh
+            return None
+        return Segment(source, stamp, entries)
+    
+    def refresh(self, manager) -> int:
+        """
+        Bring a manager's segments up to date with its metadata files.
+        Returns the number of segments that had to be rebuilt.
+        """
+        with self.refresh_lock(manager):
+            return self.refresh_segments(manager)
+    
+    def refresh_lock(self, manager) -> threading.Lock:
+        """Lock serializing the refreshes of a manager"""
+        with self.lock:
+            return self.refresh_locks.setdefault(manager.name, threading.Lock())
+    
+    def refresh_segments(self, manager) -> int:
+        """refresh() with the manager's refresh lock held"""
+        current = self.segments.get(manager.name, {})
+        segments = {}
+        rebuilt = 0
+        for source in manager.index_sources():
+            stamp = source_stamp(source)
+            if stamp is None:
+                continue
+            segment = current.get(source)
+            if segment is None or segment.stamp != stamp:
+                path = self.segment_path(manager, source)
+                segment = self.read_segment(path)
+                if segment is None or segment.stamp != stamp or segment.source != source:
+                    segment = self.build_segment(manager, source, stamp)
+                    if segment is None:
+                        continue
+                    self.write_segment(path, segment)
+                    rebuilt += 1
+            segments[source] = segment
+        
+        self.remove_stale_segments(manager, segments)
+        with self.lock:
+            self.segments[manager.name] = segments
+            self.last_query = None
+            self.last_matches = []
+        return rebuilt
+    
+    def remove_stale_segments(self, manager, segments: Dict[str, Segment]):
+        """Delete stored segments whose metadata file has disappeared"""
+        directory = os.path.join(self.directory, manager.name.lower())
+        keep = {os.path.basename(self.segment_path(manager, source)) for source in segments}
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return
+        for name in names:
+            if name not in keep:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+    
+    def ensure_loaded(self, manager):
+        """Load a manager's segments on first use"""
+        if manager.name not in self.segments:
+            with self.refresh_lock(manager):
+                # Another thread may have loaded them while this one waited
+                if manager.name not in self.segments:
+                    self.refresh_segments(manager)
+    
+    def search(self, managers: list, query: str, limit: int = MAX_RESULTS) -> List[Package]:
+        """Ranked search over the indexed managers"""
+        query = query.lower()
+        terms = query.split()
+        if not terms:
+            return []
+        for manager in managers:
+            self.ensure_loaded(manager)
+        
+        key = ','.join(manager.name for manager in managers)
+        with self.lock:
+            if self.last_query and self.last_query[0] == key and query.startswith(self.last_query[1]):
+                # Typing more characters only narrows the previous matches
+                candidates = self.last_matches
+            else:
+                candidates = [
+                    (manager.name, segment, None)
+                    for manager in managers
+                    for segment in self.segments.get(manager.name, {}).values()
+                ]
+            matches = []
+            for manager_name, segment, indices in candidates:
+                texts = segment.texts
+                if indices is None:
+                    indices = range(len(texts))
+                for term in terms:
+                    indices = [i for i in indices if term in texts[i]]
+                if indices:
+                    matches.append((manager_name, segment, indices))
+            self.last_query = (key, query)
+            self.last_matches = matches
+        return self.rank(matches, terms[0], limit)
+    
+    def rank(self, matches: list, term: str, limit: int) -> List[Package]:
+        """
+        Order matches: exact name, name prefix, name substring, description only.
+        Within the name tiers shorter names come first.
+        """
+        exact = []
+        prefix = []
+        contains = []
+        other = []
+        for manager_name, segment, indices in matches:
+            names = segment.lower_names
+            for i in indices:
+                name = names[i]
+                if term not in name:
+                    other.append((manager_name, segment, i))
+                elif name == term:
+                    exact.append((manager_name, segment, i))
+                elif name.startswith(term):
+                    prefix.append((manager_name, segment, i))
+                else:
+                    contains.append((manager_name, segment, i))
+        
+        def by_length(item):
+            name = item[1].names[item[2]]
+            return len(name), name
+        
+        ordered = exact
+        for tier in (prefix, contains):
+            if len(ordered) >= limit:
+                break
+            # Only the best few of a large tier are shown
+            ordered = ordered + heapq.nsmallest(limit - len(ordered), tier, key=by_length)
+        ordered = ordered + other[:max(0, limit - len(ordered))]
+        
+        results = []
+        seen = set()
+        for manager_name, segment, i in ordered:
+            name = segment.names[i]
+            if (manager_name, name) in seen:
+                # The same package is listed for several architectures/components
+                continue
+            seen.add((manager_name, name))
+            results.append(Package(name, manager_name, description=segment.descriptions[i]))
+        return results
@@ -1,102 +1,175 @@
 """
 Snap Package Manager Handler
 """
-from typing import List, Dict, Optional
-import re
+from typing import List, Dict, Optional, Callable
+import os
 from .base import PackageManager
+from .transport import Transport
+from .package import Package
+from . import parsers
+from .snapd_api import SnapdClient, SnapdError, SNAPD_SOCKET
 
 
 class SnapManager(PackageManager):
     """Handler for Snap package manager"""
     
-    def __init__(self):
-        super().__init__()
+    # `snap find`, `snap list` and `snap refresh --list` start with a column header
+    HEADER_LINES = {'search': 1, 'installed': 1, 'upgradable': 1}
+    
+    def __init__(self, transport: Optional[Transport] = None):
+        super().__init__(transport)
         self.name = "Snap"
         self.command = "snap"
+        self.installed_db_paths = ["/var/lib/snapd/state.json"]
+        # Store revisions are not tracked locally, so updates are never cached
+        # snapd runs a separate change per snap, a failure keeps the others
+        self.atomic_transactions = False
+        self.lock_group = "snap"
+        # snapd's REST API answers queries while its socket exists
+        self.api_socket = SNAPD_SOCKET
+        self.snapd: Optional[SnapdClient] = None
         self.available = self.check_availability()
     
     def check_availability(self) -> bool:
         """Check if Snap is installed"""
         return self.is_command_available("snap")
     
-    def update(self) -> tuple[int, str, str]:
+    def update(self, on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Update snap store information"""
-        return self.execute_command(["snap", "refresh", "--list"], use_sudo=False)
+        return self.execute_command(self.update_command(), use_sudo=False, on_output=on_output)
     
-    def upgrade(self, package: Optional[str] = None) -> tuple[int, str, str]:
+    def upgrade(self, package: Optional[str] = None,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Upgrade packages"""
-        if package:
-            return self.execute_command(["snap", "refresh", package], use_sudo=False)
-        else:
-            return self.execute_command(["snap", "refresh"], use_sudo=False)
+        packages = [package] if package else []
+        return self.execute_command(self.upgrade_command(packages), use_sudo=False, on_output=on_output)
     
-    def search(self, query: str) -> List[Dict[str, str]]:
-        """Search for packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["snap", "find", query], use_sudo=False
+    def snapd_client(self) -> Optional[SnapdClient]:
+        """Client of snapd's REST API, None when the CLI has to be used"""
+        if not self.use_local_api or not os.path.exists(self.api_socket):
+            return None
+        if self.snapd is None or self.snapd.path != self.api_socket:
+            self.snapd = SnapdClient(self.api_socket)
+        return self.snapd
+    
+    def snap_package(self, snap: Dict) -> Package:
+        """Package record of a snapd snap object"""
+        return Package(
+            snap.get('name', ''),
+            self.name,
+            version=snap.get('version', ''),
+            description=snap.get('summary', '')
         )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')[1:]  # Skip header
-            for line in lines:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        packages.append({
-                            'name': parts[0],
-                            'version': parts[1],
-                            'description': ' '.join(parts[3:]) if len(parts) > 3 else '',
-                            'manager': 'Snap'
-                        })
-        return packages
-    
-    def install(self, package: str) -> tuple[int, str, str]:
+    
+    def local_search(self, query: str) -> Optional[List[Package]]:
+        """Search the store through snapd, None to fall back to the CLI"""
+        client = self.snapd_client()
+        if client is not None:
+            try:
+                return [self.snap_package(snap) for snap in client.find(query)]
+            except SnapdError:
+                pass
+        return None
+    
+    def search_command(self, query: str) -> List[str]:
+        """Command searching the store"""
+        return ["snap", "find", query]
+    
+    def parse_search(self, stdout: str) -> List[Package]:
+        """Parse the output of `snap find <query>`"""
+        return parsers.snap_search(parsers.after_header(stdout), self.name)
+    
+    def install(self, package: str,
+                on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Install a package"""
-        return self.execute_command(["snap", "install", package], use_sudo=False)
+        return self.execute_command(self.install_command([package]), use_sudo=False, on_output=on_output)
     
-    def remove(self, package: str) -> tuple[int, str, str]:
+    def remove(self, package: str,
+               on_output: Optional[Callable[[str], None]] = None) -> tuple[int, str, str]:
         """Remove a package"""
-        return self.execute_command(["snap", "remove", package], use_sudo=False)
+        return self.execute_command(self.remove_command([package]), use_sudo=False, on_output=on_output)
     
-    def list_installed(self) -> List[Dict[str, str]]:
-        """List all installed packages"""
-        returncode, stdout, stderr = self.execute_command(
-            ["snap", "list"], use_sudo=False
-        )
+    def update_command(self) -> List[str]:
+        """Command refreshing the store information"""
+        return ["snap", "refresh", "--list"]
+    
+    def install_command(self, packages: List[str]) -> List[str]:
+        """Command installing packages in one transaction"""
+        return ["snap", "install", *packages]
+    
+    def remove_command(self, packages: List[str]) -> List[str]:
+        """Command removing packages in one transaction"""
+        return ["snap", "remove", *packages]
+    
+    def upgrade_command(self, packages: List[str]) -> List[str]:
+        """Command upgrading the given packages, or everything if none are given"""
+        if packages:
+            return ["snap", "refresh", *packages]
+        return ["snap", "refresh"]
+    
+    def local_installed(self) -> Optional[List[Package]]:
+        """Installed snaps from snapd, None to fall back to the CLI"""
+        client = self.snapd_client()
+        if client is not None:
+            try:
+                return [self.snap_package(snap) for snap in client.snaps()]
+            except SnapdError:
+                pass
+        return None
+    
+    def installed_command(self) -> List[str]:
+        """Command listing installed snaps"""
+        return ["snap", "list"]
+    
+    def parse_installed(self, stdout: str) -> List[Package]:
+        """Parse the output of `snap list`"""
+        return parsers.snap_installed(parsers.after_header(stdout), self.name)
+    
+    def query_installed(self, names: List[str]) -> Optional[List[Package]]:
+        """List just the given snaps"""
+        client = self.snapd_client()
+        if client is not None:
+            try:
+                return [self.snap_package(snap) for snap in client.snaps(names)]
+            except SnapdError:
+                pass
         
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')[1:]  # Skip header
-            for line in lines:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        packages.append({
-                            'name': parts[0],
-                            'version': parts[1],
-                            'description': parts[2] if len(parts) > 2 else '',
-                            'manager': 'Snap'
-                        })
-        return packages
-    
-    def list_upgradable(self) -> List[Dict[str, str]]:
-        """List packages that can be upgraded"""
         returncode, stdout, stderr = self.execute_command(
-            ["snap", "refresh", "--list"], use_sudo=False
+            ["snap", "list", "--", *names], use_sudo=False
         )
-        
-        packages = []
-        if returncode == 0:
-            lines = stdout.split('\n')[1:]  # Skip header
-            for line in lines:
-                if line.strip():
-                    parts = line.split()
-                    if len(parts) >= 3:
-                        packages.append({
-                            'name': parts[0],
-                            'current_version': parts[1],
-                            'new_version': parts[2],
-                            'manager': 'Snap'
-                        })
-        return packages
+        if returncode != 0:
+            # snap list fails when none of the snaps is installed
+            return [] if "no matching snaps" in stderr else None
+        return self.parse_installed(stdout)
+    
+    def local_upgradable(self) -> Optional[List[Package]]:
+        """Refresh candidates from snapd, None to fall back to the CLI"""
+        client = self.snapd_client()
+        if client is not None:
+            try:
+                candidates = client.refresh_candidates()
+                # Both requests go over the same pooled connection
+                installed = {snap.get('name'): snap.get('version', '') for snap in client.snaps()} \
+                    if candidates else {}
+                return [Package(
+                    snap.get('name', ''),
+                    self.name,
+                    version=installed.get(snap.get('name'), ''),
+                    new_version=snap.get('version', ''),
+                    description=snap.get('summary', '')
+                ) for snap in candidates]
+            except SnapdError:
+                pass
+        return None
+    
+    def fill_upgradable(self, packages: List[Package]) -> List[Package]:
+        """`snap refresh --list` doesn't show the installed versions"""
+        return self.installed_versions(packages)
+    
+    def upgradable_command(self) -> List[str]:
+        """Command listing refresh candidates"""
+        return ["snap", "refresh", "--list"]
+    
+    def parse_upgradable(self, stdout: str) -> List[Package]:
+        """Parse the output of `snap refresh --list`"""
+        return parsers.snap_upgradable(parsers.after_header(stdout), self.name)
@@ -0,0 +1,139 @@
+"""
+snapd REST client
+Talks to snapd's local REST API over its unix socket, so listing, searching
+and refresh candidates come back as structured JSON in one request instead
+of scraping `snap` CLI tables. Connections are HTTP/1.1 keep-alive and are
+kept in a small pool, so repeated queries don't reconnect.
+"""
+from typing import List, Dict, Optional
+from urllib.parse import urlencode
+import http.client
+import json
+import socket
+import threading
+
+SNAPD_SOCKET = "/run/snapd.socket"
+
+
+class SnapdError(Exception):
+    """A request to snapd failed; `kind` is snapd's error kind, if it sent one"""
+    
+    def __init__(self, message: str, kind: str = "", status: int = 0):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket"""
+    
+    def __init__(self, path: str, timeout: float = 10):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+    
+    def connect(self):
+        """Connect to the unix socket instead of a TCP port"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class SnapdClient:
+    """
+    Client of the snapd REST API.
+    Every request borrows a connection from the pool and gives it back
+    afterwards, so concurrent workers each get their own connection while
+    sequential requests reuse one. A connection snapd closed in the meantime
+    is replaced and the request retried once.
+    """
+    
+    def __init__(self, path: str = SNAPD_SOCKET, timeout: float = 10, max_idle: int = 2):
+        self.path = path
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.idle: List[UnixHTTPConnection] = []
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> UnixHTTPConnection:
+        """Take an idle connection or open a new one"""
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return UnixHTTPConnection(self.path, self.timeout)
+    
+    def release(self, connection: UnixHTTPConnection):
+        """Give a connection back to the pool"""
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(connection)
+                return
+        connection.close()
+    
+    def close(self):
+        """Close every pooled connection"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+    
+    def get(self, path: str, query: Optional[Dict[str, str]] = None):
+        """GET an API endpoint and return the `result` of snapd's response"""
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        for attempt in range(2):
+            connection = self.acquire()
+            reused = connection.sock is not None
+            try:
+                connection.request("GET", path, headers={"Accept": "application/json"})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if reused and attempt == 0:
+                    # snapd closed the idle connection, retry on a fresh one
+                    continue
+                raise SnapdError(f"snapd is not reachable: {e}") from e
+            if response.will_close:
+                connection.close()
+            else:
+                self.release(connection)
+            return self.result(response.status, body)
+    
+    @staticmethod
+    def result(status: int, body: bytes):
+        """Unwrap snapd's {"type": ..., "result": ...} envelope"""
+        try:
+            document = json.loads(body)
+        except ValueError as e:
+            raise SnapdError(f"invalid response from snapd: {e}", status=status) from e
+        if not isinstance(document, dict):
+            raise SnapdError("invalid response from snapd", status=status)
+        result = document.get('result')
+        if document.get('type') == 'error' or status >= 400:
+            details = result if isinstance(result, dict) else {}
+            raise SnapdError(details.get('message', f"snapd returned status {status}"),
+                             kind=details.get('kind', ''), status=status)
+        return result
+    
+    def snaps(self, names: Optional[List[str]] = None) -> List[Dict]:
+        """Installed snaps, or just the named ones that are installed"""
+        query = {'snaps': ','.join(names)} if names else None
+        return self.get("/v2/snaps", query) or []
+    
+    def find(self, query: str) -> List[Dict]:
+        """Search the store"""
+        try:
+            return self.get("/v2/find", {'q': query}) or []
+        except SnapdError as e:
+            if e.kind == 'snap-not-found':
+                return []
+            raise
+    
+    def refresh_candidates(self) -> List[Dict]:
+        """Store revisions a refresh would install, one per outdated snap"""
+        return self.get("/v2/find", {'select': 'refresh'}) or []
@@ -0,0 +1,100 @@
+"""
+Streaming command execution
+Runs a command and hands out its output line by line while it runs,
+keeping only a bounded tail of the transcript in memory.
+"""
+from typing import List, Iterator, Optional
+from collections import deque
+import subprocess
+import threading
+
+
+class CommandStream:
+    """
+    Iterate over the output lines of a command as they are produced.
+    stdout and stderr are merged unless merge_stderr is False, in which case
+    only stdout is iterated and `stderr_tail` keeps the end of stderr. After
+    iteration `returncode` is set and `tail` holds the last `tail_lines`
+    lines of output.
+    """
+    
+    def __init__(self, command: List[str], timeout: Optional[float] = 300, tail_lines: int = 200,
+                 merge_stderr: bool = True):
+        self.command = command
+        self.timeout = timeout
+        self.merge_stderr = merge_stderr
+        self.tail = deque(maxlen=tail_lines)
+        self.stderr_tail = deque(maxlen=tail_lines)
+        self.returncode: Optional[int] = None
+        self.timed_out = False
+        self.error = ""
+        self.process = None
+    
+    def __iter__(self) -> Iterator[str]:
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if self.merge_stderr else subprocess.PIPE,
+                stdin=subprocess.DEVNULL,
+                text=True,
+                errors='replace',
+                bufsize=1
+            )
+        except Exception as e:
+            self.returncode = -1
+            self.error = str(e)
+            return
+        
+        # A separate stderr is drained alongside, so a chatty command can't
+        # block on a full pipe while we wait for its stdout
+        reader = None
+        if not self.merge_stderr:
+            reader = threading.Thread(target=self.read_stderr, daemon=True)
+            reader.start()
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self.on_timeout)
+            timer.daemon = True
+            timer.start()
+        try:
+            for line in self.process.stdout:
+                line = line.rstrip('\n')
+                self.tail.append(line)
+                yield line
+            self.returncode = self.process.wait()
+        finally:
+            if timer:
+                timer.cancel()
+            if self.process.poll() is None:
+                # Consumer stopped early - don't leave the process behind
+                self.process.kill()
+                self.process.wait()
+            self.process.stdout.close()
+            if reader:
+                reader.join()
+                self.process.stderr.close()
+        
+        if self.timed_out:
+            self.returncode = -1
+            self.error = "Command timed out"
+    
+    def read_stderr(self):
+        """Keep the last lines of a separate stderr"""
+        for line in self.process.stderr:
+            self.stderr_tail.append(line.rstrip('\n'))
+    
+    def on_timeout(self):
+        """Kill the command once it exceeds its timeout"""
+        if self.process and self.process.poll() is None:
+            self.timed_out = True
+            self.process.kill()
+    
+    def cancel(self):
+        """Terminate the running command"""
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+    
+    def tail_text(self) -> str:
+        """Last lines of output as a single string"""
+        return '\n'.join(self.tail)
@@ -0,0 +1,251 @@
+"""
+Tracing
+Timing spans around backend calls, subprocesses, parsing and rendering,
+so it shows whether time goes to the package manager itself or to our
+parsing and table updates. Finished spans are kept in a bounded buffer for
+the diagnostics dialog and can be exported as Chrome trace JSON (open it in
+chrome://tracing or Perfetto) or written as JSON lines while they finish.
+
+    ORANGE_UPDATE_TRACE=trace.json      write a Chrome trace at exit
+    ORANGE_UPDATE_TRACE_LOG=spans.jsonl append every span as a JSON line
+    ORANGE_UPDATE_NO_TRACE=1            turn tracing off
+"""
+from typing import List, Dict, Optional
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import atexit
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+
+# Span categories
+BACKEND = 'backend'
+COMMAND = 'command'
+PARSE = 'parse'
+RENDER = 'render'
+
+# PackageManager methods wrapped in spans; parse_* and read_*_db count as parsing
+TRACED_METHODS = (
+    'update', 'upgrade', 'search', 'install', 'remove', 'list_installed',
+    'list_upgradable', 'query_installed', 'install_packages', 'remove_packages',
+    'upgrade_packages', 'preview_transaction', 'alist_installed', 'alist_upgradable',
+    'asearch', 'aupgrade',
+)
+
+
+class Span:
+    """A timed section; `breakdown` sums the command and parse time spent inside it"""
+    __slots__ = ('id', 'parent', 'name', 'category', 'backend', 'args', 'thread',
+                 'start', 'end', 'breakdown')
+    
+    def __init__(self, span_id: int, parent: Optional['Span'], name: str, category: str,
+                 backend: str, args: Dict):
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.backend = backend
+        self.args = args
+        self.thread = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = self.start
+        self.breakdown: Dict[str, float] = {}
+    
+    @property
+    def duration(self) -> float:
+        """Length of the span in seconds"""
+        return self.end - self.start
+    
+    def to_dict(self) -> Dict:
+        """Structured log record of a finished span"""
+        return {
+            'name': self.name,
+            'category': self.category,
+            'backend': self.backend,
+            'start': self.start,
+            'duration': self.duration,
+            'thread': self.thread,
+            'parent': self.parent.id if self.parent else None,
+            'args': self.args,
+            'breakdown': self.breakdown,
+        }
+
+
+class Tracer:
+    """
+    Records spans from any thread.
+    Spans nest per thread and per asyncio task, so coroutines interleaving on
+    one event loop keep their own nesting. A span without an explicit backend
+    inherits its parent's, and command and parse time is added to the
+    breakdown of the enclosing backend call.
+    """
+    
+    def __init__(self, enabled: bool = True, max_spans: int = 20000,
+                 log_path: Optional[str] = None):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.log_path = log_path
+        self.epoch = time.perf_counter()
+        self.ids = itertools.count(1)
+        # Innermost open span; context variables are per thread and per task
+        self.current: ContextVar[Optional[Span]] = ContextVar('span', default=None)
+        self.lock = threading.Lock()
+        self.thread_names: Dict[int, str] = {}
+    
+    @contextmanager
+    def span(self, name: str, category: str = BACKEND, backend: str = "", **args):
+        """Time the body of a with block"""
+        if not self.enabled:
+            yield None
+            return
+        parent = self.current.get()
+        span = Span(next(self.ids), parent, name, category,
+                    backend or (parent.backend if parent else ""), args)
+        token = self.current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            self.current.reset(token)
+            self.finish(span)
+    
+    def finish(self, span: Span):
+        """Store a finished span and credit its time to the enclosing backend call"""
+        if span.category in (COMMAND, PARSE):
+            owner = span.parent
+            # A command or parse span this one is nested in, e.g. output parsed while it streams
+            enclosing = None
+            while owner is not None and owner.category != BACKEND:
+                if enclosing is None and owner.category in (COMMAND, PARSE):
+                    enclosing = owner
+                owner = owner.parent
+            if owner is not None:
+                owner.breakdown[span.category] = owner.breakdown.get(span.category, 0.0) + span.duration
+                if enclosing is not None:
+                    # Nested time only counts for the innermost span
+                    owner.breakdown[enclosing.category] = owner.breakdown.get(enclosing.category, 0.0) - span.duration
+        with self.lock:
+            self.spans.append(span)
+            if span.thread not in self.thread_names:
+                self.thread_names[span.thread] = threading.current_thread().name
+            if self.log_path:
+                try:
+                    with open(self.log_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(span.to_dict()) + '\n')
+                except OSError:
+                    pass
+    
+    def clear(self):
+        """Forget the recorded spans"""
+        with self.lock:
+            self.spans.clear()
+    
+    def snapshot(self) -> List[Span]:
+        """The recorded spans, oldest first"""
+        with self.lock:
+            return list(self.spans)
+    
+    def summary(self) -> List[Dict]:
+        """
+        Backend calls and rendering grouped by backend and operation, slowest
+        first, with how much of their time went to commands and parsing.
+        Parse spans inside a backend call only count in its breakdown.
+        """
+        groups: Dict[tuple, Dict] = {}
+        for span in self.snapshot():
+            if span.category in (COMMAND, PARSE) and span.parent is not None:
+                continue
+            key = (span.backend, span.name)
+            group = groups.setdefault(key, {
+                'backend': span.backend, 'operation': span.name, 'category': span.category,
+                'calls': 0, 'total': 0.0, 'max': 0.0, COMMAND: 0.0, PARSE: 0.0,
+            })
+            group['calls'] += 1
+            group['total'] += span.duration
+            group['max'] = max(group['max'], span.duration)
+            for category, seconds in span.breakdown.items():
+                group[category] += seconds
+        return sorted(groups.values(), key=lambda group: group['max'], reverse=True)
+    
+    def chrome_trace(self) -> Dict:
+        """The recorded spans in Chrome's trace event format"""
+        pid = os.getpid()
+        events = []
+        with self.lock:
+            thread_names = dict(self.thread_names)
+        for thread, name in thread_names.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread,
+                           'args': {'name': name}})
+        for span in self.snapshot():
+            args = dict(span.args)
+            if span.backend:
+                args['backend'] = span.backend
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round((span.start - self.epoch) * 1e6, 1),
+                'dur': round(span.duration * 1e6, 1),
+                'pid': pid,
+                'tid': span.thread,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    
+    def export_chrome(self, path: str):
+        """Write the recorded spans as a Chrome trace file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def traced(method, category: str):
+    """Wrap a PackageManager method (or coroutine method) in a span named after it"""
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def coroutine_wrapper(self, *args, **kwargs):
+            with tracer.span(method.__name__, category, backend=self.name):
+                return await method(self, *args, **kwargs)
+        coroutine_wrapper.__traced__ = True
+        return coroutine_wrapper
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with tracer.span(method.__name__, category, backend=self.name):
+            return method(self, *args, **kwargs)
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def instrument(cls):
+    """Wrap the listing, search, operation and parse_* methods a class defines"""
+    for name, attribute in list(vars(cls).items()):
+        if not callable(attribute) or getattr(attribute, '__traced__', False):
+            continue
+        if getattr(attribute, '__isabstractmethod__', False):
+            continue
+        if name.startswith('parse_') or name in ('read_installed_db', 'read_dependency_db'):
+            setattr(cls, name, traced(attribute, PARSE))
+        elif name in TRACED_METHODS:
+            setattr(cls, name, traced(attribute, BACKEND))
+    return cls
+
+
+def write_trace_at_exit(path: str):
+    """Export the Chrome trace when the process exits"""
+    def write():
+        try:
+            tracer.export_chrome(path)
+        except OSError:
+            pass
+    atexit.register(write)
+
+
+tracer = Tracer(enabled=not os.environ.get('ORANGE_UPDATE_NO_TRACE'),
+                log_path=os.environ.get('ORANGE_UPDATE_TRACE_LOG'))
+if os.environ.get('ORANGE_UPDATE_TRACE'):
+    write_trace_at_exit(os.environ['ORANGE_UPDATE_TRACE'])
@@ -0,0 +1,347 @@
+"""
+Command transports
+Where a package manager's commands run: on this machine, on another host
+over SSH, or on a scripted fake host for tests. A manager given a remote
+transport skips its local fast paths (native databases, snapd/libflatpak)
+and runs everything through the package manager CLIs on that host.
+"""
+from typing import List, Dict, Optional, Set, Iterator, Callable, Union
+from collections import deque
+import os
+import shlex
+import shutil
+import subprocess
+import threading
+import time
+from .cache import cache_dir
+from .streaming import CommandStream
+from .tracing import tracer, COMMAND
+# asyncio is imported by the arun() implementations, so run() and stream()
+# callers never load it
+
+# Longest output line asyncio subprocesses accept (dnf's changelogs can be long)
+ASYNC_LINE_LIMIT = 1024 * 1024
+# Seconds an idle multiplexed SSH connection is kept open
+SSH_CONTROL_PERSIST = 600
+SSH_CONNECT_TIMEOUT = 10
+# ssh's exit status when the connection itself failed
+SSH_CONNECTION_FAILED = 255
+
+
+class TransportError(Exception):
+    """The host couldn't be reached"""
+    pass
+
+
+class Transport:
+    """Runs commands for a package manager"""
+    
+    # Shown in results and logs
+    name = "localhost"
+    # Remote hosts have no local databases or sockets to read
+    remote = False
+    
+    def escalate(self, command: List[str]) -> List[str]:
+        """Command run with root rights"""
+        raise NotImplementedError
+    
+    def run(self, command: List[str], timeout: Optional[float] = 300) -> tuple[int, str, str]:
+        """Run a command to completion, returns (returncode, stdout, stderr)"""
+        raise NotImplementedError
+    
+    def stream(self, command: List[str], timeout: Optional[float] = 300, merge_stderr: bool = True):
+        """
+        Run a command whose output is iterated line by line, with stderr
+        merged unless merge_stderr is False; the result has CommandStream's
+        returncode, error, stderr_tail and tail_text()
+        """
+        raise NotImplementedError
+    
+    async def arun(self, command: List[str], timeout: Optional[float] = 300,
+                   on_output: Optional[Callable[[str], None]] = None,
+                   merge_stderr: bool = True) -> tuple[int, str, str]:
+        """
+        run() as a coroutine. With on_output, the output is passed on line by
+        line and only its tail is returned; stderr is merged into it unless
+        merge_stderr is False, then it is returned whole.
+        Raises asyncio.TimeoutError after `timeout` seconds.
+        """
+        raise NotImplementedError
+    
+    def which(self, commands: List[str]) -> Set[str]:
+        """The commands found on the host's PATH"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Release connections"""
+        pass
+
+
+class LocalTransport(Transport):
+    """Commands run here, as subprocesses"""
+    
+    def argv(self, command: List[str]) -> List[str]:
+        """Local argv that runs a command on the host"""
+        return command
+    
+    def escalate(self, command: List[str]) -> List[str]:
+        """Use pkexec for GUI authentication"""
+        return ['pkexec'] + command
+    
+    def run(self, command: List[str], timeout: Optional[float] = 300) -> tuple[int, str, str]:
+        """Run a command to completion, returns (returncode, stdout, stderr)"""
+        label = ' '.join(command[:3])
+        with tracer.span('spawn', COMMAND, command=label, host=self.name):
+            process = subprocess.Popen(
+                self.argv(command),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+        with tracer.span('wait', COMMAND, command=label, host=self.name):
+            try:
+                stdout, stderr = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+        return process.returncode, stdout, stderr
+    
+    def stream(self, command: List[str], timeout: Optional[float] = 300,
+               merge_stderr: bool = True) -> CommandStream:
+        """Run a command whose output is iterated line by line"""
+        return CommandStream(self.argv(command), timeout=timeout, merge_stderr=merge_stderr)
+    
+    async def arun(self, command: List[str], timeout: Optional[float] = 300,
+                   on_output: Optional[Callable[[str], None]] = None,
+                   merge_stderr: bool = True) -> tuple[int, str, str]:
+        """run() as an asyncio subprocess; the command is killed on timeout or cancellation"""
+        import asyncio
+        with tracer.span('spawn', COMMAND, command=' '.join(command[:3]), host=self.name):
+            process = await asyncio.create_subprocess_exec(
+                *self.argv(command),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if on_output and merge_stderr else subprocess.PIPE,
+                limit=ASYNC_LINE_LIMIT
+            )
+        try:
+            if on_output is None:
+                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+                return process.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+            tail = deque(maxlen=200)
+            
+            async def forward() -> int:
+                async for line in process.stdout:
+                    line = line.decode(errors='replace').rstrip('\n')
+                    tail.append(line)
+                    on_output(line)
+                return await process.wait()
+            
+            if not merge_stderr:
+                # Read alongside stdout, so a full stderr pipe can't stall the command
+                returncode, stderr = await asyncio.wait_for(
+                    asyncio.gather(forward(), process.stderr.read()), timeout
+                )
+                return returncode, '\n'.join(tail), stderr.decode(errors='replace')
+            returncode = await asyncio.wait_for(forward(), timeout)
+            output = '\n'.join(tail)
+            # stdout and stderr are merged, so the tail is the best error report
+            return returncode, output, "" if returncode == 0 else output
+        finally:
+            if process.returncode is None:
+                # Timed out or cancelled; the event loop reaps it
+                process.kill()
+    
+    def which(self, commands: List[str]) -> Set[str]:
+        """The commands found on PATH"""
+        return {command for command in commands if shutil.which(command) is not None}
+
+
+class SshStream(CommandStream):
+    """CommandStream of a command on a host; iterating it raises TransportError if ssh lost the host"""
+    
+    def __init__(self, host: str, command: List[str], timeout: Optional[float] = 300,
+                 merge_stderr: bool = True):
+        super().__init__(command, timeout=timeout, merge_stderr=merge_stderr)
+        self.host = host
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from super().__iter__()
+        if self.returncode == SSH_CONNECTION_FAILED:
+            # ssh's own message is the last thing it wrote to stderr
+            errors = self.tail if self.merge_stderr else self.stderr_tail
+            message = errors[-1].strip() if errors else ""
+            raise TransportError(f"{self.host}: {message or 'ssh connection failed'}")
+
+
+class SshTransport(LocalTransport):
+    """
+    Commands run on another host through the local ssh client. Connections
+    are multiplexed (ControlMaster), so after the first command each one
+    costs a round trip instead of a handshake. Authentication has to work
+    without prompting (keys or an agent), and root commands use `sudo -n`.
+    """
+    remote = True
+    
+    def __init__(self, host: str, options: Optional[List[str]] = None,
+                 control_persist: int = SSH_CONTROL_PERSIST):
+        # Anything ssh accepts: an alias from ~/.ssh/config, user@host, ...
+        self.name = host
+        self.host = host
+        self.options = list(options or [])
+        self.control_persist = control_persist
+        directory = os.path.join(cache_dir(), 'ssh')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # %C is a hash of the connection, short enough for a socket path
+        self.control_path = os.path.join(directory, '%C')
+    
+    def ssh_options(self) -> List[str]:
+        """Options of every ssh invocation"""
+        return [
+            '-o', 'BatchMode=yes',
+            '-o', f'ConnectTimeout={SSH_CONNECT_TIMEOUT}',
+            '-o', 'ControlMaster=auto',
+            '-o', f'ControlPath={self.control_path}',
+            '-o', f'ControlPersist={self.control_persist}',
+            *self.options,
+        ]
+    
+    def argv(self, command: List[str]) -> List[str]:
+        """ssh invocation running a command on the host; -n keeps our stdin out of it"""
+        return ['ssh', '-n', *self.ssh_options(), self.host, '--', shlex.join(command)]
+    
+    def escalate(self, command: List[str]) -> List[str]:
+        """sudo without a password prompt, which nobody could answer"""
+        return ['sudo', '-n'] + command
+    
+    def run(self, command: List[str], timeout: Optional[float] = 300) -> tuple[int, str, str]:
+        """Run a command on the host; raises TransportError if the host can't be reached"""
+        returncode, stdout, stderr = super().run(command, timeout)
+        if returncode == SSH_CONNECTION_FAILED:
+            raise TransportError(f"{self.host}: {stderr.strip() or 'ssh connection failed'}")
+        return returncode, stdout, stderr
+    
+    def stream(self, command: List[str], timeout: Optional[float] = 300,
+               merge_stderr: bool = True) -> SshStream:
+        """stream() on the host; iterating raises TransportError if the host can't be reached"""
+        return SshStream(self.host, self.argv(command), timeout=timeout, merge_stderr=merge_stderr)
+    
+    async def arun(self, command: List[str], timeout: Optional[float] = 300,
+                   on_output: Optional[Callable[[str], None]] = None,
+                   merge_stderr: bool = True) -> tuple[int, str, str]:
+        """arun() on the host; raises TransportError if the host can't be reached"""
+        returncode, stdout, stderr = await super().arun(command, timeout, on_output, merge_stderr)
+        if returncode == SSH_CONNECTION_FAILED:
+            raise TransportError(f"{self.host}: {stderr.strip() or 'ssh connection failed'}")
+        return returncode, stdout, stderr
+    
+    def which(self, commands: List[str]) -> Set[str]:
+        """The commands found on the host's PATH, in one round trip"""
+        script = ' '.join(f"command -v {shlex.quote(command)} >/dev/null && echo {shlex.quote(command)};"
+                          for command in commands)
+        returncode, stdout, stderr = self.run(['sh', '-c', script + ' true'])
+        return set(stdout.split()) & set(commands)
+    
+    def close(self):
+        """Stop the shared master connection"""
+        subprocess.run(['ssh', *self.ssh_options(), '-O', 'exit', self.host],
+                       stdin=subprocess.DEVNULL, capture_output=True)
+
+
+class FakeStream:
+    """CommandStream look-alike replaying a fake host's output"""
+    
+    def __init__(self, returncode: int, output: str, error: str = ""):
+        self.lines = output.splitlines()
+        self.tail = deque(self.lines, maxlen=200)
+        self.stderr_tail = deque(error.splitlines(), maxlen=200)
+        self.returncode: Optional[int] = None
+        self.result = returncode
+        self.error = error
+    
+    def __iter__(self) -> Iterator[str]:
+        yield from self.lines
+        self.returncode = self.result
+    
+    def cancel(self):
+        """Nothing is running"""
+        pass
+    
+    def tail_text(self) -> str:
+        """Last lines of output as a single string"""
+        return '\n'.join(self.tail)
+
+
+# What a fake host answers: (returncode, stdout, stderr) or a callable producing it
+FakeResponse = Union[tuple, Callable[[List[str]], tuple]]
+
+
+class FakeHostTransport(Transport):
+    """
+    Scripted host for tests. `responses` maps a command prefix ("apt list")
+    to its result, the longest matching prefix wins; `delay` simulates the
+    latency of a remote host. Commands run are recorded in `calls`.
+    """
+    remote = True
+    
+    def __init__(self, name: str, responses: Optional[Dict[str, FakeResponse]] = None,
+                 commands: Optional[List[str]] = None, delay: float = 0.0, reachable: bool = True):
+        self.name = name
+        self.responses = dict(responses or {})
+        self.commands = set(commands or [])
+        self.delay = delay
+        self.reachable = reachable
+        self.calls: List[List[str]] = []
+        self.lock = threading.Lock()
+    
+    def escalate(self, command: List[str]) -> List[str]:
+        """Root commands are recorded with sudo in front"""
+        return ['sudo'] + command
+    
+    def respond(self, command: List[str], sleep: bool = True) -> tuple[int, str, str]:
+        """Scripted result of a command"""
+        with self.lock:
+            self.calls.append(list(command))
+        if self.delay and sleep:
+            time.sleep(self.delay)
+        if not self.reachable:
+            raise TransportError(f"{self.name}: host unreachable")
+        line = ' '.join(command)
+        matches = [prefix for prefix in self.responses if line == prefix or line.startswith(prefix + ' ')]
+        if not matches:
+            return 127, "", f"{command[0]}: command not found"
+        response = self.responses[max(matches, key=len)]
+        return response(command) if callable(response) else response
+    
+    def run(self, command: List[str], timeout: Optional[float] = 300) -> tuple[int, str, str]:
+        """Run a command to completion, returns (returncode, stdout, stderr)"""
+        return self.respond(command)
+    
+    def stream(self, command: List[str], timeout: Optional[float] = 300,
+               merge_stderr: bool = True) -> FakeStream:
+        """Replay a command's output line by line"""
+        returncode, stdout, stderr = self.respond(command)
+        return FakeStream(returncode, stdout + stderr if merge_stderr else stdout, stderr)
+    
+    async def arun(self, command: List[str], timeout: Optional[float] = 300,
+                   on_output: Optional[Callable[[str], None]] = None,
+                   merge_stderr: bool = True) -> tuple[int, str, str]:
+        """Scripted result after the simulated latency, without blocking the event loop"""
+        import asyncio
+        await asyncio.wait_for(asyncio.sleep(self.delay), timeout)
+        returncode, stdout, stderr = self.respond(command, sleep=False)
+        if on_output is not None:
+            for line in (stdout + stderr if merge_stderr else stdout).splitlines():
+                on_output(line)
+        return returncode, stdout, stderr
+    
+    def which(self, commands: List[str]) -> Set[str]:
+        """The commands the fake host pretends to have"""
+        if not self.reachable:
+            raise TransportError(f"{self.name}: host unreachable")
+        return self.commands & set(commands)
+
+
+# Transport of managers created without one
+LOCAL = LocalTransport()
@@ -0,0 +1,256 @@
+"""
+Background update checker
+Periodically refreshes the repository metadata of every backend and
+precomputes list_upgradable() into the inventory cache, so the update list
+is fresh and instant when it is opened. Checks are spread out with jitter,
+back off after failures and wait while the connection is metered or the
+machine is busy. Time comes from an injectable clock, so the schedule can
+be driven step by step.
+"""
+from typing import List, Dict, Optional, Callable
+import glob
+import json
+import os
+import random
+import subprocess
+import time
+from .base import PackageManager
+from .cache import InventoryCache, cache_dir
+from .package import Package
+
+CHECKED = 'checked'
+DEFERRED = 'deferred'
+FAILED = 'failed'
+
+# NetworkManager's NMMetered values for "yes" and "guess yes"
+NM_METERED = (1, 3)
+
+
+def can_escalate() -> bool:
+    """Check whether root commands can run without an authentication prompt"""
+    if os.geteuid() == 0:
+        return True
+    helper = PackageManager.privileged_helper
+    return helper is not None and helper.connected
+
+
+class SystemConditions:
+    """
+    Local signals deciding whether a background check may run now: a
+    metered connection (as NetworkManager reports it), running on battery
+    or a busy machine defer checks.
+    """
+    
+    def __init__(self, allow_metered: bool = False, allow_battery: bool = True,
+                 max_load: Optional[float] = None):
+        self.allow_metered = allow_metered
+        self.allow_battery = allow_battery
+        # Load average above which the machine doesn't count as idle
+        self.max_load = max_load if max_load is not None else float(os.cpu_count() or 1)
+    
+    def metered(self) -> bool:
+        """Check whether NetworkManager considers the connection metered"""
+        try:
+            result = subprocess.run(
+                ["busctl", "get-property", "org.freedesktop.NetworkManager",
+                 "/org/freedesktop/NetworkManager", "org.freedesktop.NetworkManager", "Metered"],
+                capture_output=True, text=True, timeout=2
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        # Output looks like "u 4"
+        parts = result.stdout.split()
+        return result.returncode == 0 and len(parts) == 2 and parts[1].isdigit() \
+            and int(parts[1]) in NM_METERED
+    
+    def on_battery(self) -> bool:
+        """Check whether the machine runs on battery (no mains supply online)"""
+        mains = []
+        for supply in glob.glob("/sys/class/power_supply/*"):
+            try:
+                with open(os.path.join(supply, 'type'), 'r') as f:
+                    if f.read().strip() != 'Mains':
+                        continue
+                with open(os.path.join(supply, 'online'), 'r') as f:
+                    mains.append(f.read().strip() == '1')
+            except OSError:
+                continue
+        # Desktops without a power supply entry are on mains
+        return bool(mains) and not any(mains)
+    
+    def busy(self) -> bool:
+        """Check whether the load average is above max_load"""
+        try:
+            return os.getloadavg()[0] > self.max_load
+        except OSError:
+            return False
+    
+    def blocker(self) -> Optional[str]:
+        """Reason to hold off background checks right now, None if they may run"""
+        if not self.allow_metered and self.metered():
+            return "metered connection"
+        if not self.allow_battery and self.on_battery():
+            return "on battery"
+        if self.busy():
+            return "system busy"
+        return None
+
+
+class CheckResult:
+    """Outcome of a background check of one manager"""
+    
+    def __init__(self, manager, status: str, packages: Optional[List[Package]] = None,
+                 new: Optional[List[str]] = None, error: str = ""):
+        self.manager = manager
+        self.status = status
+        # Upgradable packages, and the names that weren't upgradable before
+        self.packages = packages or []
+        self.new = new or []
+        self.error = error
+
+
+class UpdateChecker:
+    """
+    Schedules background update checks per manager.
+    A check refreshes the metadata (when the backend allows it and no
+    authentication prompt is needed) and recomputes the upgradable list
+    through the inventory cache. After a success the next check is
+    `interval` away, after a failure `retry` doubling up to `max_backoff`;
+    every delay gets +-`jitter` of random spread so machines don't hit the
+    mirrors in lockstep. The schedule survives restarts in a state file.
+
+    `locks` is the OperationScheduler whose lock groups checks have to
+    respect; a manager that is busy with user operations is deferred.
+    """
+    
+    def __init__(self, managers: List, cache: Optional[InventoryCache] = None,
+                 interval: float = 6 * 3600, retry: float = 15 * 60,
+                 max_backoff: float = 24 * 3600, jitter: float = 0.1,
+                 first_delay: float = 120, defer_delay: float = 15 * 60,
+                 clock: Callable[[], float] = time.time, rng: Optional[random.Random] = None,
+                 conditions: Optional[SystemConditions] = None, locks=None,
+                 escalate: Callable[[], bool] = can_escalate, state_path: Optional[str] = None):
+        self.managers = list(managers)
+        self.cache = cache or InventoryCache()
+        self.interval = interval
+        self.retry = retry
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.first_delay = first_delay
+        self.defer_delay = defer_delay
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.conditions = conditions or SystemConditions()
+        self.locks = locks
+        self.escalate = escalate
+        self.state_path = state_path or os.path.join(cache_dir(), 'update-checker.json')
+        # Per manager: next_check, last_check, failures, known (upgradable names)
+        self.state: Dict[str, Dict] = {}
+        self.load()
+    
+    def load(self):
+        """Read the schedule of an earlier session"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        now = self.clock()
+        for manager in self.managers:
+            entry = state.get(manager.name) if isinstance(state, dict) else None
+            if not isinstance(entry, dict) or 'next_check' not in entry:
+                entry = {'failures': 0, 'known': []}
+            # Never check right at startup, even when a check is overdue
+            entry['next_check'] = max(entry.get('next_check', 0), now + self.spread(self.first_delay))
+            self.state[manager.name] = entry
+    
+    def save(self):
+        """Persist the schedule"""
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            pass
+    
+    def spread(self, delay: float) -> float:
+        """Apply the random jitter to a delay"""
+        return delay * (1 + self.rng.uniform(-self.jitter, self.jitter))
+    
+    def seconds_until_next(self) -> float:
+        """Time until the next check is due"""
+        if not self.state:
+            return self.interval
+        return max(0.0, min(entry['next_check'] for entry in self.state.values()) - self.clock())
+    
+    def due(self) -> List:
+        """Managers whose check is due"""
+        now = self.clock()
+        return [manager for manager in self.managers if self.state[manager.name]['next_check'] <= now]
+    
+    def tick(self) -> List[CheckResult]:
+        """Run every due check and reschedule it"""
+        due = self.due()
+        if not due:
+            return []
+        blocker = self.conditions.blocker()
+        results = []
+        for manager in due:
+            if blocker:
+                result = CheckResult(manager, DEFERRED, error=blocker)
+            else:
+                result = self.check(manager)
+            self.reschedule(result)
+            results.append(result)
+        self.save()
+        return results
+    
+    def check(self, manager) -> CheckResult:
+        """Refresh one manager's metadata and upgradable list now"""
+        lock_groups = manager.lock_groups()
+        if self.locks is not None and not self.locks.try_hold(lock_groups):
+            return CheckResult(manager, DEFERRED, error="operations running")
+        try:
+            if self.may_refresh(manager):
+                returncode, stdout, stderr = manager.update()
+                if returncode != 0:
+                    return CheckResult(manager, FAILED, error=(stderr or stdout)[-500:])
+            # Unchanged databases are answered from the cache
+            packages = self.cache.list_upgradable(manager)
+        except Exception as e:
+            return CheckResult(manager, FAILED, error=str(e))
+        finally:
+            if self.locks is not None:
+                self.locks.release(lock_groups)
+        known = set(self.state[manager.name].get('known', []))
+        new = [package.name for package in packages if package.name not in known]
+        return CheckResult(manager, CHECKED, packages, new)
+    
+    def may_refresh(self, manager) -> bool:
+        """Check whether the metadata of a manager may be refreshed unattended"""
+        if not manager.background_refresh:
+            return False
+        try:
+            command = manager.update_command()
+        except NotImplementedError:
+            return False
+        # Without the helper a root command would pop up an authentication dialog
+        return not manager.needs_root(command) or self.escalate()
+    
+    def reschedule(self, result: CheckResult):
+        """Work out when a manager is checked next"""
+        entry = self.state[result.manager.name]
+        now = self.clock()
+        if result.status == CHECKED:
+            entry['failures'] = 0
+            entry['last_check'] = now
+            entry['known'] = sorted({package.name for package in result.packages})
+            delay = self.interval
+        elif result.status == FAILED:
+            entry['failures'] = entry.get('failures', 0) + 1
+            delay = min(self.retry * 2 ** (entry['failures'] - 1), self.max_backoff)
+        else:
+            delay = self.defer_delay
+        entry['next_check'] = now + self.spread(delay)
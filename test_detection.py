@@ -48,6 +48,413 @@ if not managers:
     print("  - Flatpak (flatpak)")
     print("  - Snap (snap)")
 
+# Native database readers against the bundled fixture databases
+print("=" * 60)
+print("Native database readers (fixtures)")
+print("=" * 60)
+
+from package_managers.apt_manager import AptManager
+from package_managers.dnf_manager import DnfManager
+from package_managers.pacman_manager import PacmanManager
+
+fixtures = os.path.join(os.path.dirname(__file__), 'fixtures', 'native_db')
+native_checks = [
+    (AptManager, os.path.join(fixtures, 'dpkg', 'status'), 5),
+    (DnfManager, os.path.join(fixtures, 'rpm', 'rpmdb.sqlite'), 3),
+    (PacmanManager, os.path.join(fixtures, 'pacman', 'local'), 3),
+]
+for manager_class, db_path, expected in native_checks:
+    manager = manager_class()
+    manager.native_db_path = db_path
+    packages = manager.read_installed_db() or []
+    status = "✅" if len(packages) == expected else "❌"
+    print(f"  {status} {manager.name}: {len(packages)} packages (expected {expected})")
+    for pkg in packages:
+        print(f"      {pkg['name']} {pkg['version']}")
+print()
+
+# Dependency graph from the fixture databases
+print("=" * 60)
+print("Dependency graph (fixtures)")
+print("=" * 60)
+
+from package_managers.depgraph import DependencyGraph
+
+apt = AptManager()
+apt.native_db_path = os.path.join(fixtures, 'dpkg', 'status')
+apt.extended_states_path = os.path.join(fixtures, 'apt', 'extended_states')
+dnf = DnfManager()
+dnf.native_db_path = os.path.join(fixtures, 'rpm', 'rpmdb.sqlite')
+dnf.history_db_path = dnf.dnf5_state_path = os.path.join(fixtures, 'missing')
+pacman = PacmanManager()
+pacman.native_db_path = os.path.join(fixtures, 'pacman', 'local')
+
+graph_checks = [
+    (apt, 'libc6:amd64', ['passwd', 'vim-tiny'], ['adduser', 'passwd', 'vim-tiny'], ['adduser', 'passwd']),
+    # Unknown install reasons never make orphans; vim-enhanced needs /usr/bin/bash
+    (dnf, 'bash', ['vim-enhanced'], ['vim-enhanced'], []),
+    (pacman, 'glibc', ['bash'], ['bash'], ['bash', 'glibc']),
+]
+for manager, name, required_by, breaks, orphans in graph_checks:
+    graph = DependencyGraph(manager.name)
+    graph.sync(manager.read_dependency_db() or [])
+    found = (graph.required_by(name), graph.breaks([name]), [pkg.name for pkg in graph.orphans()])
+    status = "✅" if found == (required_by, breaks, orphans) else "❌"
+    print(f"  {status} {manager.name}: {name} required by {found[0]}, removing it breaks {found[1]}, orphans {found[2]}")
+
+# Incremental sync: drop vim-tiny, only it changes and libc6 loses a dependent
+graph = DependencyGraph(apt.name)
+records = apt.read_dependency_db()
+graph.sync(records)
+changed = graph.sync([record for record in records if record.name != 'vim-tiny'])
+orphans = [pkg.name for pkg in graph.orphans()]
+status = "✅" if changed == 1 and graph.required_by('libc6:amd64') == ['passwd'] and 'libc6:amd64' in orphans else "❌"
+print(f"  {status} APT sync after removing vim-tiny: {changed} changed, orphans {orphans}")
+print()
+
+# snapd REST client against a fake snapd on a temporary unix socket
+print("=" * 60)
+print("snapd REST API (fake snapd socket)")
+print("=" * 60)
+
+import json
+import socketserver
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from package_managers.snap_manager import SnapManager
+
+FAKE_SNAPS = [
+    {'name': 'core22', 'version': '20240111', 'summary': 'Runtime environment based on Ubuntu 22.04'},
+    {'name': 'firefox', 'version': '122.0-2', 'summary': 'Mozilla Firefox web browser'},
+]
+FAKE_REFRESH = [{'name': 'firefox', 'version': '123.0-1', 'summary': 'Mozilla Firefox web browser'}]
+fake_connections = []
+
+
+class FakeSnapdHandler(BaseHTTPRequestHandler):
+    """Answers the snapd endpoints the backend uses"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        fake_connections.append(self.request)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        status, result = 200, []
+        if url.path == '/v2/snaps':
+            wanted = query['snaps'][0].split(',') if 'snaps' in query else None
+            result = [snap for snap in FAKE_SNAPS if wanted is None or snap['name'] in wanted]
+        elif url.path == '/v2/find' and query.get('select') == ['refresh']:
+            result = FAKE_REFRESH
+        elif url.path == '/v2/find':
+            result = [snap for snap in FAKE_SNAPS if query['q'][0] in snap['name']]
+            if not result:
+                status = 404
+                result = {'message': 'no snap found', 'kind': 'snap-not-found'}
+        body = json.dumps({'type': 'error' if status >= 400 else 'sync',
+                           'status-code': status, 'result': result}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSnapd(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+socket_path = os.path.join(tempfile.mkdtemp(), 'snapd.socket')
+server = FakeSnapd(socket_path, FakeSnapdHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+
+snap = SnapManager()
+snap.api_socket = socket_path
+snap_checks = [
+    ("installed", [p.name for p in snap.list_installed()], ['core22', 'firefox']),
+    ("query", [p.name for p in snap.query_installed(['firefox', 'hello'])], ['firefox']),
+    ("search", [p.name for p in snap.search('fire')], ['firefox']),
+    ("search without results", [p.name for p in snap.search('nothing')], []),
+    ("upgradable", [(p.name, p.version, p.new_version) for p in snap.list_upgradable()],
+     [('firefox', '122.0-2', '123.0-1')]),
+    ("connections opened", len(fake_connections), 1),
+]
+for label, got, expected in snap_checks:
+    status = "✅" if got == expected else "❌"
+    print(f"  {status} {label}: {got}")
+server.shutdown()
+server.server_close()
+print()
+
+# Fleet mode against scripted hosts
+print("=" * 60)
+print("Fleet (fake hosts)")
+print("=" * 60)
+
+import asyncio
+import time
+from package_managers.fleet import Fleet
+from package_managers.transport import FakeHostTransport
+
+APT_UPGRADABLE = {
+    'curl': "curl/jammy-updates 7.81.0-1ubuntu1.16 amd64 [upgradable from: 7.81.0-1ubuntu1.15]",
+    'vim': "vim/jammy-updates 2:8.2.3995-1ubuntu2.16 amd64 [upgradable from: 2:8.2.3995-1ubuntu2.15]",
+}
+active = [0, 0]
+active_lock = threading.Lock()
+
+
+def apt_list(names):
+    """`apt list --upgradable` of a host with updates for the given packages, counting overlapping calls"""
+    def respond(command):
+        with active_lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.05)
+        with active_lock:
+            active[0] -= 1
+        return 0, "Listing...\n" + "\n".join(APT_UPGRADABLE[name] for name in names) + "\n", ""
+    return respond
+
+
+hosts = [FakeHostTransport(f"web{number}", {'apt list --upgradable': apt_list(['curl', 'vim'])}, ['apt'])
+         for number in range(1, 5)]
+hosts.append(FakeHostTransport("db1", {'apt list --upgradable': apt_list(['curl'])}, ['apt']))
+hosts.append(FakeHostTransport("gone", reachable=False))
+fleet = Fleet(hosts, concurrency=2)
+reported = []
+view = asyncio.run(fleet.upgradable(lambda result: reported.append(result.host)))
+rows = [(update.name, len(update.hosts)) for update in view.rows()]
+fleet_checks = [
+    ("every host reported", sorted(reported), sorted(host.name for host in hosts)),
+    ("updates by host count", rows, [('curl', 5), ('vim', 4)]),
+    ("failed hosts", view.failed_hosts(), ['gone']),
+    ("most hosts at a time (limit 2)", active[1], 2),
+    ("nothing run with sudo", any(call[0] == 'sudo' for host in hosts for call in host.calls), False),
+]
+for label, got, expected in fleet_checks:
+    status = "✅" if got == expected else "❌"
+    print(f"  {status} {label}: {got}")
+print()
+
+# Privileged helper protocol against an unprivileged stand-in
+print("=" * 60)
+print("Privileged helper requests (stand-in)")
+print("=" * 60)
+
+from package_managers.privileged_helper import HelperServer, HelperClient
+
+helper_path = os.path.join(tempfile.mkdtemp(), 'helper.sock')
+helper_server = HelperServer(helper_path, idle_timeout=5)
+helper_server.serve_in_thread()
+helper = HelperClient(helper_path, escalate=False)
+helper.connect()
+shared_dir = tempfile.mkdtemp()
+os.chmod(shared_dir, 0o755)
+try:
+    HelperServer(os.path.join(shared_dir, 'helper.sock')).bind()
+    shared_dir_refused = False
+except PermissionError:
+    shared_dir_refused = True
+helper_checks = [
+    ("ping", helper.ping(), True),
+    ("apt option as a package", helper.run('apt', 'install', ['-o', 'APT::Update::Pre-Invoke::=id'])[2],
+     "Invalid package name"),
+    ("package file", helper.run('apt', 'install', ['./evil.deb'])[2], "Invalid package name"),
+    ("other binary", helper.run('dpkg', 'install', ['hello'])[2], "Unknown package manager: dpkg"),
+    ("raw command line", helper.send({'command': ['sh', '-c', 'id']}).wait()[2], "Unknown operation: None"),
+    ("built by the backend", helper_server.build_command({'op': 'install', 'manager': 'apt', 'packages': ['hello']}),
+     AptManager().install_command(['hello'])),
+    ("shared socket directory refused", shared_dir_refused, True),
+    ("one queue per lock group", (helper_server.queue_for({'manager': 'apt'}) is helper_server.queue_for(
+        {'manager': 'apt', 'op': 'remove'}), helper_server.queue_for({'manager': 'apt'}) is helper_server.queue_for(
+        {'manager': 'pacman'})), (True, False)),
+]
+helper.close()
+for label, got, expected in helper_checks:
+    status = "✅" if got == expected else "❌"
+    print(f"  {status} {label}: {got}")
+print()
+
+# Background update checks driven by a fake clock
+print("=" * 60)
+print("Update checker schedule (fake clock)")
+print("=" * 60)
+
+import random
+from package_managers.base import PackageManager
+from package_managers.cache import InventoryCache
+from package_managers.package import Package
+from package_managers.update_checker import UpdateChecker, SystemConditions, CHECKED, DEFERRED, FAILED
+
+
+class ScriptedManager(PackageManager):
+    """A backend whose metadata refreshes fail or succeed as scripted"""
+    
+    def __init__(self, outcomes):
+        super().__init__()
+        self.name = "Scripted"
+        self.command = "scripted"
+        self.outcomes = list(outcomes)
+        self.refreshes = 0
+        self.available = True
+    
+    def check_availability(self):
+        return True
+    
+    def update_command(self):
+        return ["scripted", "refresh"]
+    
+    def update(self, on_output=None):
+        self.refreshes += 1
+        return (0, "", "") if self.outcomes.pop(0) else (1, "", "mirror unreachable")
+    
+    def upgrade(self, package=None, on_output=None):
+        return 0, "", ""
+    
+    def install(self, package, on_output=None):
+        return 0, "", ""
+    
+    def remove(self, package, on_output=None):
+        return 0, "", ""
+    
+    def list_upgradable(self):
+        return [Package("hello", self.name, version="1.0", new_version="1.1")]
+
+
+class ScriptedConditions(SystemConditions):
+    """Metered connection and battery as set by the check"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.is_metered = False
+        self.is_on_battery = False
+    
+    def metered(self):
+        return self.is_metered
+    
+    def on_battery(self):
+        return self.is_on_battery
+    
+    def busy(self):
+        return False
+
+
+def scheduled_within(delay, nominal, jitter=0.1):
+    """Check that a delay is the nominal one give or take the jitter"""
+    return nominal * (1 - jitter) <= delay <= nominal * (1 + jitter)
+
+
+now = [1000000.0]
+checker_dir = tempfile.mkdtemp()
+# Refreshes: three failures, a success, another failure
+scripted = ScriptedManager([False, False, False, True, False])
+conditions = ScriptedConditions(allow_battery=False)
+checker = UpdateChecker([scripted], cache=InventoryCache(checker_dir), interval=3600, retry=60,
+                        max_backoff=600, jitter=0.1, first_delay=120, defer_delay=900,
+                        clock=lambda: now[0], rng=random.Random(7), conditions=conditions,
+                        escalate=lambda: True, state_path=os.path.join(checker_dir, 'state.json'))
+entry = checker.state[scripted.name]
+first_delay = entry['next_check'] - now[0]
+
+
+def step():
+    """Advance the clock to the next check and run it; (status, delay until the one after)"""
+    now[0] = entry['next_check']
+    results = checker.tick()
+    return results[0].status, entry['next_check'] - now[0]
+
+
+early = checker.tick()
+schedule = [step() for _ in range(5)]
+refreshes = scripted.refreshes
+conditions.is_metered = True
+metered = step()
+conditions.is_metered = False
+conditions.is_on_battery = True
+battery = step()
+checker_checks = [
+    ("first check within the jitter of first_delay", scheduled_within(first_delay, 120), True),
+    ("nothing checked before it is due", early, []),
+    ("statuses", [status for status, _ in schedule], [FAILED, FAILED, FAILED, CHECKED, FAILED]),
+    ("backoff doubles, resets after a success",
+     [scheduled_within(delay, nominal) for (_, delay), nominal in zip(schedule, [60, 120, 240, 3600, 60])],
+     [True] * 5),
+    ("delays are spread", len({round(delay) for _, delay in schedule}) == len(schedule), True),
+    ("metered connection skips the check",
+     (metered[0], scheduled_within(metered[1], 900), scripted.refreshes - refreshes), (DEFERRED, True, 0)),
+    ("battery skips the check",
+     (battery[0], scheduled_within(battery[1], 900), scripted.refreshes - refreshes), (DEFERRED, True, 0)),
+    ("failures kept while deferred", entry['failures'], 1),
+]
+for label, got, expected in checker_checks:
+    status = "✅" if got == expected else "❌"
+    print(f"  {status} {label}: {got}")
+print()
+
+# Output parsers against the recorded benchmark output
+print("=" * 60)
+print("Output parsers (benchmark fixtures)")
+print("=" * 60)
+
+from package_managers import parsers
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures')
+
+
+def fixture(name):
+    """Recorded output of a command"""
+    with open(os.path.join(FIXTURES, f"{name}.txt"), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def fields(package):
+    """The fields a check looks at"""
+    return (package.name, package.version, package.new_version, package.repo)
+
+
+DNF_WRAPPED = ("Installed Packages\n"
+               "python3.11.x86_64                    3.11.7-1.fc39              @updates\n"
+               "texlive-collection-latexrecommended.noarch\n"
+               "                                     11:svn65512-69.fc39        @fedora\n")
+apt_search = parsers.apt_search(fixture('apt_search'), 'APT')
+parser_checks = [
+    ("apt search finds vim", [(package.name, package.description) for package in apt_search][:1],
+     [('vim', 'Vi IMproved - enhanced vi editor')]),
+    ("apt upgradable", fields(parsers.apt_upgradable(fixture('apt_upgradable'), 'APT')[0]),
+     ('curl', '7.81.0-1ubuntu1.15', '7.81.0-1ubuntu1.16', 'jammy-updates')),
+    ("dnf dotted and wrapped names", [fields(package) for package in parsers.dnf_installed(DNF_WRAPPED, 'DNF')],
+     [('python3.11', '3.11.7-1.fc39', '', 'updates'),
+      ('texlive-collection-latexrecommended', '11:svn65512-69.fc39', '', 'fedora')]),
+    ("snap upgradable", fields(parsers.snap_upgradable(parsers.after_header(fixture('snap_upgradable')), 'Snap')[0]),
+     ('core22', '', '20240208', '')),
+    ("flatpak search", fields(parsers.flatpak_search(parsers.after_header(fixture('flatpak_search')), 'Flatpak')[0]),
+     ('Visual Studio Code', '1.86.2', '', 'flathub')),
+]
+# Streaming in blocks finds the same records as parsing the whole output
+for name, manager in (('apt_search', apt), ('dnf_search', dnf), ('pacman_search', pacman)):
+    text = fixture(name) * 100
+    parser_checks.append((f"{name} streamed", len(list(parsers.stream(manager.parse_search, text.splitlines()))),
+                          len(manager.parse_search(text))))
+# The column header is repeated at the start of every block
+text = fixture('snap_upgradable')
+text += '\n'.join(parsers.after_header(text).splitlines() * 600)
+snap = SnapManager()
+parser_checks.append(("snap_upgradable streamed", len(list(parsers.stream(snap.parse_upgradable, text.splitlines(),
+                                                                          snap.HEADER_LINES['upgradable']))),
+                      len(snap.parse_upgradable(text))))
+for label, got, expected in parser_checks:
+    status = "✅" if got == expected else "❌"
+    print(f"  {status} {label}: {got}")
+print()
+
 print("=" * 60)
 print("\nTo launch the GUI, run: python3 orange-update.py")
 print("=" * 60)